@@ -0,0 +1,7 @@
+"""
+Benchmark suite for the optimisation and data paths.
+
+Cases are built from seeded synthetic food sets so that two runs on the same
+code produce the same inputs, and results are written as JSON that
+``python -m benchmarks compare`` can diff.
+"""
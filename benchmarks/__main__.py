@@ -0,0 +1,270 @@
+"""
+Command-line entry point for the benchmark suite.
+
+Usage:
+    python -m benchmarks run [--sizes 10 50] [--profiles easy] [--output FILE]
+        [--nondeterministic]
+    python -m benchmarks compare BASELINE.json CANDIDATE.json [--threshold 0.1]
+    python -m benchmarks replay CORPUS_DIR [--engine module:function]
+        [--baseline BASELINE.json] [--output FILE]
+    python -m benchmarks load [--workers 1 2 4] [--threads 1 4] [--concurrency 16]
+        [--duration 30] [--warmup 5] [--output FILE]
+    python -m benchmarks check
+
+The compare command exits non-zero when any case regressed, as does replay
+when given a baseline. Replay runs a corpus recorded with OPTIMISE_RECORD_DIR
+through an optimisation engine, ``optimise_diet`` by default. The load command
+runs the app under gunicorn against local USDA and Contentful stubs once per
+combination of worker and thread counts. The check command asserts the USDA
+client's retry, rate limiting and circuit breaker behaviour on a fake clock and
+exits non-zero if any check fails.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from benchmarks.cases import FOOD_SET_SIZES, build_cases
+from benchmarks.checks import run_checks
+from benchmarks.corpus import DEFAULT_ENGINE, corpus_cases
+from benchmarks.load import LoadConfig, run_load
+from benchmarks.runner import compare_results, read_results, run_suite, write_results
+from benchmarks.synthetic import GOAL_PROFILES
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def _run(args: argparse.Namespace) -> int:
+    cases = build_cases(args.sizes, args.profiles, args.seed)
+    if args.filter:
+        cases = [case for case in cases if args.filter in case.name]
+    if not cases:
+        print("No cases match the given filter", file=sys.stderr)
+        return 1
+
+    results = run_suite(
+        cases, args.repeats, not args.no_memory, args.seed, not args.nondeterministic
+    )
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}.json")
+    write_results(results, output)
+    print(f"Results written to {output}")
+    return 0
+
+
+def _format_ratio(ratio: Optional[float]) -> str:
+    return "-" if ratio is None else f"{ratio:.2f}x"
+
+
+def _print_comparison(rows: List[Dict[str, Any]]) -> int:
+    print(f"{'case':<42} {'base ms':>10} {'new ms':>10} {'time':>7} {'mem':>7}  status")
+    for row in rows:
+        if "median" not in row:
+            print(
+                f"{row['name']:<42} {'':>10} {'':>10} {'':>7} {'':>7}  {row['status']}"
+            )
+            continue
+        print(
+            f"{row['name']:<42} {row['base_median'] * 1000:>10.2f}"
+            f" {row['median'] * 1000:>10.2f} {_format_ratio(row['time_ratio']):>7}"
+            f" {_format_ratio(row['memory_ratio']):>7}  {row['status']}"
+        )
+
+    regressions = [row for row in rows if row.get("regressed")]
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed")
+        return 1
+    return 0
+
+
+def _compare(args: argparse.Namespace) -> int:
+    rows = compare_results(
+        read_results(args.baseline),
+        read_results(args.candidate),
+        args.threshold,
+        args.min_delta_ms / 1000,
+    )
+    return _print_comparison(rows)
+
+
+def _replay(args: argparse.Namespace) -> int:
+    try:
+        cases = corpus_cases(args.corpus, args.engine)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if not cases:
+        print(f"No recorded cases in {args.corpus}", file=sys.stderr)
+        return 1
+
+    results = run_suite(
+        cases,
+        args.repeats,
+        measure_memory=False,
+        log=lambda _: None,
+        deterministic=not args.nondeterministic,
+    )
+    results["meta"]["engine"] = args.engine
+    results["meta"]["corpus"] = os.path.abspath(args.corpus)
+
+    print(f"{'case':<42} {'ms':>10} {'solves':>7} {'objective':>11} {'overflow':>9}")
+    for record in results["cases"]:
+        outcome = record["outcome"]
+        objective = (
+            f"{outcome['total_cost_sum']:.4f}" if outcome["feasible"] else "infeasible"
+        )
+        overflow = outcome["total_overflow"] if outcome["feasible"] else "-"
+        print(
+            f"{record['name']:<42} {record['wall_time']['median'] * 1000:>10.2f}"
+            f" {record['solve_count']:>7} {objective:>11} {overflow:>9}"
+        )
+
+    if args.output:
+        write_results(results, args.output)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        print()
+        rows = compare_results(
+            read_results(args.baseline),
+            results,
+            args.threshold,
+            args.min_delta_ms / 1000,
+        )
+        return _print_comparison(rows)
+    return 0
+
+
+def _load(args: argparse.Namespace) -> int:
+    configs = [
+        LoadConfig(workers, threads)
+        for workers, threads in itertools.product(args.workers, args.threads)
+    ]
+    results = run_load(configs, args.concurrency, args.duration, args.warmup, args.seed)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"load-{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(
+        f"{'config':<22} {'req/s':>8} {'errors':>6}"
+        f" {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    )
+    for run in results["runs"]:
+        total = run["total"]
+        if not total["requests"]:
+            print(f"{run['name']:<22} {0:>8.1f}")
+            continue
+        print(
+            f"{run['name']:<22} {total['throughput']:>8.1f} {total['errors']:>6}"
+            f" {total['p50'] * 1000:>9.1f} {total['p95'] * 1000:>9.1f}"
+            f" {total['p99'] * 1000:>9.1f}"
+        )
+    print(f"Results written to {output}")
+    return 0
+
+
+def _check(args: argparse.Namespace) -> int:
+    failed = run_checks()
+    if failed:
+        print(f"\n{failed} check(s) failed")
+        return 1
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark suite")
+    run_parser.add_argument(
+        "--sizes", type=int, nargs="+", default=list(FOOD_SET_SIZES)
+    )
+    run_parser.add_argument(
+        "--profiles", nargs="+", choices=GOAL_PROFILES, default=list(GOAL_PROFILES)
+    )
+    run_parser.add_argument("--filter", help="Only run cases whose name contains this")
+    run_parser.add_argument("--repeats", type=int, default=3)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--no-memory", action="store_true")
+    run_parser.add_argument(
+        "--nondeterministic",
+        action="store_true",
+        help="Let CBC use its default threads and seeds",
+    )
+    run_parser.add_argument(
+        "--output", help="Results file (default: results/<time>.json)"
+    )
+    run_parser.set_defaults(handler=_run)
+
+    compare_parser = subparsers.add_parser("compare", help="Diff two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    compare_parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    compare_parser.set_defaults(handler=_compare)
+
+    replay_parser = subparsers.add_parser(
+        "replay", help="Replay a recorded optimisation corpus"
+    )
+    replay_parser.add_argument("corpus", help="Directory of recorded cases")
+    replay_parser.add_argument(
+        "--engine",
+        default=DEFAULT_ENGINE,
+        help="Optimisation function to run, as module:function",
+    )
+    replay_parser.add_argument("--repeats", type=int, default=3)
+    replay_parser.add_argument("--nondeterministic", action="store_true")
+    replay_parser.add_argument("--output", help="Write the results to this file")
+    replay_parser.add_argument(
+        "--baseline", help="Flag cases that changed or slowed down against this"
+    )
+    replay_parser.add_argument("--threshold", type=float, default=0.1)
+    replay_parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    replay_parser.set_defaults(handler=_replay)
+
+    load_parser = subparsers.add_parser(
+        "load", help="Load test the app under gunicorn against local stubs"
+    )
+    load_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    load_parser.add_argument("--threads", type=int, nargs="+", default=[1])
+    load_parser.add_argument(
+        "--concurrency", type=int, default=16, help="Closed-loop clients"
+    )
+    load_parser.add_argument(
+        "--duration", type=float, default=30.0, help="Measured seconds per config"
+    )
+    load_parser.add_argument(
+        "--warmup", type=float, default=5.0, help="Unmeasured seconds per config"
+    )
+    load_parser.add_argument("--seed", type=int, default=0)
+    load_parser.add_argument(
+        "--output", help="Results file (default: results/load-<time>.json)"
+    )
+    load_parser.set_defaults(handler=_load)
+
+    check_parser = subparsers.add_parser(
+        "check", help="Assert the USDA client's failure handling"
+    )
+    check_parser.set_defaults(handler=_check)
+
+    args = parser.parse_args(argv)
+    return int(args.handler(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
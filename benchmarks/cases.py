@@ -0,0 +1,465 @@
+"""
+Benchmark case definitions.
+
+Each case prepares its inputs outside the timed region and hands back a
+zero-argument callable that exercises exactly one server function.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+from benchmarks.synthetic import (
+    GOAL_PROFILES,
+    generate_foods,
+    generate_goal_profile,
+    generate_usda_foods,
+    max_servings_for,
+)
+from benchmarks.usda_stub import USDAStubServer
+from server.config import LARGE_SCALE_TIME_LIMIT_SECONDS, SOLVER_SCALING
+from server.data.nutrient_data import get_nutrient_bounds
+from server.services.column_generation import (
+    LargeScaleOutcome,
+    optimise_large_scale,
+)
+from server.services.food_service import (
+    SearchResults,
+    fetch_search_page,
+    page_cache,
+    search_foods,
+)
+from server.services.optimisation import analyse_feasibility, optimise_diet
+from server.services.usda_client import USDAClient
+from server.utils.json_provider import FastJSONProvider
+from server.utils.nutrient_utils import extract_nutrients
+from server.utils.solver_utils import set_scaling
+
+FOOD_SET_SIZES = (10, 50, 200, 1000)
+LARGE_SCALE_SIZES = (5000,)
+SEARCH_HIT_COUNTS = (200, 2000)
+SEARCH_FAULT_RATE = 0.2
+SEARCH_CONCURRENT_USERS = 10
+JSON_PROVIDERS: Dict[str, Callable[[Flask], JSONProvider]] = {
+    "default": DefaultJSONProvider,
+    "fast": FastJSONProvider,
+}
+
+Prepared = Tuple[Callable[[], Any], Callable[[], None]]
+
+
+class Case(NamedTuple):
+    """A named benchmark with lazily prepared inputs."""
+
+    name: str
+    prepare: Callable[[], Prepared]
+    repeats: Optional[int] = None
+    summarise: Optional[Callable[[Any], Dict[str, Any]]] = None
+
+
+def _no_cleanup() -> None:
+    pass
+
+
+def summarise_optimisation(result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Reduce an optimisation result to the fields compared between runs."""
+    if result is None:
+        return {"feasible": False}
+    return {
+        "feasible": True,
+        "total_cost_sum": round(float(result["total_cost_sum"]), 6),
+        "total_overflow": int(result["total_overflow"]),
+    }
+
+
+def _optimisation_inputs(num_foods: int, profile: str, seed: int) -> Dict[str, Any]:
+    foods = generate_foods(num_foods, seed)
+    nutrient_goals, lower_bounds, upper_bounds = generate_goal_profile(
+        profile, foods, seed
+    )
+    return {
+        "foods": foods,
+        "costs": np.array([food["price"] for food in foods], dtype=np.float64),
+        "max_servings": [max_servings_for(food) for food in foods],
+        "nutrient_goals": nutrient_goals,
+        "lower_bounds": lower_bounds,
+        "upper_bounds": upper_bounds,
+    }
+
+
+def optimise_case(num_foods: int, profile: str, seed: int) -> Case:
+    """Benchmark ``optimise_diet`` on one synthetic food set and profile."""
+
+    def prepare() -> Prepared:
+        inputs = _optimisation_inputs(num_foods, profile, seed)
+        return (
+            lambda: optimise_diet(
+                inputs["foods"],
+                inputs["costs"],
+                inputs["max_servings"],
+                inputs["nutrient_goals"],
+                inputs["lower_bounds"],
+                inputs["upper_bounds"],
+            ),
+            _no_cleanup,
+        )
+
+    return Case(
+        f"optimise_diet/{profile}/n={num_foods}",
+        prepare,
+        repeats=1 if profile == "infeasible" else None,
+        summarise=summarise_optimisation,
+    )
+
+
+def scaled_optimise_case(num_foods: int, profile: str, seed: int) -> Case:
+    """
+    Benchmark ``optimise_diet`` with model scaling switched on.
+
+    Paired with ``optimise_case`` to show what scaling does to CBC's
+    iteration and node counts and to the wall time.
+    """
+    unscaled_case = optimise_case(num_foods, profile, seed)
+
+    def prepare() -> Prepared:
+        run, _ = unscaled_case.prepare()
+        set_scaling(True)
+        return run, lambda: set_scaling(SOLVER_SCALING)
+
+    return unscaled_case._replace(
+        name=f"optimise_diet/scaled/{profile}/n={num_foods}", prepare=prepare
+    )
+
+
+def large_scale_case(num_foods: int, profile: str, seed: int) -> Case:
+    """Benchmark ``optimise_large_scale`` on a catalogue-sized candidate set."""
+
+    def prepare() -> Prepared:
+        inputs = _optimisation_inputs(num_foods, profile, seed)
+        return (
+            lambda: optimise_large_scale(
+                inputs["foods"],
+                inputs["costs"],
+                inputs["max_servings"],
+                inputs["nutrient_goals"],
+                inputs["lower_bounds"],
+                inputs["upper_bounds"],
+                LARGE_SCALE_TIME_LIMIT_SECONDS,
+            ),
+            _no_cleanup,
+        )
+
+    def summarise(outcome: LargeScaleOutcome) -> Dict[str, Any]:
+        return summarise_optimisation(outcome.result)
+
+    return Case(
+        f"optimise_large_scale/{profile}/n={num_foods}",
+        prepare,
+        summarise=summarise,
+    )
+
+
+def feasibility_case(num_foods: int, profile: str, seed: int) -> Case:
+    """Benchmark ``analyse_feasibility`` on one synthetic food set and profile."""
+
+    def prepare() -> Prepared:
+        inputs = _optimisation_inputs(num_foods, profile, seed)
+        return (
+            lambda: analyse_feasibility(
+                inputs["foods"],
+                inputs["max_servings"],
+                inputs["lower_bounds"],
+                inputs["upper_bounds"],
+                inputs["nutrient_goals"],
+            ),
+            _no_cleanup,
+        )
+
+    return Case(
+        f"analyse_feasibility/{profile}/n={num_foods}",
+        prepare,
+        summarise=lambda result: {"feasible": bool(result["isFeasible"])},
+    )
+
+
+def nutrient_bounds_case() -> Case:
+    """Benchmark ``get_nutrient_bounds`` across every adult life-stage group."""
+    profiles = [(age, gender) for age in (25, 40, 60, 80) for gender in ("m", "f")]
+
+    def run() -> None:
+        for age, gender in profiles:
+            get_nutrient_bounds(age, gender)
+
+    return Case("get_nutrient_bounds/all_groups", lambda: (run, _no_cleanup))
+
+
+def extract_nutrients_case(num_foods: int, seed: int) -> Case:
+    """Benchmark ``extract_nutrients`` over a batch of USDA search hits."""
+
+    def prepare() -> Prepared:
+        foods = generate_usda_foods(num_foods, seed)
+
+        def run() -> None:
+            for food in foods:
+                extract_nutrients(food["foodNutrients"])
+
+        return run, _no_cleanup
+
+    return Case(f"extract_nutrients/n={num_foods}", prepare)
+
+
+def _stub_client(server: USDAStubServer) -> USDAClient:
+    """A client for the stub with short backoffs and no practical rate limit."""
+    return USDAClient(
+        server.url,
+        backoff_base=0.005,
+        backoff_max=0.05,
+        rate=1e6,
+        burst=1000000,
+    )
+
+
+def _uncached_search(server: USDAStubServer, client: USDAClient) -> SearchResults:
+    """Search the stub with an empty page cache, as for a new query."""
+    page_cache.clear()
+    return search_foods("benchmark-key", "synthetic", server.url, client)
+
+
+def _summarise_search(results: SearchResults) -> Dict[str, Any]:
+    return {"results": len(results.foods), "complete": results.complete}
+
+
+def search_foods_case(total_hits: int, seed: int) -> Case:
+    """Benchmark ``search_foods`` end to end against the local USDA stub."""
+
+    def prepare() -> Prepared:
+        server = USDAStubServer(total_hits, seed).start()
+        client = _stub_client(server)
+        return (
+            lambda: _uncached_search(server, client),
+            server.stop,
+        )
+
+    return Case(f"search_foods/hits={total_hits}", prepare, summarise=_summarise_search)
+
+
+def search_first_page_case(total_hits: int, seed: int) -> Case:
+    """Benchmark fetching only the first page, as a paged search does."""
+
+    def prepare() -> Prepared:
+        server = USDAStubServer(total_hits, seed).start()
+        client = _stub_client(server)
+
+        def run() -> int:
+            page_cache.clear()
+            page = fetch_search_page(
+                "benchmark-key", "synthetic", 1, server.url, client
+            )
+            return len(page.foods)
+
+        return run, server.stop
+
+    return Case(
+        f"search_foods/hits={total_hits}/first_page",
+        prepare,
+        summarise=lambda results: {"results": results},
+    )
+
+
+def search_cached_case(total_hits: int, seed: int) -> Case:
+    """Benchmark repeating a search whose pages are all cached."""
+
+    def prepare() -> Prepared:
+        server = USDAStubServer(total_hits, seed).start()
+        client = _stub_client(server)
+        _uncached_search(server, client)
+        return (
+            lambda: search_foods("benchmark-key", "synthetic", server.url, client),
+            server.stop,
+        )
+
+    return Case(
+        f"search_foods/hits={total_hits}/cached",
+        prepare,
+        summarise=_summarise_search,
+    )
+
+
+def search_faults_case(total_hits: int, seed: int) -> Case:
+    """
+    Benchmark ``search_foods`` against a stub failing a fifth of requests
+    with 503s, which the client retries.
+    """
+
+    def prepare() -> Prepared:
+        server = USDAStubServer(total_hits, seed, error_rate=SEARCH_FAULT_RATE).start()
+        client = _stub_client(server)
+        return (
+            lambda: _uncached_search(server, client),
+            server.stop,
+        )
+
+    return Case(
+        f"search_foods/hits={total_hits}/faults={SEARCH_FAULT_RATE:.0%}",
+        prepare,
+        summarise=_summarise_search,
+    )
+
+
+def search_coalesced_case(total_hits: int, seed: int) -> Case:
+    """
+    Benchmark concurrent requests making the same search with one API key
+    against a slow stub, counting the upstream requests they cost between
+    them.
+    """
+
+    def prepare() -> Prepared:
+        server = USDAStubServer(total_hits, seed, delay=0.02).start()
+        client = _stub_client(server)
+        pool = ThreadPoolExecutor(SEARCH_CONCURRENT_USERS)
+
+        def run() -> Dict[str, Any]:
+            page_cache.clear()
+            server.requests = 0
+            searches = [
+                pool.submit(
+                    search_foods, "benchmark-key", "synthetic", server.url, client
+                )
+                for _ in range(SEARCH_CONCURRENT_USERS)
+            ]
+            results = [search.result() for search in searches]
+            return {
+                "results": len(results[0].foods),
+                "upstream_requests": server.requests,
+            }
+
+        def cleanup() -> None:
+            pool.shutdown()
+            server.stop()
+
+        return run, cleanup
+
+    return Case(
+        f"search_foods/hits={total_hits}/users={SEARCH_CONCURRENT_USERS}",
+        prepare,
+        summarise=lambda summary: summary,
+    )
+
+
+def _builtin(value: Any) -> Any:
+    """Convert NumPy values, recursively, to the types Flask's encoder accepts."""
+    if isinstance(value, dict):
+        return {key: _builtin(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_builtin(item) for item in value]
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return value
+
+
+def _search_payload(total_hits: int, seed: int) -> Dict[str, Any]:
+    return {
+        "results": [
+            {
+                "fdcId": str(food["fdcId"]),
+                "description": food["description"],
+                "nutrients": extract_nutrients(food["foodNutrients"]),
+            }
+            for food in generate_usda_foods(total_hits, seed)
+        ]
+    }
+
+
+def _optimise_payload(num_foods: int, seed: int) -> Dict[str, Any]:
+    inputs = _optimisation_inputs(num_foods, "easy", seed)
+    result = optimise_diet(
+        inputs["foods"],
+        inputs["costs"],
+        inputs["max_servings"],
+        inputs["nutrient_goals"],
+        inputs["lower_bounds"],
+        inputs["upper_bounds"],
+    )
+    return {"success": True, "result": result}
+
+
+def serialise_case(
+    payload_name: str, make_payload: Callable[[], Dict[str, Any]], provider: str
+) -> Case:
+    """
+    Benchmark building a JSON response with one of the JSON providers.
+
+    The default provider cannot encode NumPy values, so it is given the
+    payload already converted to built-in types, as the app used to produce.
+    """
+
+    def prepare() -> Prepared:
+        app = Flask("benchmarks")
+        app.json = JSON_PROVIDERS[provider](app)
+        payload = make_payload()
+        if provider == "default":
+            payload = _builtin(payload)
+        return lambda: app.json.response(payload), _no_cleanup
+
+    return Case(
+        f"serialise/{payload_name}/{provider}",
+        prepare,
+        summarise=lambda response: {"bytes": len(response.get_data())},
+    )
+
+
+def build_cases(
+    sizes: Sequence[int] = FOOD_SET_SIZES,
+    profiles: Sequence[str] = GOAL_PROFILES,
+    seed: int = 0,
+) -> List[Case]:
+    """
+    Build the full case matrix.
+
+    Args:
+        sizes: Food set sizes for the optimisation and feasibility cases
+        profiles: Goal profiles for the optimisation and feasibility cases
+        seed: Seed shared by every synthetic generator
+
+    Returns:
+        List of cases in execution order
+    """
+    cases: List[Case] = [nutrient_bounds_case()]
+    cases += [extract_nutrients_case(n, seed) for n in SEARCH_HIT_COUNTS]
+    cases += [search_foods_case(n, seed) for n in SEARCH_HIT_COUNTS]
+    cases.append(search_first_page_case(SEARCH_HIT_COUNTS[-1], seed))
+    cases.append(search_cached_case(SEARCH_HIT_COUNTS[-1], seed))
+    cases.append(search_faults_case(SEARCH_HIT_COUNTS[-1], seed))
+    cases.append(search_coalesced_case(SEARCH_HIT_COUNTS[-1], seed))
+    for provider in JSON_PROVIDERS:
+        cases.append(
+            serialise_case(
+                f"search/hits={SEARCH_HIT_COUNTS[-1]}",
+                lambda: _search_payload(SEARCH_HIT_COUNTS[-1], seed),
+                provider,
+            )
+        )
+        cases.append(
+            serialise_case(
+                f"optimise/n={max(sizes)}",
+                lambda: _optimise_payload(max(sizes), seed),
+                provider,
+            )
+        )
+    for num_foods in sizes:
+        for profile in profiles:
+            cases.append(feasibility_case(num_foods, profile, seed))
+            cases.append(optimise_case(num_foods, profile, seed))
+            # Infeasible sweeps are a thousand trivial solves, and too slow
+            # to run twice.
+            if profile != "infeasible":
+                cases.append(scaled_optimise_case(num_foods, profile, seed))
+    for num_foods in LARGE_SCALE_SIZES:
+        for profile in profiles:
+            cases.append(large_scale_case(num_foods, profile, seed))
+    return cases
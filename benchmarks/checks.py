@@ -0,0 +1,355 @@
+"""
+Deterministic checks of the USDA client's failure handling.
+
+The benchmark fault cases time the client against a live stub; these checks
+assert what it does. Each one drives a ``USDAClient`` through a scripted
+session and a fake clock, so retries, backoff sleeps, ``Retry-After``,
+circuit breaker transitions and rate limiting are exercised without real
+time passing or a server running. Run them with ``python -m benchmarks
+check``.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Type, Union
+from unittest import mock
+
+import requests
+
+from server.config import (
+    USDA_RATE_BURST,
+    USDA_RATE_MAX_WAIT_SECONDS,
+    USDA_RATE_PER_SECOND,
+)
+from server.services import usda_client
+from server.services.food_service import SEARCH_MAX_PAGES
+from server.services.usda_client import USDAClient, USDARateLimited, USDAUnavailable
+from server.utils.timing import RequestTimings, collect_timings
+
+ENDPOINT = "http://usda.invalid/fdc/v1/foods/search"
+
+Scripted = Union[int, Tuple[int, Dict[str, str]], BaseException]
+
+
+class FakeClock:
+    """Stands in for the ``time`` module; sleeping moves the clock on."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps: List[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FullJitter:
+    """Stands in for the ``random`` module, always drawing the upper bound."""
+
+    @staticmethod
+    def uniform(low: float, high: float) -> float:
+        return high
+
+
+class FakeSession:
+    """Answers each request with the next scripted status or exception."""
+
+    def __init__(self, script: List[Scripted]) -> None:
+        self.script = list(script)
+        self.calls: List[Dict[str, Any]] = []
+
+    def get(self, url: str, params: Dict[str, Any], timeout: Any) -> requests.Response:
+        self.calls.append(params)
+        step = self.script.pop(0)
+        if isinstance(step, BaseException):
+            raise step
+        status, headers = step if isinstance(step, tuple) else (step, {})
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = json.dumps({"foods": [], "totalHits": 0}).encode()
+        response.url = url
+        return response
+
+
+@contextmanager
+def fake_time() -> Iterator[FakeClock]:
+    """Run the USDA client on a fake clock with deterministic jitter."""
+    clock = FakeClock()
+    with mock.patch.object(usda_client, "time", clock):
+        with mock.patch.object(usda_client, "random", FullJitter):
+            yield clock
+
+
+def make_client(
+    script: List[Scripted], **options: Any
+) -> Tuple[USDAClient, FakeSession]:
+    """Client on a scripted session; create it inside ``fake_time``."""
+    settings: Dict[str, Any] = {
+        "max_attempts": 3,
+        "backoff_base": 1.0,
+        "backoff_max": 8.0,
+        "rate": 1000.0,
+        "burst": 1000,
+        "max_rate_wait": 1.0,
+        "breaker_failures": 100,
+        "breaker_reset": 30.0,
+    }
+    settings.update(options)
+    client = USDAClient(ENDPOINT, **settings)
+    session = FakeSession(script)
+    fake: Any = session
+    client.session = fake
+    return client, session
+
+
+def _raises(expected: Type[BaseException], action: Callable[[], Any]) -> BaseException:
+    try:
+        action()
+    except expected as e:
+        return e
+    raise AssertionError(f"expected {expected.__name__}")
+
+
+def check_retries_transient_failures() -> None:
+    """5xx and connection failures are retried with growing backoff."""
+    with fake_time() as clock, collect_timings() as timings:
+        client, session = make_client([503, requests.exceptions.ConnectionError(), 200])
+        client.get("key", {"query": "apple"})
+    assert len(session.calls) == 3, len(session.calls)
+    assert clock.sleeps == [1.0, 2.0], clock.sleeps
+    assert timings.counters.get("usda_retries") == 2, timings.counters
+
+
+def check_gives_up_after_max_attempts() -> None:
+    """The last failure is raised once every attempt has been used."""
+    with fake_time() as clock:
+        client, session = make_client([503, 502, 500, 200])
+        error = _raises(
+            requests.exceptions.HTTPError, lambda: client.get("key", {"query": "x"})
+        )
+    assert "500" in str(error), error
+    assert len(session.calls) == 3, len(session.calls)
+    assert clock.sleeps == [1.0, 2.0], clock.sleeps
+
+
+def check_client_errors_are_not_retried() -> None:
+    """A rejected key is reported at once instead of being retried."""
+    with fake_time() as clock:
+        client, session = make_client([403, 200])
+        _raises(requests.exceptions.HTTPError, lambda: client.get("bad", {}))
+    assert len(session.calls) == 1, len(session.calls)
+    assert clock.sleeps == [], clock.sleeps
+
+
+def check_retry_after_is_honoured() -> None:
+    """A 429's Retry-After replaces a shorter backoff."""
+    with fake_time() as clock:
+        client, session = make_client([(429, {"Retry-After": "5"}), 200])
+        client.get("key", {})
+    assert len(session.calls) == 2, len(session.calls)
+    assert clock.sleeps == [5.0], clock.sleeps
+
+
+def check_long_retry_after_is_not_waited_for() -> None:
+    """A Retry-After beyond the backoff cap is passed on to the caller."""
+    with fake_time() as clock:
+        client, session = make_client([(429, {"Retry-After": "120"}), 200])
+        error = _raises(USDARateLimited, lambda: client.get("key", {}))
+    assert isinstance(error, USDARateLimited)
+    assert error.retry_after == 120.0, error.retry_after
+    assert len(session.calls) == 1, len(session.calls)
+    assert clock.sleeps == [], clock.sleeps
+
+
+def check_breaker_opens_and_half_opens() -> None:
+    """
+    Consecutive failures open the breaker; after the reset period one trial
+    is let through, and its outcome closes or reopens the breaker.
+    """
+    with fake_time() as clock:
+        client, session = make_client(
+            [503, 503, 503, 200, 200],
+            max_attempts=1,
+            breaker_failures=2,
+        )
+        for _ in range(2):
+            _raises(requests.exceptions.HTTPError, lambda: client.get("key", {}))
+
+        error = _raises(USDAUnavailable, lambda: client.get("key", {}))
+        assert isinstance(error, USDAUnavailable)
+        assert error.retry_after == 30.0, error.retry_after
+        assert len(session.calls) == 2, len(session.calls)
+
+        # Half open: the failing trial reopens the breaker straight away.
+        clock.now += 30.0
+        _raises(requests.exceptions.HTTPError, lambda: client.get("key", {}))
+        assert len(session.calls) == 3, len(session.calls)
+        _raises(USDAUnavailable, lambda: client.get("key", {}))
+
+        # Half open again: while a trial is out, other requests are refused.
+        clock.now += 30.0
+        client.breaker.before_request()
+        _raises(USDAUnavailable, client.breaker.before_request)
+        client.breaker.record_failure()
+
+        # The next successful trial closes the breaker.
+        clock.now += 30.0
+        client.get("key", {})
+        client.get("key", {})
+    assert len(session.calls) == 5, len(session.calls)
+
+
+def check_token_bucket_refuses_long_waits() -> None:
+    """
+    A key waits for a slot that is close enough and is refused, without an
+    upstream request or a spent token, when it is not.
+    """
+    with fake_time() as clock:
+        client, session = make_client([200] * 2, rate=1.0, burst=1, max_rate_wait=2.0)
+        client.get("key", {})
+        client.get("key", {})
+        assert clock.sleeps == [1.0], clock.sleeps
+
+        client, session = make_client([200] * 4, rate=1.0, burst=2, max_rate_wait=0.5)
+        client.get("key", {})
+        client.get("key", {})
+        error = _raises(USDARateLimited, lambda: client.get("key", {}))
+        assert isinstance(error, USDARateLimited)
+        assert error.retry_after == 1.0, error.retry_after
+        assert len(session.calls) == 2, len(session.calls)
+
+        # Other keys have buckets of their own.
+        client.get("other", {})
+
+        # The refused slot was handed back, so one second refills a token.
+        clock.now += 1.0
+        client.get("key", {})
+    assert len(session.calls) == 4, len(session.calls)
+    assert clock.sleeps == [1.0], clock.sleeps
+
+
+def check_default_burst_covers_full_searches() -> None:
+    """
+    With the configured limits, a user can run several full searches of
+    SEARCH_MAX_PAGES pages a few seconds apart without being refused.
+    """
+    searches = 5
+    with fake_time() as clock:
+        client, session = make_client(
+            [200] * (searches * SEARCH_MAX_PAGES),
+            rate=USDA_RATE_PER_SECOND,
+            burst=USDA_RATE_BURST,
+            max_rate_wait=USDA_RATE_MAX_WAIT_SECONDS,
+        )
+        for search in range(searches):
+            for page in range(1, SEARCH_MAX_PAGES + 1):
+                try:
+                    client.get("key", {"query": "apple", "pageNumber": page})
+                except USDARateLimited:
+                    raise AssertionError(f"search {search + 1} page {page} refused")
+            clock.now += 5.0
+    assert len(session.calls) == searches * SEARCH_MAX_PAGES, len(session.calls)
+    assert clock.sleeps == [], clock.sleeps
+
+
+def check_coalescing_is_per_api_key() -> None:
+    """
+    Concurrent callers with the same API key share one piece of work; a
+    caller with another key does its own, so it never sees the first key's
+    errors.
+    """
+    client = USDAClient(ENDPOINT)
+    release = threading.Event()
+    runs: List[str] = []
+    outcomes: Dict[str, Union[str, BaseException]] = {}
+    follower_timings: List[RequestTimings] = []
+
+    def work(api_key: str) -> Callable[[], str]:
+        def run() -> str:
+            runs.append(api_key)
+            if api_key == "rejected":
+                release.wait(5)
+                raise requests.exceptions.HTTPError("403 Forbidden")
+            return api_key
+
+        return run
+
+    def call(name: str, api_key: str) -> None:
+        with collect_timings() as timings:
+            if name == "follower":
+                follower_timings.append(timings)
+            try:
+                outcomes[name] = client.coalesce(api_key, "search", work(api_key))
+            except requests.exceptions.RequestException as e:
+                outcomes[name] = e
+
+    leader = threading.Thread(target=call, args=("leader", "rejected"))
+    leader.start()
+    _wait_for(lambda: bool(runs))
+    follower = threading.Thread(target=call, args=("follower", "rejected"))
+    follower.start()
+    _wait_for(
+        lambda: (
+            bool(follower_timings)
+            and bool(follower_timings[0].counters.get("usda_coalesced"))
+        )
+    )
+
+    call("other key", "accepted")
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert runs == ["rejected", "accepted"], runs
+    assert outcomes["other key"] == "accepted", outcomes
+    assert isinstance(outcomes["leader"], requests.exceptions.HTTPError), outcomes
+    assert outcomes["follower"] is outcomes["leader"], outcomes
+
+
+def _wait_for(condition: Callable[[], bool], timeout: float = 5.0) -> None:
+    """Poll until another thread has reached a known point."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for another thread")
+        time.sleep(0.001)
+
+
+CHECKS: List[Callable[[], None]] = [
+    check_retries_transient_failures,
+    check_gives_up_after_max_attempts,
+    check_client_errors_are_not_retried,
+    check_retry_after_is_honoured,
+    check_long_retry_after_is_not_waited_for,
+    check_breaker_opens_and_half_opens,
+    check_token_bucket_refuses_long_waits,
+    check_default_burst_covers_full_searches,
+    check_coalescing_is_per_api_key,
+]
+
+
+def run_checks(log: Callable[[str], None] = print) -> int:
+    """
+    Run every check and report each outcome.
+
+    Returns:
+        Number of checks that failed
+    """
+    failed = 0
+    for check in CHECKS:
+        try:
+            check()
+        except AssertionError as e:
+            failed += 1
+            log(f"FAIL {check.__name__}: {e}")
+        else:
+            log(f"ok   {check.__name__}")
+    return failed
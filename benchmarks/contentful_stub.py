@@ -0,0 +1,168 @@
+"""
+Local stand-in for the Contentful Content Delivery API.
+
+Serves seeded synthetic blog posts in the shape the ``contentful`` client
+expects, so the blog endpoints can be load tested without a Contentful
+space. Point the app at it with ``CONTENTFUL_API_URL`` and
+``CONTENTFUL_HTTPS=false``.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from server.config import CONTENTFUL_CONTENT_TYPE_ID
+
+WORDS = (
+    "protein fibre budget pantry legumes oats lentils micronutrients iron "
+    "calcium planning staples optimiser servings vegetables grains"
+).split()
+
+CONTENT_TYPE: Dict[str, Any] = {
+    "sys": {"id": CONTENTFUL_CONTENT_TYPE_ID, "type": "ContentType"},
+    "name": "Blog Post",
+    "displayField": "title",
+    "fields": [
+        {"id": "title", "name": "Title", "type": "Symbol"},
+        {"id": "slug", "name": "Slug", "type": "Symbol"},
+        {"id": "summary", "name": "Summary", "type": "Text"},
+        {"id": "content", "name": "Content", "type": "Text"},
+    ],
+}
+
+
+def generate_posts(num_posts: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Generate blog post entries in the Content Delivery API's JSON shape.
+
+    Args:
+        num_posts: Number of posts
+        seed: Seed for the generated text
+
+    Returns:
+        Entries, newest first
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    entries: List[Dict[str, Any]] = []
+    for i in range(num_posts):
+        title = " ".join(rng.choice(WORDS) for _ in range(5)).capitalize()
+        paragraphs = [" ".join(rng.choice(WORDS) for _ in range(80)) for _ in range(12)]
+        created = (start + timedelta(days=i)).isoformat().replace("+00:00", "Z")
+        entries.append(
+            {
+                "sys": {
+                    "id": f"post{i}",
+                    "type": "Entry",
+                    "createdAt": created,
+                    "updatedAt": created,
+                    "locale": "en-US",
+                    "contentType": {
+                        "sys": {
+                            "type": "Link",
+                            "linkType": "ContentType",
+                            "id": CONTENTFUL_CONTENT_TYPE_ID,
+                        }
+                    },
+                },
+                "fields": {
+                    "title": title,
+                    "slug": f"post-{i}",
+                    "summary": paragraphs[0][:200],
+                    "content": f"![cover](//images.example/{i}.png)\n\n"
+                    + "\n\n".join(paragraphs),
+                },
+            }
+        )
+    entries.reverse()
+    return entries
+
+
+class ContentfulStubHandler(BaseHTTPRequestHandler):
+    """Request handler answering ``entries`` and ``content_types`` queries."""
+
+    server: "ContentfulStubServer"
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        parts = url.path.strip("/").split("/")
+        space = parts[1] if len(parts) > 1 and parts[0] == "spaces" else "space"
+        links = {
+            "space": {"sys": {"type": "Link", "linkType": "Space", "id": space}},
+            "environment": {
+                "sys": {"type": "Link", "linkType": "Environment", "id": "master"}
+            },
+        }
+
+        items: List[Dict[str, Any]]
+        if url.path.endswith("/content_types"):
+            items = [CONTENT_TYPE]
+        elif url.path.endswith("/entries"):
+            items = self.server.posts
+            if "fields.slug" in query:
+                items = [
+                    post
+                    for post in items
+                    if post["fields"]["slug"] == query["fields.slug"]
+                ]
+            items = items[: int(query.get("limit", "100"))]
+            items = [{**item, "sys": {**item["sys"], **links}} for item in items]
+        else:
+            self.send_error(404)
+            return
+
+        body = json.dumps(
+            {
+                "sys": {"type": "Array"},
+                "total": len(items),
+                "skip": 0,
+                "limit": len(items),
+                "items": items,
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.contentful.delivery.v1+json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class ContentfulStubServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the synthetic posts it serves."""
+
+    daemon_threads = True
+
+    def __init__(self, num_posts: int = 20, seed: int = 0, port: int = 0) -> None:
+        super().__init__(("127.0.0.1", port), ContentfulStubHandler)
+        self.posts = generate_posts(num_posts, seed)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def api_url(self) -> str:
+        """Host and port to set as ``CONTENTFUL_API_URL``."""
+        host, port = self.server_address[:2]
+        return f"{str(host)}:{port}"
+
+    def start(self) -> "ContentfulStubServer":
+        """Serve requests from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the socket."""
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,82 @@
+"""
+Replay of a recorded optimisation corpus as benchmark cases.
+
+Every case in a corpus directory written by
+``server.services.optimisation_corpus`` becomes one benchmark case that runs
+an optimisation engine on the recorded inputs. The default engine is
+``optimise_diet``; any function with the same signature can be named as
+``module:function`` instead, so two engines can be replayed over the same
+corpus and their result files compared.
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.cases import Case, Prepared, summarise_optimisation
+from server.services.optimisation_corpus import corpus_paths, read_case
+
+DEFAULT_ENGINE = "server.services.optimisation:optimise_diet"
+
+Engine = Callable[..., Optional[Dict[str, Any]]]
+
+
+def _no_cleanup() -> None:
+    pass
+
+
+def load_engine(spec: str) -> Engine:
+    """
+    Import an engine named as ``module:function``.
+
+    Raises:
+        ValueError: If the spec is malformed or does not name a callable
+    """
+    module_name, _, function_name = spec.partition(":")
+    if not module_name or not function_name:
+        raise ValueError(f"Engine must be given as module:function, not {spec!r}")
+    engine: Any = getattr(importlib.import_module(module_name), function_name, None)
+    if not callable(engine):
+        raise ValueError(f"{spec} is not a function")
+    loaded: Engine = engine
+    return loaded
+
+
+def corpus_case(path: str, engine: Engine) -> Case:
+    """Benchmark ``engine`` on one recorded case."""
+    case = read_case(path)
+
+    def prepare() -> Prepared:
+        return (
+            lambda: engine(
+                case.foods,
+                case.costs,
+                case.max_servings,
+                case.nutrient_goals,
+                case.lower_bounds,
+                case.upper_bounds,
+            ),
+            _no_cleanup,
+        )
+
+    return Case(
+        f"corpus/{case.case_id}/n={len(case.foods)}",
+        prepare,
+        summarise=summarise_optimisation,
+    )
+
+
+def corpus_cases(directory: str, engine_spec: str = DEFAULT_ENGINE) -> List[Case]:
+    """
+    Build one case per recorded input in a corpus directory.
+
+    Args:
+        directory: Corpus directory
+        engine_spec: Engine to run, as ``module:function``
+
+    Returns:
+        Cases in a stable order
+    """
+    engine = load_engine(engine_spec)
+    return [corpus_case(path, engine) for path in corpus_paths(directory)]
@@ -0,0 +1,384 @@
+"""
+Load test of the app as deployed, against local stubs of its upstreams.
+
+Each configuration starts the server through ``run.sh``, so under gunicorn
+with ``server/gunicorn_config.py``, with the worker settings passed in
+``GUNICORN_CMD_ARGS``. USDA and Contentful are replaced by the local stubs
+through ``USDA_API_ENDPOINT`` and ``CONTENTFUL_API_URL``. Once every worker
+reports ready, closed-loop clients send a seeded mix of traffic for a fixed
+time, and the latencies after the warm-up period are summarised per
+endpoint.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+
+from benchmarks.contentful_stub import ContentfulStubServer
+from benchmarks.synthetic import generate_foods, generate_goal_profile
+from benchmarks.usda_stub import USDAStubServer
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CLIENT_INDEX = os.path.join(REPO_ROOT, "client", "dist", "index.html")
+
+# Relative weights of each kind of request in the traffic mix.
+TRAFFIC_MIX: Tuple[Tuple[str, int], ...] = (
+    ("search", 20),
+    ("calculate", 25),
+    ("optimise/n=10", 15),
+    ("optimise/n=50", 10),
+    ("optimise/n=200", 5),
+    ("posts", 10),
+    ("static", 15),
+)
+SEARCH_TERMS = 200
+SEARCH_HITS = 2000
+READY_TIMEOUT_SECONDS = 60
+REQUEST_TIMEOUT_SECONDS = 60
+
+
+class LoadConfig(NamedTuple):
+    """Worker settings of one server under test."""
+
+    workers: int
+    threads: int
+
+    @property
+    def name(self) -> str:
+        return f"workers={self.workers}/threads={self.threads}"
+
+    def gunicorn_args(self, timeout: int) -> str:
+        worker_class = "gthread" if self.threads > 1 else "sync"
+        return (
+            f"--workers {self.workers} --threads {self.threads}"
+            f" --worker-class {worker_class} --timeout {timeout}"
+        )
+
+
+class Sample(NamedTuple):
+    """One completed request."""
+
+    kind: str
+    started: float
+    latency: float
+    ok: bool
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def _optimise_body(num_foods: int, seed: int) -> Dict[str, Any]:
+    foods = generate_foods(num_foods, seed)
+    goals, lower_bounds, upper_bounds = generate_goal_profile("easy", foods, seed)
+    return {
+        "selected_foods": foods,
+        "nutrient_goals": {
+            **goals,
+            "lower_bounds": lower_bounds,
+            "upper_bounds": upper_bounds,
+        },
+        "age": 30,
+        "gender": "m",
+    }
+
+
+def build_requests(seed: int) -> Dict[str, List[Tuple[str, str, Optional[Any]]]]:
+    """
+    Prepare the requests of each kind in the mix.
+
+    Static requests are left out when the client has not been built, as the
+    server would answer every one with a 404.
+
+    Returns:
+        For each kind, the ``(method, path, json body)`` variants to pick from
+    """
+    rng = random.Random(seed)
+    calculate = [
+        {
+            "gender": rng.choice(["m", "f"]),
+            "weight": rng.randint(50, 110),
+            "height": rng.randint(150, 195),
+            "age": rng.randint(19, 80),
+            "protein": 30,
+            "carbohydrate": 40,
+            "fats": 30,
+            "activity": rng.choice([1.2, 1.375, 1.55, 1.725]),
+            "percentage": rng.choice([80, 100, 110]),
+        }
+        for _ in range(50)
+    ]
+    search = [
+        {"query": f"food {i}", "api_key": f"load-key-{i % 10}", "paged": True}
+        for i in range(SEARCH_TERMS)
+    ]
+    requests_by_kind: Dict[str, List[Tuple[str, str, Optional[Any]]]] = {
+        "search": [("POST", "/api/search_food", body) for body in search],
+        "calculate": [("POST", "/api/calculate", body) for body in calculate],
+        "posts": [("GET", "/api/posts", None)],
+    }
+    if os.path.exists(CLIENT_INDEX):
+        requests_by_kind["static"] = [("GET", "/", None)]
+    else:
+        print("No client build; leaving static requests out", file=sys.stderr)
+    for kind, _ in TRAFFIC_MIX:
+        if kind.startswith("optimise/n="):
+            num_foods = int(kind.split("=")[1])
+            requests_by_kind[kind] = [
+                ("POST", "/api/optimise", _optimise_body(num_foods, seed + i))
+                for i in range(3)
+            ]
+    return requests_by_kind
+
+
+def start_server(
+    config: LoadConfig, env: Dict[str, str], log_path: str
+) -> Tuple[subprocess.Popen[bytes], str]:
+    """
+    Start the app with ``run.sh`` and wait until every worker is ready.
+
+    Returns:
+        Tuple of (server process, base URL)
+
+    Raises:
+        RuntimeError: If the server does not become ready in time
+    """
+    port = _free_port()
+    with open(log_path, "ab") as log:
+        process = subprocess.Popen(
+            ["sh", os.path.join(REPO_ROOT, "run.sh")],
+            cwd=REPO_ROOT,
+            env={
+                **env,
+                "PORT": str(port),
+                "GUNICORN_CMD_ARGS": config.gunicorn_args(REQUEST_TIMEOUT_SECONDS),
+            },
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    base_url = f"http://127.0.0.1:{port}"
+
+    # Readiness is per worker, so wait for a run of ready answers long
+    # enough that every worker has most likely answered one.
+    needed = config.workers * 4
+    streak = 0
+    deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+    while streak < needed:
+        if process.poll() is not None or time.monotonic() > deadline:
+            stop_server(process)
+            raise RuntimeError(f"Server did not become ready; see {log_path}")
+        try:
+            ready = requests.get(f"{base_url}/healthz/ready", timeout=2).ok
+        except requests.exceptions.RequestException:
+            ready = False
+        streak = streak + 1 if ready else 0
+        if not ready:
+            time.sleep(0.2)
+    return process, base_url
+
+
+def stop_server(process: subprocess.Popen[bytes]) -> None:
+    """Stop gunicorn and its workers."""
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+
+def drive(
+    base_url: str,
+    requests_by_kind: Dict[str, List[Tuple[str, str, Optional[Any]]]],
+    concurrency: int,
+    duration: float,
+    seed: int,
+) -> List[Sample]:
+    """
+    Send the traffic mix from closed-loop clients for ``duration`` seconds.
+
+    Each client sends its next request as soon as the previous one answers.
+    """
+    mix = [(kind, weight) for kind, weight in TRAFFIC_MIX if kind in requests_by_kind]
+    kinds = [kind for kind, _ in mix]
+    weights = [weight for _, weight in mix]
+    samples: List[Sample] = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(index: int) -> None:
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        local: List[Sample] = []
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            method, path, body = rng.choice(requests_by_kind[kind])
+            started = time.perf_counter()
+            try:
+                response = session.request(
+                    method, base_url + path, json=body, timeout=REQUEST_TIMEOUT_SECONDS
+                )
+                ok = response.ok
+            except requests.exceptions.RequestException:
+                ok = False
+            local.append(Sample(kind, started, time.perf_counter() - started, ok))
+        with lock:
+            samples.extend(local)
+
+    threads = [
+        threading.Thread(target=client, args=(i,), daemon=True)
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarise(samples: Sequence[Sample], seconds: float) -> Dict[str, Any]:
+    """Count, errors, throughput and latency percentiles of some requests."""
+    if not samples:
+        return {"requests": 0, "errors": 0, "throughput": 0.0}
+    latencies = np.array([sample.latency for sample in samples])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "requests": len(samples),
+        "errors": sum(not sample.ok for sample in samples),
+        "throughput": len(samples) / seconds,
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+    }
+
+
+def run_load(
+    configs: Sequence[LoadConfig],
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Load test each server configuration in turn with the same traffic.
+
+    Args:
+        configs: Worker settings to compare
+        concurrency: Number of closed-loop clients
+        duration: Seconds of measured traffic per configuration
+        warmup: Seconds of traffic sent first and left out of the results
+        seed: Seed for the generated requests and the traffic mix
+
+    Returns:
+        Results with a summary per endpoint and overall for each configuration
+    """
+    requests_by_kind = build_requests(seed)
+    usda = USDAStubServer(SEARCH_HITS, seed).start()
+    contentful = ContentfulStubServer(seed=seed).start()
+    work_dir = tempfile.mkdtemp(prefix="knapsnack-load-")
+    env = {
+        **os.environ,
+        "USDA_API_ENDPOINT": usda.url,
+        "USDA_RATE_PER_SECOND": "1000000",
+        "USDA_RATE_BURST": "1000000",
+        "CONTENTFUL_API_URL": contentful.api_url,
+        "CONTENTFUL_HTTPS": "false",
+        "CONTENTFUL_SPACE_ID": "load",
+        "CONTENTFUL_ACCESS_TOKEN": "load",
+        "LOG_FILE": os.path.join(work_dir, "app.log"),
+        "PROMETHEUS_MULTIPROC_DIR": os.path.join(work_dir, "metrics"),
+        "PYTHONPATH": REPO_ROOT,
+    }
+
+    runs: List[Dict[str, Any]] = []
+    try:
+        for config in configs:
+            log_path = os.path.join(work_dir, f"gunicorn-{len(runs)}.log")
+            process, base_url = start_server(config, env, log_path)
+            try:
+                started = time.perf_counter()
+                samples = drive(
+                    base_url, requests_by_kind, concurrency, warmup + duration, seed
+                )
+            finally:
+                stop_server(process)
+
+            measured = [s for s in samples if s.started >= started + warmup]
+            seconds = max(
+                (max(s.started + s.latency for s in measured) - started - warmup)
+                if measured
+                else duration,
+                1e-9,
+            )
+            endpoints = {
+                kind: summarise([s for s in measured if s.kind == kind], seconds)
+                for kind, _ in TRAFFIC_MIX
+                if kind in requests_by_kind
+            }
+            runs.append(
+                {
+                    "config": config._asdict(),
+                    "name": config.name,
+                    "seconds": seconds,
+                    "endpoints": endpoints,
+                    "total": summarise(measured, seconds),
+                }
+            )
+            print(_format_run(runs[-1]), file=sys.stderr)
+    finally:
+        usda.stop()
+        contentful.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "concurrency": concurrency,
+            "duration": duration,
+            "warmup": warmup,
+            "seed": seed,
+            "mix": {
+                kind: weight for kind, weight in TRAFFIC_MIX if kind in requests_by_kind
+            },
+            "cpus": os.cpu_count(),
+        },
+        "runs": runs,
+    }
+
+
+def _format_row(name: str, summary: Dict[str, Any]) -> str:
+    if not summary["requests"]:
+        return f"  {name:<18} {0:>7}"
+    return (
+        f"  {name:<18} {summary['requests']:>7} {summary['errors']:>6}"
+        f" {summary['throughput']:>8.1f} {summary['p50'] * 1000:>9.1f}"
+        f" {summary['p95'] * 1000:>9.1f} {summary['p99'] * 1000:>9.1f}"
+    )
+
+
+def _format_run(run: Dict[str, Any]) -> str:
+    lines = [
+        run["name"],
+        f"  {'endpoint':<18} {'reqs':>7} {'errors':>6} {'req/s':>8}"
+        f" {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}",
+    ]
+    lines += [_format_row(kind, summary) for kind, summary in run["endpoints"].items()]
+    lines.append(_format_row("total", run["total"]))
+    return "\n".join(lines)
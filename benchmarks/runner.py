@@ -0,0 +1,244 @@
+"""
+Measurement and result files for the benchmark suite.
+"""
+
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.cases import Case
+from server.utils.solver_utils import set_deterministic
+from server.utils.timing import collect_timings
+
+RESULTS_VERSION = 1
+
+
+def measure_case(
+    case: Case, repeats: int = 3, measure_memory: bool = True
+) -> Dict[str, Any]:
+    """
+    Run one case and collect its timings, solve count and peak memory.
+
+    The per-stage breakdown comes from the last timed run.
+
+    Peak memory is taken from a separate traced run because ``tracemalloc``
+    slows allocation-heavy code enough to distort the timings.
+
+    Args:
+        case: Case to run
+        repeats: Number of timed runs, unless the case sets its own
+        measure_memory: Whether to do the extra traced run
+
+    Returns:
+        Result record for the case
+    """
+    run, cleanup = case.prepare()
+    try:
+        timings: List[float] = []
+        outcome: Any = None
+        solves: Optional[int] = None
+        solver: Dict[str, float] = {}
+        stages: Dict[str, float] = {}
+
+        for _ in range(case.repeats or repeats):
+            with collect_timings(solver_stats=True) as collected:
+                start = time.perf_counter()
+                outcome = run()
+                timings.append(time.perf_counter() - start)
+            solves = int(collected.counters.get("solves", 0))
+            solver = {
+                name: collected.counters.get(f"solver_{name}", 0)
+                for name in ("nodes", "iterations")
+            }
+            stages = collected.stages
+
+        peak_memory: Optional[int] = None
+        if measure_memory:
+            tracemalloc.start()
+            try:
+                run()
+                peak_memory = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    finally:
+        cleanup()
+
+    summarise: Callable[[Any], Dict[str, Any]] = case.summarise or (lambda _: {})
+    return {
+        "name": case.name,
+        "repeats": len(timings),
+        "wall_time": {
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "mean": statistics.fmean(timings),
+            "max": max(timings),
+        },
+        "solve_count": solves,
+        "solver": solver,
+        "stages": stages,
+        "peak_memory_bytes": peak_memory,
+        "outcome": summarise(outcome),
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(
+    cases: List[Case],
+    repeats: int = 3,
+    measure_memory: bool = True,
+    seed: int = 0,
+    deterministic: bool = True,
+    log: Callable[[str], None] = print,
+) -> Dict[str, Any]:
+    """
+    Run every case and assemble the machine-readable result document.
+
+    Args:
+        cases: Cases to run, in order
+        repeats: Default number of timed runs per case
+        measure_memory: Whether to measure peak memory
+        seed: Seed the cases were built with, recorded for reproducibility
+        deterministic: Run CBC single-threaded with fixed seeds, so repeated
+            runs explore the same search tree
+        log: Progress callback, one line per finished case
+
+    Returns:
+        Result document ready to be written with ``write_results``
+    """
+    set_deterministic(deterministic)
+
+    records: List[Dict[str, Any]] = []
+    for case in cases:
+        record = measure_case(case, repeats, measure_memory)
+        records.append(record)
+        log(
+            f"{record['name']:<42} {record['wall_time']['median'] * 1000:>10.2f} ms"
+            f"  solves={record['solve_count']}"
+            f"  nodes={record['solver'].get('nodes', 0):.0f}"
+            f"  iterations={record['solver'].get('iterations', 0):.0f}"
+        )
+
+    return {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeats": repeats,
+            "deterministic": deterministic,
+        },
+        "cases": records,
+    }
+
+
+def write_results(results: Dict[str, Any], path: str) -> None:
+    """Write a result document as indented JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+
+
+def read_results(path: str) -> Dict[str, Any]:
+    """Read a result document written by ``write_results``."""
+    with open(path, encoding="utf-8") as f:
+        results: Dict[str, Any] = json.load(f)
+    if results.get("version") != RESULTS_VERSION:
+        raise ValueError(f"Unsupported results version in {path}")
+    return results
+
+
+def compare_results(
+    baseline: Dict[str, Any],
+    candidate: Dict[str, Any],
+    threshold: float = 0.1,
+    min_delta: float = 0.001,
+) -> List[Dict[str, Any]]:
+    """
+    Diff two result documents case by case.
+
+    A case regresses when its median wall time or peak memory grows by more
+    than ``threshold``, or when its solve count or outcome changes at all.
+    Timing changes smaller than ``min_delta`` seconds are treated as noise so
+    that sub-millisecond cases do not flap.
+
+    Args:
+        baseline: Result document to compare against
+        candidate: Result document under test
+        threshold: Allowed relative growth before flagging a regression
+        min_delta: Smallest absolute slowdown in seconds worth flagging
+
+    Returns:
+        One row per case present in either document
+    """
+    base_cases = {case["name"]: case for case in baseline["cases"]}
+    cand_cases = {case["name"]: case for case in candidate["cases"]}
+
+    rows: List[Dict[str, Any]] = []
+    for name in list(base_cases) + [n for n in cand_cases if n not in base_cases]:
+        base = base_cases.get(name)
+        cand = cand_cases.get(name)
+        if base is None or cand is None:
+            rows.append(
+                {"name": name, "status": "added" if base is None else "removed"}
+            )
+            continue
+
+        time_ratio = _ratio(cand["wall_time"]["median"], base["wall_time"]["median"])
+        memory_ratio = _ratio(cand["peak_memory_bytes"], base["peak_memory_bytes"])
+
+        problems: List[str] = []
+        time_delta = cand["wall_time"]["median"] - base["wall_time"]["median"]
+        if (
+            time_ratio is not None
+            and time_ratio > 1 + threshold
+            and time_delta > min_delta
+        ):
+            problems.append("slower")
+        if memory_ratio is not None and memory_ratio > 1 + threshold:
+            problems.append("more memory")
+        if cand["solve_count"] != base["solve_count"]:
+            problems.append("solve count changed")
+        if cand["outcome"] != base["outcome"]:
+            problems.append("outcome changed")
+
+        rows.append(
+            {
+                "name": name,
+                "status": ", ".join(problems) if problems else "ok",
+                "regressed": bool(problems),
+                "base_median": base["wall_time"]["median"],
+                "median": cand["wall_time"]["median"],
+                "time_ratio": time_ratio,
+                "memory_ratio": memory_ratio,
+                "base_solves": base["solve_count"],
+                "solves": cand["solve_count"],
+            }
+        )
+    return rows
+
+
+def _ratio(value: Optional[float], base: Optional[float]) -> Optional[float]:
+    if value is None or base is None or base == 0:
+        return None
+    return value / base
@@ -0,0 +1,287 @@
+"""
+Seeded synthetic inputs for the benchmark suite.
+
+Foods are generated by perturbing the rows of ``client/public/sample.csv`` so
+that nutrient profiles keep realistic proportions (fruit is mostly water,
+nuts are mostly fat, and so on) while the set can grow to any size.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from server.config import (
+    CARB_CALORIES_PER_GRAM,
+    CSV_NUTRIENT_HEADER_MAP,
+    FAT_CALORIES_PER_GRAM,
+    NUTRIENT_MAP,
+    PROTEIN_CALORIES_PER_GRAM,
+    UNLIMITED_MAX_SERVING,
+)
+from server.data.nutrient_data import get_nutrient_bounds
+from server.services.calculation import adjust_nutrient_bounds
+from server.utils.nutrient_utils import standardise_nutrient_bounds
+
+SAMPLE_CSV_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "client", "public", "sample.csv")
+)
+
+GOAL_PROFILES = ("easy", "tight", "infeasible")
+
+REFERENCE_PERSON: Dict[str, Any] = {
+    "age": 30,
+    "gender": "m",
+    "daily_caloric_intake": 2500,
+}
+
+
+def load_archetypes(path: str = SAMPLE_CSV_PATH) -> List[Dict[str, Any]]:
+    """
+    Load the sample food list as archetypes for synthetic generation.
+
+    Args:
+        path: Path to a CSV file in the ``client/public/sample.csv`` format
+
+    Returns:
+        List of archetype dictionaries with per-serving nutrients
+    """
+    archetypes: List[Dict[str, Any]] = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            nutrients = {
+                key: float(row.get(header) or 0)
+                for header, key in CSV_NUTRIENT_HEADER_MAP.items()
+            }
+            archetypes.append(
+                {
+                    "description": row["Food Item"],
+                    "price": float(row["Price Per Serving"] or 0),
+                    "servingSize": float(row["Serving Size (g)"] or 100),
+                    "maxServing": float(row["Max Serving (g)"] or 0),
+                    "requires_integer_servings": row["Discrete Servings"] == "Yes",
+                    "nutrients": nutrients,
+                }
+            )
+    return archetypes
+
+
+def generate_foods(num_foods: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Generate a reproducible list of foods shaped like an optimise request.
+
+    Each food is a randomly chosen archetype with every nutrient, the price
+    and the serving size scaled by independent log-normal noise.
+
+    Args:
+        num_foods: Number of foods to generate
+        seed: Seed for the random generator
+
+    Returns:
+        List of food dictionaries as sent in ``selected_foods``
+    """
+    rng = np.random.default_rng(seed)
+    archetypes = load_archetypes()
+    nutrient_keys = list(NUTRIENT_MAP.keys())
+
+    foods: List[Dict[str, Any]] = []
+    picks = rng.integers(0, len(archetypes), size=num_foods)
+    nutrient_noise = rng.lognormal(0.0, 0.25, size=(num_foods, len(nutrient_keys)))
+    price_noise = rng.lognormal(0.0, 0.35, size=num_foods)
+    size_noise = rng.lognormal(0.0, 0.15, size=num_foods)
+
+    for i in range(num_foods):
+        base = archetypes[int(picks[i])]
+        nutrients = {
+            key: round(base["nutrients"][key] * float(nutrient_noise[i, j]), 4)
+            for j, key in enumerate(nutrient_keys)
+        }
+        foods.append(
+            {
+                "fdcId": f"synthetic-{seed}-{i}",
+                "description": f"{base['description']} #{i}",
+                "price": round(max(base["price"], 0.1) * float(price_noise[i]), 2),
+                "servingSize": round(base["servingSize"] * float(size_noise[i]), 1),
+                "maxServing": base["maxServing"],
+                "requires_integer_servings": base["requires_integer_servings"],
+                "must_include": False,
+                "nutrients": nutrients,
+            }
+        )
+    return foods
+
+
+def plant_servings(
+    foods: List[Dict[str, Any]], seed: int = 0
+) -> npt.NDArray[np.float64]:
+    """
+    Draw a serving vector that a goal profile is built around.
+
+    A handful of foods get a random number of servings, scaled so that the
+    plan lands near the reference calorie intake and clipped to each food's
+    maximum serving.
+
+    Args:
+        foods: Foods as returned by ``generate_foods``
+        seed: Seed for the random generator
+
+    Returns:
+        Array of servings per food, zero for foods outside the plan
+    """
+    rng = np.random.default_rng(seed)
+    num_foods = len(foods)
+    max_servings = np.array([max_servings_for(food) for food in foods])
+    chosen = rng.choice(num_foods, size=min(num_foods, 8), replace=False)
+
+    servings = np.zeros(num_foods)
+    servings[chosen] = rng.uniform(1.0, 5.0, size=len(chosen))
+
+    energy = np.array(
+        [
+            PROTEIN_CALORIES_PER_GRAM * food["nutrients"]["protein"]
+            + CARB_CALORIES_PER_GRAM * food["nutrients"]["carbohydrate"]
+            + FAT_CALORIES_PER_GRAM * food["nutrients"]["fats"]
+            for food in foods
+        ]
+    )
+    planted_energy = float(energy @ servings)
+    if planted_energy > 0:
+        servings *= REFERENCE_PERSON["daily_caloric_intake"] / planted_energy
+
+    servings[chosen] = np.clip(servings[chosen], 1.0, max_servings[chosen])
+    for i in np.flatnonzero(servings):
+        if foods[int(i)]["requires_integer_servings"]:
+            servings[i] = max(1.0, np.floor(servings[i]))
+    return servings
+
+
+def max_servings_for(food: Dict[str, Any]) -> float:
+    """Convert a food's max serving in grams into servings, as the API does."""
+    max_val = food.get("maxServing")
+    limit = float(max_val) if max_val else float(UNLIMITED_MAX_SERVING)
+    return limit / float(food["servingSize"])
+
+
+def generate_goal_profile(
+    profile: str, foods: List[Dict[str, Any]], seed: int = 0
+) -> Tuple[Dict[str, Any], Dict[str, float], Dict[str, float]]:
+    """
+    Build nutrient goals and bounds for a named difficulty profile.
+
+    Every profile is built around a planted plan from ``plant_servings`` so
+    that feasibility does not depend on luck with small food sets. ``easy``
+    asks for half the planted micronutrients with macros comfortably inside
+    the zero-overflow band, ``tight`` squeezes every requirement close to the
+    planted plan, and ``infeasible`` is ``easy`` with one upper limit set just
+    below its matching requirement. No single food breaks that limit, so the
+    feasibility heuristic passes and the overflow sweep runs to completion.
+
+    Args:
+        profile: One of ``GOAL_PROFILES``
+        foods: Foods as returned by ``generate_foods``
+        seed: Seed for the planted plan
+
+    Returns:
+        Tuple of (nutrient_goals, lower_bounds, upper_bounds)
+    """
+    if profile not in GOAL_PROFILES:
+        raise ValueError(f"Unknown goal profile: {profile}")
+
+    servings = plant_servings(foods, seed)
+    planted = {
+        key: float(sum(food["nutrients"][key] * s for food, s in zip(foods, servings)))
+        for key in NUTRIENT_MAP.keys()
+    }
+
+    lower_series, upper_series = get_nutrient_bounds(
+        REFERENCE_PERSON["age"], REFERENCE_PERSON["gender"]
+    )
+    lower_series, upper_series = adjust_nutrient_bounds(lower_series, upper_series)
+    reference_lower, reference_upper = standardise_nutrient_bounds(
+        lower_series, upper_series
+    )
+
+    lower_factor, macro_factor, upper_factor = (
+        (0.95, 1.03, 1.05) if profile == "tight" else (0.5, 1.04, 1.5)
+    )
+
+    nutrient_goals: Dict[str, Any] = {
+        macro: planted[macro] / macro_factor
+        for macro in ["protein", "carbohydrate", "fats"]
+    }
+    nutrient_goals["fibre"] = planted["fibre"] * lower_factor
+    nutrient_goals["saturated_fats"] = planted["saturated_fats"] * upper_factor
+
+    lower_bounds = {k: planted[k] * lower_factor for k in reference_lower}
+    upper_bounds = {
+        k: v
+        if profile != "tight" and v >= planted[k] * upper_factor
+        else planted[k] * upper_factor
+        for k, v in reference_upper.items()
+    }
+
+    if profile == "infeasible":
+        capped = min(
+            (k for k in upper_bounds if k in lower_bounds and lower_bounds[k] > 0),
+            key=lambda k: max(food["nutrients"][k] for food in foods) / lower_bounds[k],
+        )
+        upper_bounds[capped] = lower_bounds[capped] * 0.9
+
+    return nutrient_goals, lower_bounds, upper_bounds
+
+
+def generate_usda_food(fdc_id: int, rng: np.random.Generator) -> Dict[str, Any]:
+    """
+    Generate one food record shaped like a USDA FoodData Central search hit.
+
+    The nutrient list includes the tracked nutrients plus a handful of
+    untracked ones, as the real API does.
+
+    Args:
+        fdc_id: Identifier to assign to the food
+        rng: Random generator to draw values from
+
+    Returns:
+        Food dictionary with ``fdcId``, ``description`` and ``foodNutrients``
+    """
+    api_names = list(NUTRIENT_MAP.values()) + [
+        "Energy",
+        "Sugars, total including NLEA",
+        "Cholesterol",
+        "Vitamin D (D2 + D3)",
+        "Copper, Cu",
+    ]
+    values = rng.lognormal(1.0, 1.5, size=len(api_names))
+    return {
+        "fdcId": fdc_id,
+        "description": f"Synthetic food {fdc_id}",
+        "dataType": "SR Legacy",
+        "foodNutrients": [
+            {
+                "nutrientId": 1000 + j,
+                "nutrientName": name,
+                "unitName": "G",
+                "value": round(float(values[j]), 3),
+            }
+            for j, name in enumerate(api_names)
+        ],
+    }
+
+
+def generate_usda_foods(num_foods: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Generate a reproducible list of USDA-shaped food records.
+
+    Args:
+        num_foods: Number of foods to generate
+        seed: Seed for the random generator
+
+    Returns:
+        List of USDA search hit dictionaries
+    """
+    rng = np.random.default_rng(seed)
+    return [generate_usda_food(100000 + i, rng) for i in range(num_foods)]
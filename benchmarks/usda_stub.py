@@ -0,0 +1,140 @@
+"""
+Local stand-in for the USDA FoodData Central search endpoint.
+
+Serves seeded synthetic foods with the same pagination contract as
+``API_ENDPOINT`` so that ``search_foods`` can be exercised without network
+access or an API key.
+
+Faults can be injected to exercise the client's resilience: scripted
+``Fault`` responses are served in order, and after those a seeded fraction
+of requests fails with ``error_status``. Every request can also be delayed.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.synthetic import generate_usda_foods
+
+
+class Fault(NamedTuple):
+    """How the stub answers one request instead of serving its page."""
+
+    status: int = 200
+    delay: float = 0.0
+    retry_after: Optional[float] = None
+
+
+class USDAStubHandler(BaseHTTPRequestHandler):
+    """Request handler answering ``/fdc/v1/foods/search`` style queries."""
+
+    server: "USDAStubServer"
+
+    def do_GET(self) -> None:
+        fault = self.server.next_fault()
+        if fault.delay:
+            time.sleep(fault.delay)
+        if fault.status != 200:
+            self._send(fault.status, b'{"error": "injected fault"}', fault.retry_after)
+            return
+
+        query = parse_qs(urlparse(self.path).query)
+        page_size = int(query.get("pageSize", ["50"])[0])
+        page_number = int(query.get("pageNumber", ["1"])[0])
+
+        foods = self.server.foods
+        start = (page_number - 1) * page_size
+        body = json.dumps(
+            {
+                "totalHits": len(foods),
+                "currentPage": page_number,
+                "totalPages": (len(foods) + page_size - 1) // page_size,
+                "foods": foods[start : start + page_size],
+            }
+        ).encode("utf-8")
+        self._send(200, body)
+
+    def _send(
+        self, status: int, body: bytes, retry_after: Optional[float] = None
+    ) -> None:
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if retry_after is not None:
+                self.send_header("Retry-After", str(retry_after))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up waiting for a delayed response.
+            pass
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class USDAStubServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the synthetic food list it serves."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        total_hits: int,
+        seed: int = 0,
+        port: int = 0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        delay: float = 0.0,
+    ) -> None:
+        super().__init__(("127.0.0.1", port), USDAStubHandler)
+        self.foods: List[Dict[str, Any]] = generate_usda_foods(total_hits, seed)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.delay = delay
+        self.requests = 0
+        self._faults: Deque[Fault] = deque()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def inject(self, *faults: Fault) -> None:
+        """Queue faults to answer the next requests with, in order."""
+        with self._lock:
+            self._faults.extend(faults)
+
+    def next_fault(self) -> Fault:
+        """Count a request and decide how to answer it."""
+        with self._lock:
+            self.requests += 1
+            if self._faults:
+                return self._faults.popleft()
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return Fault(self.error_status, self.delay)
+            return Fault(delay=self.delay)
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass to ``search_foods`` as the API endpoint."""
+        host, port = self.server_address[:2]
+        return f"http://{str(host)}:{port}/fdc/v1/foods/search"
+
+    def start(self) -> "USDAStubServer":
+        """Serve requests from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the socket."""
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
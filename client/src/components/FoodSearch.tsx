@@ -99,6 +99,9 @@ const FoodSearch = ({
     new Set(),
   );
   const [hasSearched, setHasSearched] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [totalHits, setTotalHits] = useState<number | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const searchResultsRef = useRef<HTMLDivElement>(null);
   const searchInputRef = useRef<HTMLInputElement>(null);
@@ -138,8 +141,10 @@ const FoodSearch = ({
     setLoading(true);
     setSearchError(null);
     try {
-      const { results } = await api.searchFood(searchTerm, apiKey);
-      setSearchResults(results);
+      const response = await api.searchFood(searchTerm, apiKey);
+      setSearchResults(response.results);
+      setNextCursor(response.nextCursor);
+      setTotalHits(response.totalHits ?? null);
       setHasSearched(true);
     } catch (err) {
       setSearchError(
@@ -148,12 +153,33 @@ const FoodSearch = ({
           : "An error occurred while searching",
       );
       setSearchResults([]);
+      setNextCursor(null);
+      setTotalHits(null);
       setHasSearched(false);
     } finally {
       setLoading(false);
     }
   };
 
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    setSearchError(null);
+    try {
+      const response = await api.searchFood(searchTerm, apiKey, nextCursor);
+      setSearchResults((prev) => [...prev, ...response.results]);
+      setNextCursor(response.nextCursor);
+    } catch (err) {
+      setSearchError(
+        err instanceof Error
+          ? err.message
+          : "An error occurred while loading more results",
+      );
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleFoodAdd = (food: FoodItem) => {
     onFoodSelect(food);
     setRecentlyAdded((prev) => new Set([...prev, food.fdcId]));
@@ -197,14 +223,23 @@ const FoodSearch = ({
 
   const handleCloseResults = () => {
     setSearchResults([]);
+    setNextCursor(null);
+    setTotalHits(null);
     setHasSearched(false);
   };
 
+  const resultCountLabel =
+    totalHits !== null && totalHits > searchResults.length
+      ? `${searchResults.length} of ${totalHits}`
+      : `${searchResults.length}`;
+
   const isAdded = (foodId: string | number): boolean =>
     selectedFoodIds.includes(foodId) || recentlyAdded.has(foodId);
 
+  const hasResults = searchResults.length > 0;
+
   useEffect(() => {
-    if (searchResults.length > 0 && searchResultsRef.current) {
+    if (hasResults && searchResultsRef.current) {
       setTimeout(() => {
         const element = searchResultsRef.current;
         if (!element) return;
@@ -213,7 +248,7 @@ const FoodSearch = ({
         window.scrollTo({ top: offsetPosition, behavior: "smooth" });
       }, 100);
     }
-  }, [searchResults.length]);
+  }, [hasResults]);
 
   useEffect(() => {
     const handleKeyDown = (e: KeyboardEvent) => {
@@ -462,7 +497,7 @@ const FoodSearch = ({
                     >
                       <div className="flex items-center justify-between border-b bg-muted/50 px-4 py-2">
                         <h6 className="text-sm font-semibold">
-                          Search Results ({searchResults.length} items)
+                          Search Results ({resultCountLabel} items)
                         </h6>
                         <Button
                           variant="ghost"
@@ -478,6 +513,22 @@ const FoodSearch = ({
                         itemHeight={60}
                         renderItem={renderFoodItem}
                       />
+                      {nextCursor && (
+                        <div className="flex justify-center border-t px-4 py-2">
+                          <Button
+                            variant="ghost"
+                            size="sm"
+                            onClick={handleLoadMore}
+                            disabled={loadingMore}
+                          >
+                            {loadingMore ? (
+                              <div className="h-4 w-4 animate-spin rounded-full border-2 border-primary border-t-transparent" />
+                            ) : (
+                              "Load more results"
+                            )}
+                          </Button>
+                        </div>
+                      )}
                     </motion.div>
                   )}
                 </AnimatePresence>
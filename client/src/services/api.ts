@@ -29,6 +29,9 @@ export interface ServiceConfig {
 
 export interface SearchFoodResponse {
   results: FoodItem[];
+  complete: boolean;
+  nextCursor: string | null;
+  totalHits?: number;
 }
 
 export interface NutritionCalculationRequest {
@@ -142,6 +145,9 @@ export interface UserInfo {
   smokingStatus: "yes" | "no";
 }
 
+// Lets the server reuse the previous solve when the user edits and re-runs.
+const sessionId = crypto.randomUUID();
+
 async function extractError(
   response: Response,
   fallback: string,
@@ -167,11 +173,18 @@ const api = {
     return response.json() as Promise<ServiceConfig>;
   },
 
-  async searchFood(query: string, apiKey: string): Promise<SearchFoodResponse> {
+  async searchFood(
+    query: string,
+    apiKey: string,
+    cursor?: string,
+  ): Promise<SearchFoodResponse> {
+    const body = cursor
+      ? { cursor, api_key: apiKey }
+      : { query, api_key: apiKey, paged: true };
     const response = await fetch(`${config.apiUrl}/search_food`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ query, api_key: apiKey }),
+      body: JSON.stringify(body),
     });
     if (!response.ok)
       throw new Error(await extractError(response, "Search failed"));
@@ -198,7 +211,10 @@ const api = {
   ): Promise<OptimisationResponse> {
     const response = await fetch(`${config.apiUrl}/optimise`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: {
+        "Content-Type": "application/json",
+        "X-Session-ID": sessionId,
+      },
       body: JSON.stringify(data),
     });
 
@@ -1,2 +1,2 @@
 #!/bin/sh
-exec gunicorn --bind 0.0.0.0:${PORT:-8000} server.app:app
+exec gunicorn --config python:server.gunicorn_config --bind 0.0.0.0:${PORT:-8000} server.app:app
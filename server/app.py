@@ -2,25 +2,32 @@
 Main Flask application for diet optimisation service.
 """
 
-import logging
+import csv
+import io
+import math
 import mimetypes
 import os
 import smtplib
+import threading
+import time
 from datetime import datetime, timedelta
 from email.message import EmailMessage
-from typing import List, Tuple, Union
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 import numpy as np
+import numpy.typing as npt
 import requests
 from dotenv import load_dotenv
 from flask import (
     Flask,
     Response,
+    g,
     jsonify,
     make_response,
     request,
     send_file,
     send_from_directory,
+    stream_with_context,
 )
 from flask_compress import Compress
 from flask_cors import CORS
@@ -28,14 +35,42 @@ from flask_cors import CORS
 from server.config import (
     AGE_MAX,
     AGE_MIN,
+    ALTERNATIVES_TIME_LIMIT_SECONDS,
     API_ENDPOINT,
     CACHE_CONTROL_SETTINGS,
+    CALCULATE_BATCH_MAX_PROFILES,
     CONTENT_SECURITY_POLICY,
     DEFAULT_PORT,
+    DIAGNOSIS_TIME_LIMIT_SECONDS,
+    FOOD_CATALOGUE_MAX_ENTRIES,
+    FOOD_IMPORT_MAX_ERRORS,
+    FOOD_IMPORT_MAX_ROWS,
+    FRONTIER_MAX_TRIPLES,
     HEIGHT_MAX,
     HEIGHT_MIN,
+    LARGE_SCALE_MAX_FOODS,
+    LARGE_SCALE_TIME_LIMIT_SECONDS,
+    LOG_FILE,
+    LOG_FORMAT,
+    LOG_LEVEL,
+    LOG_PAYLOAD_LIMIT,
+    MAX_ALTERNATIVE_PLANS,
+    MEAL_PLAN_DEFAULT_DAYS,
+    MEAL_PLAN_MAX_DAYS,
+    MEAL_PLAN_TIME_LIMIT_SECONDS,
+    METRICS_TOKEN,
+    NUTRIENT_MAP,
+    OPTIMISE_RECORD_DIR,
+    OPTIMISE_RECORD_RATE,
+    PROFILE_DIR,
+    PROFILE_SECRET,
     SECURITY_HEADERS,
-    UNLIMITED_MAX_SERVING,
+    SERVER_TIMING_ENABLED,
+    SESSION_CACHE_MAX_ENTRIES,
+    SESSION_CACHE_TTL_SECONDS,
+    SHARED_CATALOGUE_CHECK_SECONDS,
+    SHARED_CATALOGUE_DIR,
+    SOLVER_STATS_ENABLED,
     WEIGHT_MAX,
     WEIGHT_MIN,
 )
@@ -44,25 +79,83 @@ from server.services.blog_service import get_all_posts, get_post_by_slug
 from server.services.calculation import (
     adjust_nutrient_bounds,
     calculate_nutrition_requirements,
+    calculate_nutrition_requirements_batch,
     validate_age,
+    validate_batch_parameters,
     validate_input_parameters,
 )
-from server.services.food_service import search_foods
-from server.services.optimisation import analyse_feasibility, optimise_diet
+from server.services.column_generation import optimise_large_scale
+from server.services.diagnosis import diagnose_infeasibility
+from server.services.food_catalogue import (
+    FoodCatalogue,
+    catalogue_candidates,
+    resolve_foods,
+)
+from server.services.food_service import (
+    decode_cursor,
+    encode_cursor,
+    fetch_search_page,
+    search_foods,
+)
+from server.services.meal_plan import WeeklyBounds, optimise_meal_plan
+from server.services.optimisation import (
+    MAX_OVERFLOW_PERCENTAGE,
+    OVERFLOW_NUTRIENTS,
+    analyse_feasibility,
+    max_servings_for,
+    optimise_alternatives,
+    optimise_diet,
+    optimise_frontier,
+)
+from server.services.optimisation_corpus import record_inputs
+from server.services.session_cache import (
+    SESSION_HEADER,
+    SessionCache,
+    bounds_signature,
+    build_session_state,
+    plan_warm_start,
+    valid_session_id,
+)
+from server.services.shared_catalogue import SharedCatalogue
+from server.services.usda_client import USDARateLimited, USDAUnavailable
+from server.utils.food_csv import iter_food_csv_rows
+from server.utils.json_provider import FastJSONProvider, dumps
+from server.utils.logs import (
+    REQUEST_ID_HEADER,
+    TruncatedPayload,
+    configure_logging,
+    reset_request_id,
+    resolve_request_id,
+    set_request_id,
+)
+from server.utils.metrics import observe_request, render_metrics
+from server.utils.nutrient_utils import NUTRIENTS
+from server.utils.profiling import (
+    SamplingProfiler,
+    capture_request,
+    new_profile_id,
+    should_profile,
+    write_profile,
+)
 from server.utils.response_utils import create_error_response
+from server.utils.timing import (
+    begin_timings,
+    current_timings,
+    end_timings,
+    format_server_timing,
+    timed,
+)
+from server.warmup import start_warm_up, warm_up_report
 
 load_dotenv()
 
-logging.basicConfig(
-    level=logging.ERROR,
-    format="%(asctime)s %(levelname)s %(message)s",
-    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
-)
+configure_logging(LOG_LEVEL, LOG_FORMAT == "json", LOG_FILE or None)
 
 static_folder = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "..", "client", "dist")
 )
 app = Flask(__name__, static_folder=static_folder)
+app.json = FastJSONProvider(app)
 CORS(
     app,
     resources={
@@ -91,10 +184,109 @@ app.config["COMPRESS_LEVEL"] = 6
 app.config["COMPRESS_MIN_SIZE"] = 500
 Compress(app)
 
+session_cache = SessionCache(SESSION_CACHE_TTL_SECONDS, SESSION_CACHE_MAX_ENTRIES)
+food_catalogue = FoodCatalogue(FOOD_CATALOGUE_MAX_ENTRIES)
+shared_catalogue = (
+    SharedCatalogue(SHARED_CATALOGUE_DIR, SHARED_CATALOGUE_CHECK_SECONDS)
+    if SHARED_CATALOGUE_DIR
+    else None
+)
+
 ResponseType = Union[Response, Tuple[Response, int], Tuple[str, int]]
 ERR_NO_JSON = "No JSON data provided or Content-Type not set to application/json"
 
 
+@app.before_request
+def assign_request_id() -> None:
+    """Tag the request, and everything it logs, with a request id."""
+    g.request_id = resolve_request_id(request.headers.get(REQUEST_ID_HEADER))
+    g.request_id_token = set_request_id(g.request_id)
+
+
+@app.after_request
+def echo_request_id(response: Response) -> Response:
+    """Return the request id so clients can quote it when reporting issues."""
+    request_id = g.get("request_id")
+    if request_id is not None:
+        response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+
+@app.teardown_request
+def clear_request_id(exc: Optional[BaseException]) -> None:
+    """Detach the request id from the worker's logging context."""
+    token = g.pop("request_id_token", None)
+    if token is not None:
+        reset_request_id(token)
+
+
+@app.before_request
+def start_profiling() -> None:
+    """Start the sampling profiler for requests that opt in with the secret."""
+    if should_profile(request, PROFILE_SECRET):
+        g.profiled_request = capture_request(request)
+        g.profiler = SamplingProfiler(threading.get_ident()).start()
+
+
+@app.after_request
+def finish_profiling(response: Response) -> Response:
+    """
+    Write the profile and captured request for profiled requests.
+
+    The profiler keeps sampling until the response is closed, so a streamed
+    body is profiled as it is produced.
+    """
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        captured = g.profiled_request
+        profile_id = new_profile_id(captured["path"])
+        response.headers["X-Profile-Id"] = profile_id
+
+        def write() -> None:
+            profiler.stop()
+            write_profile(
+                profiler, captured, PROFILE_DIR, response.status_code, profile_id
+            )
+
+        response.call_on_close(write)
+    return response
+
+
+@app.before_request
+def start_request_timings() -> None:
+    """Open a timing context that service stages record into."""
+    data = request.get_json(silent=True) if request.is_json else None
+    solver_stats = (
+        SOLVER_STATS_ENABLED
+        or "profiler" in g
+        or (isinstance(data, dict) and data.get("debug") is True)
+    )
+    g.timings, g.timings_token = begin_timings(solver_stats)
+
+
+@app.after_request
+def record_request_metrics(response: Response) -> Response:
+    """Export the request's stage timings and counters as metrics."""
+    timings = g.get("timings")
+    if timings is not None and request.endpoint and request.path.startswith("/api/"):
+        observe_request(request.endpoint, timings)
+        if SERVER_TIMING_ENABLED:
+            response.headers["Server-Timing"] = format_server_timing(timings)
+    return response
+
+
+@app.teardown_request
+def close_request_timings(_: Optional[BaseException]) -> None:
+    """Close the timing context opened for the request."""
+    token = g.pop("timings_token", None)
+    if token is not None:
+        end_timings(token)
+
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.stop()
+
+
 @app.after_request
 def add_security_headers(response: Response) -> Response:
     """Add security headers to all responses"""
@@ -162,6 +354,42 @@ Canonical: https://knapsnack-b4b10d2b0910.herokuapp.com/.well-known/security.txt
     return response
 
 
+@app.route("/metrics", methods=["GET"])
+def metrics() -> ResponseType:
+    """Expose request metrics in the Prometheus text format."""
+    if METRICS_TOKEN and request.headers.get("Authorization") != (
+        f"Bearer {METRICS_TOKEN}"
+    ):
+        return create_error_response("Unauthorised", status_code=401)
+
+    rendered = render_metrics()
+    if rendered is None:
+        return create_error_response("Metrics are not available", status_code=503)
+
+    body, content_type = rendered
+    response = make_response(body)
+    response.headers["Content-Type"] = content_type
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+@app.route("/healthz/ready", methods=["GET"])
+def ready() -> ResponseType:
+    """
+    Readiness check that passes once this worker has warmed up.
+
+    Warm-up is normally started by the gunicorn ``post_fork`` hook; under
+    other servers the first check starts it.
+    """
+    start_warm_up()
+    report = warm_up_report()
+    response = jsonify({"ready": report is not None, "warmUp": report})
+    response.headers["Cache-Control"] = "no-store"
+    if report is None:
+        return response, 503
+    return response
+
+
 @app.route("/api/config", methods=["GET"])
 def get_config_api() -> Response:
     """API endpoint to fetch configuration constants."""
@@ -201,13 +429,29 @@ def get_post_api(slug: str) -> ResponseType:
 
 @app.route("/api/search_food", methods=["POST"])
 def search_food_api() -> ResponseType:
-    """API endpoint to search for foods using the USDA API."""
+    """
+    API endpoint to search for foods using the USDA API.
+
+    By default the first SEARCH_MAX_PAGES pages are returned at once. With
+    ``"paged": true`` only the first page is returned, and a request with
+    the response's ``nextCursor`` (and the API key) fetches the page after.
+    """
     try:
         data = request.json
         if data is None:
             return create_error_response(ERR_NO_JSON)
 
-        search_term = data.get("query")
+        cursor = data.get("cursor")
+        if cursor is not None:
+            decoded = decode_cursor(cursor) if isinstance(cursor, str) else None
+            if decoded is None:
+                return create_error_response("Invalid cursor")
+            search_term, page_number = decoded
+            paged = True
+        else:
+            search_term = data.get("query")
+            page_number = 1
+            paged = data.get("paged") is True
         api_key = data.get("api_key")
 
         if not search_term:
@@ -215,24 +459,172 @@ def search_food_api() -> ResponseType:
         if not api_key:
             return create_error_response("No API key provided")
 
-        app.logger.info(f"Searching for food: {search_term}")
-        search_results = search_foods(api_key, search_term, API_ENDPOINT)
-
-        return jsonify({"results": search_results})
+        app.logger.info("Searching for food: %s (page %d)", search_term, page_number)
+        payload: Dict[str, Any]
+        if paged:
+            page = fetch_search_page(api_key, search_term, page_number, API_ENDPOINT)
+            foods = page.foods
+            next_page = page_number + 1 if page_number < page.page_count else None
+            payload = {"complete": True, "totalHits": page.total_hits}
+        else:
+            search_results = search_foods(api_key, search_term, API_ENDPOINT)
+            if not search_results.complete:
+                app.logger.warning(
+                    "Returning %d foods for %s after a page failed",
+                    len(search_results.foods),
+                    search_term,
+                )
+            foods = search_results.foods
+            next_page = search_results.next_page
+            payload = {"complete": search_results.complete}
+
+        with timed("catalogue"):
+            for food in foods:
+                food_catalogue.register(
+                    food["description"], food["nutrients"], food["fdcId"]
+                )
+
+        with timed("serialise"):
+            return jsonify(
+                {
+                    "results": foods,
+                    **payload,
+                    "nextCursor": encode_cursor(search_term, next_page)
+                    if next_page is not None
+                    else None,
+                }
+            )
+    except (USDARateLimited, USDAUnavailable) as e:
+        app.logger.warning("USDA API request refused: %s", e)
+        if isinstance(e, USDARateLimited):
+            response, status = create_error_response(
+                "USDA API rate limit reached, try again shortly", status_code=429
+            )
+        else:
+            response, status = create_error_response(
+                "USDA API is unavailable, try again shortly", status_code=503
+            )
+        response.headers["Retry-After"] = str(math.ceil(e.retry_after))
+        return response, status
     except requests.exceptions.RequestException as e:
-        app.logger.exception(f"API request failed: {str(e)}")
+        app.logger.exception("API request failed: %s", e)
         return create_error_response("API request failed", status_code=500)
     except Exception as e:
-        app.logger.exception(f"An error occurred: {str(e)}")
+        app.logger.exception("An error occurred: %s", e)
         return create_error_response("An internal error has occurred", status_code=500)
 
 
+IMPORT_COLUMNS = [
+    "line",
+    "id",
+    "description",
+    "price",
+    "servingSize",
+    "maxServing",
+    "requires_integer_servings",
+    "must_include",
+]
+
+
+@app.route("/api/foods/import", methods=["POST"])
+def import_foods_api() -> ResponseType:
+    """
+    Import a food CSV into the catalogue.
+
+    The CSV is sent as the raw body or as a multipart ``file`` upload and is
+    parsed row by row from the request stream while results are streamed
+    back, so memory does not grow with the file. With ``?format=ids`` (the
+    default) each food is an object with its catalogue id; with
+    ``?format=matrix`` foods are rows under ``columns`` whose last entry holds
+    the nutrients per 100 g in ``nutrients`` order.
+    """
+    response_format = request.args.get("format", "ids")
+    if response_format not in ("ids", "matrix"):
+        return create_error_response("format must be 'ids' or 'matrix'")
+
+    upload = (
+        request.files.get("file") if request.mimetype == "multipart/form-data" else None
+    )
+    if upload:
+        # Request teardown closes uploaded files before a streamed response is
+        # read, so take the file over and close it when the import is done.
+        stream = upload.stream
+        upload.stream = io.BytesIO()
+    else:
+        stream = request.stream
+
+    def generate() -> Iterator[str]:
+        matrix = response_format == "matrix"
+        errors: List[Dict[str, Any]] = []
+        imported = rejected = 0
+
+        if matrix:
+            yield (
+                f'{{"nutrients":{dumps(NUTRIENTS)},'
+                f'"columns":{dumps(IMPORT_COLUMNS + ["nutrients"])},"foods":['
+            )
+        else:
+            yield '{"foods":['
+
+        def reject(line: int, message: str) -> None:
+            nonlocal rejected
+            rejected += 1
+            if len(errors) < FOOD_IMPORT_MAX_ERRORS:
+                errors.append({"line": line, "error": message})
+
+        lines = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+        line_number = 1
+        try:
+            for line_number, outcome in iter_food_csv_rows(lines):
+                if isinstance(outcome, str):
+                    reject(line_number, outcome)
+                    continue
+                if imported >= FOOD_IMPORT_MAX_ROWS:
+                    reject(
+                        line_number,
+                        f"Only the first {FOOD_IMPORT_MAX_ROWS} foods are imported",
+                    )
+                    break
+
+                scale = 100 / outcome["servingSize"]
+                per_100g = {
+                    key: value * scale for key, value in outcome["nutrients"].items()
+                }
+                food_id = food_catalogue.register(outcome["description"], per_100g)
+                values = [
+                    line_number,
+                    food_id,
+                    *(outcome[column] for column in IMPORT_COLUMNS[2:]),
+                ]
+
+                separator = "," if imported else ""
+                if matrix:
+                    row = [*values, [per_100g[key] for key in NUTRIENTS]]
+                    yield separator + dumps(row)
+                else:
+                    yield separator + dumps(dict(zip(IMPORT_COLUMNS, values)))
+                imported += 1
+        except (csv.Error, UnicodeDecodeError) as e:
+            reject(line_number, f"The file could not be read past this line: {e}")
+        finally:
+            lines.close()
+
+        yield (
+            f'],"errors":{dumps(errors)},"imported":{imported},"rejected":{rejected}}}'
+        )
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
 @app.route("/api/calculate", methods=["POST"])
 def calculate_api() -> ResponseType:
     """Calculate nutritional requirements based on user parameters."""
     try:
         data = request.json
-        app.logger.debug(f"Received calculation request with data: {data}")
+        app.logger.debug(
+            "Received calculation request with data: %s",
+            TruncatedPayload(data, LOG_PAYLOAD_LIMIT),
+        )
 
         if data is None:
             return create_error_response(ERR_NO_JSON)
@@ -267,22 +659,255 @@ def calculate_api() -> ResponseType:
             smoking_status,
         )
 
-        app.logger.debug(f"Calculation result: {result}")
+        app.logger.debug(
+            "Calculation result: %s", TruncatedPayload(result, LOG_PAYLOAD_LIMIT)
+        )
         return jsonify(result)
 
     except KeyError as e:
-        app.logger.exception(f"Missing required field: {str(e)}")
+        app.logger.exception("Missing required field: %s", e)
         return create_error_response(f"A required field is missing: {str(e)}")
     except ValueError as e:
-        app.logger.exception(f"Invalid value: {str(e)}")
+        app.logger.exception("Invalid value: %s", e)
         return create_error_response(f"An invalid value was provided: {str(e)}")
     except Exception as e:
-        app.logger.exception(f"Error occurred: {str(e)}")
+        app.logger.exception("Error occurred: %s", e)
+        return create_error_response(
+            "An internal server error has occurred.", status_code=500
+        )
+
+
+@app.route("/api/calculate/batch", methods=["POST"])
+def calculate_batch_api() -> ResponseType:
+    """Calculate nutritional requirements for parallel arrays of people."""
+    try:
+        data = request.json
+        app.logger.debug("Received batch calculation request")
+
+        if data is None:
+            return create_error_response(ERR_NO_JSON)
+
+        arrays, validation_errors = validate_batch_parameters(
+            data,
+            CALCULATE_BATCH_MAX_PROFILES,
+            AGE_MIN,
+            AGE_MAX,
+            WEIGHT_MIN,
+            WEIGHT_MAX,
+            HEIGHT_MIN,
+            HEIGHT_MAX,
+        )
+        if arrays is None:
+            return create_error_response("Validation failed", validation_errors)
+
+        result = calculate_nutrition_requirements_batch(
+            arrays["is_male"],
+            arrays["weight"],
+            arrays["height"],
+            arrays["age"],
+            arrays["protein"] / 100,
+            arrays["carbohydrate"] / 100,
+            arrays["fats"] / 100,
+            arrays["activity"],
+            arrays["percentage"] / 100,
+            arrays["is_smoker"],
+        )
+
+        with timed("serialise"):
+            return jsonify(result)
+
+    except Exception as e:
+        app.logger.exception("Error occurred during batch calculation: %s", e)
         return create_error_response(
             "An internal server error has occurred.", status_code=500
         )
 
 
+class OptimisationInputs(NamedTuple):
+    """Validated inputs shared by the optimisation endpoints."""
+
+    selected_foods: List[Dict[str, Any]]
+    costs: npt.NDArray[np.float64]
+    max_servings: List[float]
+    nutrient_goals: Dict[str, Any]
+    lower_bounds: Any
+    upper_bounds: Any
+    has_custom_bounds: bool
+
+
+def parse_optimisation_request(
+    data: Dict[str, Any],
+) -> Union[OptimisationInputs, str]:
+    """
+    Validate an optimisation request and resolve its nutrient bounds.
+
+    Args:
+        data: Parsed JSON body of the request
+
+    Returns:
+        The prepared inputs, or an error message for the client
+    """
+    nutrient_goals = data["nutrient_goals"]
+    selected_foods_data = data["selected_foods"]
+    age = int(data["age"])
+    gender = data["gender"]
+    smoking_status = data.get("smokingStatus", "no")
+
+    if error := validate_age(age, AGE_MIN, AGE_MAX):
+        return error
+
+    if not selected_foods_data:
+        return "No foods selected"
+
+    selected_foods_data = resolve_foods(
+        selected_foods_data, food_catalogue, shared_catalogue
+    )
+    if isinstance(selected_foods_data, str):
+        return selected_foods_data
+
+    costs = np.array([food["price"] for food in selected_foods_data])
+
+    max_servings_list = [max_servings_for(food) for food in selected_foods_data]
+
+    has_custom_bounds = False
+    with timed("bounds"):
+        lower_bounds, upper_bounds = get_nutrient_bounds(age, gender)
+
+    if (
+        "lower_bounds" in nutrient_goals
+        and nutrient_goals["lower_bounds"]
+        and "upper_bounds" in nutrient_goals
+        and nutrient_goals["upper_bounds"]
+    ):
+        has_custom_bounds = True
+        lower_bounds, upper_bounds = adjust_nutrient_bounds(
+            lower_bounds,
+            upper_bounds,
+            nutrient_goals["lower_bounds"],
+            nutrient_goals["upper_bounds"],
+            smoking_status,
+        )
+
+        if "fibre" in lower_bounds:
+            nutrient_goals["fibre"] = lower_bounds["fibre"]
+        if "saturated_fats" in upper_bounds:
+            nutrient_goals["saturated_fats"] = upper_bounds["saturated_fats"]
+
+        app.logger.info("Using custom nutrient bounds from request")
+    else:
+        lower_bounds, upper_bounds = adjust_nutrient_bounds(
+            lower_bounds, upper_bounds, smoking_status=smoking_status
+        )
+        app.logger.info("Using default nutrient bounds")
+
+    return OptimisationInputs(
+        selected_foods_data,
+        costs,
+        max_servings_list,
+        nutrient_goals,
+        lower_bounds,
+        upper_bounds,
+        has_custom_bounds,
+    )
+
+
+def check_feasibility(inputs: OptimisationInputs) -> Dict[str, Any]:
+    """Run the quick feasibility analysis on prepared optimisation inputs."""
+    return analyse_feasibility(
+        inputs.selected_foods,
+        inputs.max_servings,
+        inputs.lower_bounds,
+        inputs.upper_bounds,
+        inputs.nutrient_goals,
+    )
+
+
+def add_solver_debug(payload: Dict[str, Any], data: Dict[str, Any]) -> None:
+    """Attach the request's solver statistics to a payload if ``debug`` is set."""
+    timings = current_timings()
+    if data.get("debug") is True and timings is not None:
+        payload["debug"] = {
+            "solves": timings.solver_stats,
+            "nodes": timings.counters.get("solver_nodes", 0),
+            "iterations": timings.counters.get("solver_iterations", 0),
+        }
+
+
+def record_optimisation(inputs: OptimisationInputs) -> None:
+    """Add the inputs to the optimisation corpus if recording is enabled."""
+    if not OPTIMISE_RECORD_DIR:
+        return
+    try:
+        with timed("record"):
+            record_inputs(
+                OPTIMISE_RECORD_DIR,
+                OPTIMISE_RECORD_RATE,
+                inputs.selected_foods,
+                inputs.costs,
+                inputs.max_servings,
+                inputs.nutrient_goals,
+                inputs.lower_bounds,
+                inputs.upper_bounds,
+            )
+    except (OSError, TypeError, ValueError) as e:
+        app.logger.warning("Could not record optimisation inputs: %s", e)
+
+
+def diagnose(inputs: OptimisationInputs) -> Optional[Dict[str, Any]]:
+    """Find the smallest relaxation that makes prepared optimisation inputs feasible."""
+    return diagnose_infeasibility(
+        inputs.selected_foods,
+        inputs.max_servings,
+        inputs.nutrient_goals,
+        inputs.lower_bounds,
+        inputs.upper_bounds,
+        DIAGNOSIS_TIME_LIMIT_SECONDS,
+    )
+
+
+def infeasible_response(
+    inputs: OptimisationInputs, feasibility_analysis: Dict[str, Any]
+) -> Response:
+    """Response for requests that fail the feasibility analysis."""
+    return jsonify(
+        {
+            "success": False,
+            "message": "Diet optimisation is not feasible with the selected foods and nutrient goals.",
+            "feasibilityAnalysis": feasibility_analysis,
+            "relaxation": diagnose(inputs),
+        }
+    )
+
+
+def parse_alternatives_options(
+    data: Dict[str, Any], num_foods: int
+) -> Union[Tuple[int, int], str]:
+    """
+    Validate the optional ``k`` and ``min_difference`` of an optimisation request.
+
+    Returns:
+        Tuple of (plans wanted including the optimum, foods each alternative
+        must add or drop), or an error message for the client
+    """
+    k = data.get("k", 1)
+    if (
+        not isinstance(k, int)
+        or isinstance(k, bool)
+        or not 1 <= k <= MAX_ALTERNATIVE_PLANS
+    ):
+        return f"k must be a whole number between 1 and {MAX_ALTERNATIVE_PLANS}"
+
+    min_difference = data.get("min_difference", 1)
+    if (
+        not isinstance(min_difference, int)
+        or isinstance(min_difference, bool)
+        or not 1 <= min_difference <= max(num_foods, 1)
+    ):
+        return "min_difference must be a whole number between 1 and the number of foods"
+
+    return k, min_difference
+
+
 @app.route("/api/optimise", methods=["POST"])
 def optimise_api() -> ResponseType:
     """Optimise diet based on selected foods and nutrient goals."""
@@ -293,104 +918,353 @@ def optimise_api() -> ResponseType:
         if data is None:
             return create_error_response(ERR_NO_JSON)
 
-        nutrient_goals = data["nutrient_goals"]
-        selected_foods_data = data["selected_foods"]
-        age = int(data["age"])
-        gender = data["gender"]
-        smoking_status = data.get("smokingStatus", "no")
+        inputs = parse_optimisation_request(data)
+        if isinstance(inputs, str):
+            return create_error_response(inputs)
 
-        if error := validate_age(age, AGE_MIN, AGE_MAX):
-            return create_error_response(error)
+        alternatives_options = parse_alternatives_options(
+            data, len(inputs.selected_foods)
+        )
+        if isinstance(alternatives_options, str):
+            return create_error_response(alternatives_options)
+        k, min_difference = alternatives_options
+        record_optimisation(inputs)
+        deadline = time.monotonic() + ALTERNATIVES_TIME_LIMIT_SECONDS
 
-        if not selected_foods_data:
-            return create_error_response("No foods selected")
+        feasibility_analysis = check_feasibility(inputs)
+        if not feasibility_analysis["isFeasible"]:
+            return infeasible_response(inputs, feasibility_analysis)
 
-        costs = np.array([food["price"] for food in selected_foods_data])
+        session_id = valid_session_id(request.headers.get(SESSION_HEADER))
+        signature = bounds_signature(
+            inputs.nutrient_goals, inputs.lower_bounds, inputs.upper_bounds
+        )
+        state = session_cache.get(session_id) if session_id else None
+        warm_start = (
+            plan_warm_start(
+                state, inputs.selected_foods, inputs.max_servings, signature
+            )
+            if state
+            else None
+        )
+
+        result = optimise_diet(
+            inputs.selected_foods,
+            inputs.costs,
+            inputs.max_servings,
+            inputs.nutrient_goals,
+            inputs.lower_bounds,
+            inputs.upper_bounds,
+            sensitivity=data.get("sensitivity") is True,
+            start_combo=warm_start.start_combo if warm_start else None,
+            initial_servings=warm_start.initial_servings if warm_start else None,
+        )
+
+        if result:
+            if session_id:
+                session_cache.put(
+                    session_id,
+                    build_session_state(
+                        inputs.selected_foods,
+                        inputs.max_servings,
+                        signature,
+                        result,
+                        OVERFLOW_NUTRIENTS,
+                    ),
+                )
+            if k > 1:
+                result["alternatives"] = optimise_alternatives(
+                    inputs.selected_foods,
+                    inputs.costs,
+                    inputs.max_servings,
+                    inputs.nutrient_goals,
+                    inputs.lower_bounds,
+                    inputs.upper_bounds,
+                    result,
+                    k - 1,
+                    min_difference,
+                    deadline,
+                )
+            result["using_custom_bounds"] = inputs.has_custom_bounds
+            add_solver_debug(result, data)
+            with timed("serialise"):
+                return jsonify({"success": True, "result": result})
+
+        failure = {
+            "success": False,
+            "message": "Optimisation failed! No feasible solution found even with maximum allowed nutrient flexibility.",
+            "feasibilityAnalysis": feasibility_analysis,
+            "relaxation": diagnose(inputs),
+        }
+        add_solver_debug(failure, data)
+        return jsonify(failure)
 
-        max_servings_list: List[float] = []
-        for food in selected_foods_data:
-            serving_size = float(food["servingSize"])
-            max_val = food.get("maxServing")
+    except Exception as e:
+        app.logger.exception("Error occurred during optimisation: %s", e)
+        return create_error_response(
+            "An internal error has occurred. Please try again later.", status_code=500
+        )
 
-            if max_val is None or max_val == "" or float(max_val) == 0:
-                limit: float = UNLIMITED_MAX_SERVING
-            else:
-                limit = float(max_val)
 
-            max_servings_list.append(limit / serving_size)
+def parse_overflow_triples(
+    raw_triples: Any,
+) -> Union[Optional[List[Tuple[int, ...]]], str]:
+    """
+    Validate the optional ``overflow_triples`` of a frontier request.
 
-        has_custom_bounds = False
-        lower_bounds, upper_bounds = get_nutrient_bounds(age, gender)
+    Returns:
+        List of triples, None if none were supplied, or an error message
+    """
+    if raw_triples is None:
+        return None
+
+    if not isinstance(raw_triples, list) or not raw_triples:
+        return "overflow_triples must be a non-empty list"
+    if len(raw_triples) > FRONTIER_MAX_TRIPLES:
+        return f"At most {FRONTIER_MAX_TRIPLES} overflow triples are allowed"
 
+    triples: List[Tuple[int, ...]] = []
+    for triple in raw_triples:
         if (
-            "lower_bounds" in nutrient_goals
-            and nutrient_goals["lower_bounds"]
-            and "upper_bounds" in nutrient_goals
-            and nutrient_goals["upper_bounds"]
+            not isinstance(triple, list)
+            or len(triple) != len(OVERFLOW_NUTRIENTS)
+            or not all(
+                isinstance(value, int)
+                and not isinstance(value, bool)
+                and 0 <= value <= MAX_OVERFLOW_PERCENTAGE
+                for value in triple
+            )
         ):
-            has_custom_bounds = True
-            lower_bounds, upper_bounds = adjust_nutrient_bounds(
-                lower_bounds,
-                upper_bounds,
-                nutrient_goals["lower_bounds"],
-                nutrient_goals["upper_bounds"],
-                smoking_status,
+            return (
+                f"Each overflow triple must hold {len(OVERFLOW_NUTRIENTS)} whole "
+                f"percentages between 0 and {MAX_OVERFLOW_PERCENTAGE}"
             )
+        triples.append(tuple(triple))
 
-            if "fibre" in lower_bounds:
-                nutrient_goals["fibre"] = lower_bounds["fibre"]
-            if "saturated_fats" in upper_bounds:
-                nutrient_goals["saturated_fats"] = upper_bounds["saturated_fats"]
+    return triples
 
-            app.logger.info("Using custom nutrient bounds from request")
-        else:
-            lower_bounds, upper_bounds = adjust_nutrient_bounds(
-                lower_bounds, upper_bounds, smoking_status=smoking_status
+
+@app.route("/api/optimise/frontier", methods=["POST"])
+def optimise_frontier_api() -> ResponseType:
+    """Cheapest diet at each macronutrient overflow level in one request."""
+    try:
+        data = request.json
+        app.logger.debug("Received frontier request")
+
+        if data is None:
+            return create_error_response(ERR_NO_JSON)
+
+        overflow_triples = parse_overflow_triples(data.get("overflow_triples"))
+        if isinstance(overflow_triples, str):
+            return create_error_response(overflow_triples)
+
+        inputs = parse_optimisation_request(data)
+        if isinstance(inputs, str):
+            return create_error_response(inputs)
+
+        feasibility_analysis = check_feasibility(inputs)
+        if not feasibility_analysis["isFeasible"]:
+            return infeasible_response(inputs, feasibility_analysis)
+
+        result = optimise_frontier(
+            inputs.selected_foods,
+            inputs.costs,
+            inputs.max_servings,
+            inputs.nutrient_goals,
+            inputs.lower_bounds,
+            inputs.upper_bounds,
+            overflow_triples,
+        )
+        result["using_custom_bounds"] = inputs.has_custom_bounds
+        add_solver_debug(result, data)
+
+        with timed("serialise"):
+            return jsonify({"success": True, "result": result})
+
+    except Exception as e:
+        app.logger.exception("Error occurred during frontier optimisation: %s", e)
+        return create_error_response(
+            "An internal error has occurred. Please try again later.", status_code=500
+        )
+
+
+@app.route("/api/optimise/catalogue", methods=["POST"])
+def optimise_catalogue_api() -> ResponseType:
+    """
+    Cheapest diet chosen from a large set of foods.
+
+    Without ``selected_foods`` the candidates are every priced food in the
+    shared catalogue, which every worker serves alike. Foods imported through
+    ``/api/foods/import`` are never offered to other requests.
+    """
+    try:
+        data = request.json
+        app.logger.debug("Received catalogue optimisation request")
+
+        if data is None:
+            return create_error_response(ERR_NO_JSON)
+
+        if not data.get("selected_foods"):
+            candidates = (
+                catalogue_candidates(shared_catalogue) if shared_catalogue else []
             )
-            app.logger.info("Using default nutrient bounds")
+            if not candidates:
+                return create_error_response(
+                    "The shared catalogue has no priced foods. Send selected_foods."
+                )
+            data = {**data, "selected_foods": candidates}
 
-        feasibility_analysis = analyse_feasibility(
-            selected_foods_data,
-            max_servings_list,
-            lower_bounds,
-            upper_bounds,
-            nutrient_goals,
+        if len(data["selected_foods"]) > LARGE_SCALE_MAX_FOODS:
+            return create_error_response(
+                f"At most {LARGE_SCALE_MAX_FOODS} candidate foods are supported"
+            )
+
+        inputs = parse_optimisation_request(data)
+        if isinstance(inputs, str):
+            return create_error_response(inputs)
+
+        outcome = optimise_large_scale(
+            inputs.selected_foods,
+            inputs.costs,
+            inputs.max_servings,
+            inputs.nutrient_goals,
+            inputs.lower_bounds,
+            inputs.upper_bounds,
+            LARGE_SCALE_TIME_LIMIT_SECONDS,
         )
 
-        if not feasibility_analysis["isFeasible"]:
-            return jsonify(
-                {
-                    "success": False,
-                    "message": "Diet optimisation is not feasible with the selected foods and nutrient goals.",
-                    "feasibilityAnalysis": feasibility_analysis,
-                }
+        if outcome.result:
+            result = outcome.result
+            result["column_generation"] = outcome.stats
+            result["using_custom_bounds"] = inputs.has_custom_bounds
+            add_solver_debug(result, data)
+            with timed("serialise"):
+                return jsonify({"success": True, "result": result})
+
+        if outcome.shortfalls:
+            message = "The candidate foods cannot meet these nutrient limits even with maximum allowed nutrient flexibility."
+        else:
+            message = "No diet found from the candidate foods in the time allowed."
+        return jsonify(
+            {
+                "success": False,
+                "message": message,
+                "shortfalls": outcome.shortfalls,
+                "column_generation": outcome.stats,
+            }
+        )
+
+    except Exception as e:
+        app.logger.exception("Error occurred during catalogue optimisation: %s", e)
+        return create_error_response(
+            "An internal error has occurred. Please try again later.", status_code=500
+        )
+
+
+class MealPlanOptions(NamedTuple):
+    """Validated multi-day options of a meal plan request."""
+
+    days: int
+    max_days_per_food: int
+    weekly_bounds: WeeklyBounds
+
+
+def parse_meal_plan_options(data: Dict[str, Any]) -> Union[MealPlanOptions, str]:
+    """
+    Validate the multi-day options of a meal plan request.
+
+    Returns:
+        The options, or an error message for the client
+    """
+    days = data.get("days", MEAL_PLAN_DEFAULT_DAYS)
+    if (
+        not isinstance(days, int)
+        or isinstance(days, bool)
+        or not 1 <= days <= MEAL_PLAN_MAX_DAYS
+    ):
+        return f"days must be a whole number between 1 and {MEAL_PLAN_MAX_DAYS}"
+
+    max_days_per_food = data.get("max_days_per_food", days)
+    if (
+        not isinstance(max_days_per_food, int)
+        or isinstance(max_days_per_food, bool)
+        or not 1 <= max_days_per_food <= days
+    ):
+        return "max_days_per_food must be a whole number between 1 and days"
+
+    weekly_bounds: WeeklyBounds = {}
+    raw_bounds = data.get("weekly_bounds") or {}
+    if not isinstance(raw_bounds, dict):
+        return "weekly_bounds must map nutrients to min and max totals"
+    for nutrient, bounds in raw_bounds.items():
+        if nutrient not in NUTRIENT_MAP:
+            return f"Unknown nutrient in weekly_bounds: {nutrient}"
+        if (
+            not isinstance(bounds, dict)
+            or not bounds
+            or not set(bounds) <= {"min", "max"}
+            or not all(
+                isinstance(value, (int, float)) and not isinstance(value, bool)
+                for value in bounds.values()
             )
+        ):
+            return f"weekly_bounds for {nutrient} must give a numeric min and/or max"
+        weekly_bounds[nutrient] = {kind: float(value) for kind, value in bounds.items()}
 
-        result = optimise_diet(
-            selected_foods_data,
-            costs,
-            max_servings_list,
-            nutrient_goals,
-            lower_bounds,
-            upper_bounds,
+    return MealPlanOptions(days, max_days_per_food, weekly_bounds)
+
+
+@app.route("/api/optimise/meal_plan", methods=["POST"])
+def optimise_meal_plan_api() -> ResponseType:
+    """Optimise a multi-day meal plan with variety and weekly constraints."""
+    try:
+        data = request.json
+        app.logger.debug("Received meal plan request")
+
+        if data is None:
+            return create_error_response(ERR_NO_JSON)
+
+        options = parse_meal_plan_options(data)
+        if isinstance(options, str):
+            return create_error_response(options)
+
+        inputs = parse_optimisation_request(data)
+        if isinstance(inputs, str):
+            return create_error_response(inputs)
+
+        feasibility_analysis = check_feasibility(inputs)
+        if not feasibility_analysis["isFeasible"]:
+            return infeasible_response(inputs, feasibility_analysis)
+
+        result = optimise_meal_plan(
+            inputs.selected_foods,
+            inputs.costs,
+            inputs.max_servings,
+            inputs.nutrient_goals,
+            inputs.lower_bounds,
+            inputs.upper_bounds,
+            options.days,
+            options.max_days_per_food,
+            options.weekly_bounds,
+            MEAL_PLAN_TIME_LIMIT_SECONDS,
         )
 
         if result:
-            result["using_custom_bounds"] = has_custom_bounds
-            return jsonify({"success": True, "result": result})
+            result["using_custom_bounds"] = inputs.has_custom_bounds
+            add_solver_debug(result, data)
+            with timed("serialise"):
+                return jsonify({"success": True, "result": result})
 
         return jsonify(
             {
                 "success": False,
-                "message": "Optimisation failed! No feasible solution found even with maximum allowed nutrient flexibility.",
+                "message": "No meal plan found that meets the daily goals together with the variety and weekly limits.",
                 "feasibilityAnalysis": feasibility_analysis,
             }
         )
 
     except Exception as e:
-        app.logger.exception(
-            f"Error occurred during optimisation: {str(e)}", exc_info=True
-        )
+        app.logger.exception("Error occurred during meal plan optimisation: %s", e)
         return create_error_response(
             "An internal error has occurred. Please try again later.", status_code=500
         )
@@ -434,7 +1308,7 @@ def feedback_api() -> ResponseType:
         return jsonify({"success": True, "message": "Feedback sent successfully."})
 
     except Exception as e:
-        app.logger.exception(f"Failed to send feedback email: {str(e)}", exc_info=True)
+        app.logger.exception("Failed to send feedback email: %s", e)
         return create_error_response(
             "An internal error has occurred while sending feedback", status_code=500
         )
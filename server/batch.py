@@ -0,0 +1,316 @@
+"""
+Offline batch runner for nutrition calculations and diet optimisation.
+
+Usage:
+    python -m server.batch PROFILES.csv FOODS.csv --output RESULTS.jsonl
+        [--workers N] [--resume]
+
+Each row of the profile CSV holds the fields ``/api/calculate`` accepts
+(gender, weight, height, age, protein, carbohydrate, fats, activity,
+percentage and optionally smokingStatus) plus an optional ``id`` column; rows
+without one are identified by their row number. The food CSV uses the
+``client/public/sample.csv`` format and is shared by every profile.
+
+Profiles are read lazily and only a few per worker are in flight at once, so
+memory stays flat however long the input is. Results are written, in
+completion order, as soon as each profile finishes: full JSON lines for a
+``.jsonl`` output, or one summary row with servings per food for ``.csv``.
+The output file is the checkpoint; ``--resume`` skips the profiles it already
+holds and appends the rest.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import IO, Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from server.config import (
+    AGE_MAX,
+    AGE_MIN,
+    HEIGHT_MAX,
+    HEIGHT_MIN,
+    WEIGHT_MAX,
+    WEIGHT_MIN,
+)
+from server.services.calculation import (
+    calculate_nutrition_requirements,
+    validate_input_parameters,
+)
+from server.services.optimisation import (
+    analyse_feasibility,
+    max_servings_for,
+    optimise_diet,
+)
+from server.utils.food_csv import iter_food_csv
+from server.utils.json_provider import dumps
+
+GOAL_KEYS = ("protein", "carbohydrate", "fats", "fibre", "saturated_fats")
+CSV_SUMMARY_COLUMNS = [
+    "id",
+    "status",
+    "message",
+    "daily_caloric_intake",
+    "total_cost_sum",
+    "total_overflow",
+]
+TASKS_PER_WORKER = 4
+
+_foods: List[Dict[str, Any]] = []
+_costs: npt.NDArray[np.float64] = np.zeros(0)
+_max_servings: List[float] = []
+
+
+def load_foods(path: str) -> List[Dict[str, Any]]:
+    """Read every food from a food CSV."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(iter_food_csv(f))
+
+
+def _init_worker(food_path: str) -> None:
+    """Load the shared food list once per worker process."""
+    global _foods, _costs, _max_servings
+
+    _foods = load_foods(food_path)
+    _costs = np.array([food["price"] for food in _foods], dtype=np.float64)
+    _max_servings = [max_servings_for(food) for food in _foods]
+
+
+def run_profile(profile_id: str, profile: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Calculate one profile's requirements and optimise its diet.
+
+    Args:
+        profile_id: Identifier written with the result
+        profile: Row of the profile CSV
+
+    Returns:
+        Record with the id, a status of ``optimal``, ``infeasible``,
+        ``no_solution``, ``invalid`` or ``error``, a message, and the
+        calculation and optimisation results where available
+    """
+    record: Dict[str, Any] = {
+        "id": profile_id,
+        "status": "error",
+        "message": "",
+        "calculation": None,
+        "result": None,
+    }
+
+    try:
+        is_valid, validation_errors = validate_input_parameters(
+            profile, AGE_MIN, AGE_MAX, WEIGHT_MIN, WEIGHT_MAX, HEIGHT_MIN, HEIGHT_MAX
+        )
+        if not is_valid:
+            record.update(status="invalid", message="; ".join(validation_errors))
+            return record
+
+        calculation = calculate_nutrition_requirements(
+            profile["gender"],
+            int(profile["weight"]),
+            int(profile["height"]),
+            int(profile["age"]),
+            float(profile["protein"]) / 100,
+            float(profile["carbohydrate"]) / 100,
+            float(profile["fats"]) / 100,
+            float(profile["activity"]),
+            float(profile["percentage"]) / 100,
+            profile.get("smokingStatus") or "no",
+        )
+    except (KeyError, ValueError) as e:
+        record.update(status="invalid", message=f"Invalid profile: {e}")
+        return record
+
+    record["calculation"] = calculation
+    nutrient_goals = {key: calculation[key] for key in GOAL_KEYS}
+
+    try:
+        feasibility = analyse_feasibility(
+            _foods,
+            _max_servings,
+            calculation["lower_bounds"],
+            calculation["upper_bounds"],
+            nutrient_goals,
+        )
+        if not feasibility["isFeasible"]:
+            record.update(
+                status="infeasible",
+                message="The foods cannot meet this profile's requirements",
+            )
+            return record
+
+        result = optimise_diet(
+            _foods,
+            _costs,
+            _max_servings,
+            nutrient_goals,
+            calculation["lower_bounds"],
+            calculation["upper_bounds"],
+        )
+    except Exception as e:
+        record["message"] = f"Optimisation failed: {e}"
+        return record
+
+    if result is None:
+        record.update(
+            status="no_solution",
+            message="No feasible diet within the allowed nutrient overflow",
+        )
+    else:
+        record.update(status="optimal", result=result)
+    return record
+
+
+def read_profiles(path: str, skip: Set[str]) -> Iterator[Tuple[str, Dict[str, str]]]:
+    """
+    Stream the profiles that are not already done.
+
+    Yields:
+        Tuples of (profile id, profile row)
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        for row_number, row in enumerate(csv.DictReader(f), start=1):
+            profile_id = row.get("id") or str(row_number)
+            if profile_id not in skip:
+                yield profile_id, row
+
+
+def completed_ids(path: str, jsonl: bool) -> Set[str]:
+    """
+    Collect the profile ids already in an output file.
+
+    A trailing partial line, left by an interrupted run, is cut off so the
+    file can be appended to.
+    """
+    if not os.path.exists(path):
+        return set()
+
+    with open(path, "rb+") as f:
+        content = f.read()
+        end = content.rfind(b"\n") + 1
+        if end < len(content):
+            f.truncate(end)
+
+    lines = content[:end].decode("utf-8").splitlines()
+    if jsonl:
+        return {str(json.loads(line)["id"]) for line in lines if line.strip()}
+    return {row[0] for row in csv.reader(lines[1:]) if row}
+
+
+class ResultWriter:
+    """Append records to a JSONL or CSV output, flushing after each one."""
+
+    def __init__(self, f: IO[str], jsonl: bool, food_items: List[str]) -> None:
+        self.f = f
+        self.jsonl = jsonl
+        self.csv_writer = None if jsonl else csv.writer(f)
+        if self.csv_writer is not None and f.tell() == 0:
+            self.csv_writer.writerow(CSV_SUMMARY_COLUMNS + food_items)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Write one profile's record."""
+        if self.csv_writer is None:
+            self.f.write(dumps(record) + "\n")
+        else:
+            calculation = record["calculation"] or {}
+            result = record["result"] or {}
+            self.csv_writer.writerow(
+                [
+                    record["id"],
+                    record["status"],
+                    record["message"],
+                    calculation.get("daily_caloric_intake", ""),
+                    result.get("total_cost_sum", ""),
+                    result.get("total_overflow", ""),
+                    *result.get("servings", []),
+                ]
+            )
+        self.f.flush()
+
+
+def run_batch(
+    profile_path: str,
+    food_path: str,
+    output_path: str,
+    workers: int,
+    resume: bool,
+) -> Tuple[int, int]:
+    """
+    Run every profile through the optimiser and stream the results out.
+
+    Args:
+        profile_path: Profile CSV
+        food_path: Food CSV in the sample.csv format
+        output_path: ``.jsonl`` or ``.csv`` file to write
+        workers: Worker processes
+        resume: Keep an existing output and skip the profiles it holds
+
+    Returns:
+        Tuple of (profiles processed now, profiles skipped as already done)
+    """
+    jsonl = not output_path.lower().endswith(".csv")
+    done = completed_ids(output_path, jsonl) if resume else set()
+    food_items = [food["description"] for food in load_foods(food_path)]
+
+    processed = 0
+    with (
+        open(output_path, "a" if resume else "w", newline="", encoding="utf-8") as f,
+        ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(food_path,)
+        ) as executor,
+    ):
+        writer = ResultWriter(f, jsonl, food_items)
+        pending: Set[Future[Dict[str, Any]]] = set()
+
+        def drain(until: int) -> None:
+            nonlocal pending, processed
+            while len(pending) > until:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    writer.write(future.result())
+                    processed += 1
+
+        for profile_id, profile in read_profiles(profile_path, done):
+            pending.add(executor.submit(run_profile, profile_id, profile))
+            drain(workers * TASKS_PER_WORKER)
+        drain(0)
+
+    return processed, len(done)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m server.batch")
+    parser.add_argument("profiles", help="Profile CSV with the /api/calculate fields")
+    parser.add_argument("foods", help="Food CSV in the client/public/sample.csv format")
+    parser.add_argument("--output", required=True, help="Results file, .jsonl or .csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Append to an existing output, skipping the profiles it holds",
+    )
+    args = parser.parse_args(argv)
+
+    if not args.resume and os.path.exists(args.output):
+        print(
+            f"{args.output} exists; pass --resume to continue it or remove it",
+            file=sys.stderr,
+        )
+        return 1
+
+    processed, skipped = run_batch(
+        args.profiles, args.foods, args.output, max(args.workers, 1), args.resume
+    )
+    print(f"{processed} profiles written to {args.output} ({skipped} already done)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,14 +3,61 @@ Configuration settings and constants for the diet optimisation service.
 """
 
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DEFAULT_PORT = 5000
-API_ENDPOINT = "https://api.nal.usda.gov/fdc/v1/foods/search"
+API_ENDPOINT = os.environ.get(
+    "USDA_API_ENDPOINT", "https://api.nal.usda.gov/fdc/v1/foods/search"
+)
+USDA_CONNECT_TIMEOUT_SECONDS = 3.05
+USDA_READ_TIMEOUT_SECONDS = 10
+USDA_MAX_ATTEMPTS = 4
+USDA_BACKOFF_BASE_SECONDS = 0.25
+USDA_BACKOFF_MAX_SECONDS = 4
+# api.data.gov allows 1,000 requests an hour per key.
+USDA_RATE_PER_SECOND = float(os.environ.get("USDA_RATE_PER_SECOND", str(1000 / 3600)))
+# Enough for several full SEARCH_MAX_PAGES searches in a row.
+USDA_RATE_BURST = int(os.environ.get("USDA_RATE_BURST", "100"))
+USDA_RATE_MAX_WAIT_SECONDS = float(os.environ.get("USDA_RATE_MAX_WAIT_SECONDS", "2"))
+USDA_BREAKER_FAILURES = 5
+USDA_BREAKER_RESET_SECONDS = 30
+SEARCH_PAGE_CACHE_TTL_SECONDS = int(
+    os.environ.get("SEARCH_PAGE_CACHE_TTL_SECONDS", "3600")
+)
+SEARCH_PAGE_CACHE_MAX_PAGES = int(os.environ.get("SEARCH_PAGE_CACHE_MAX_PAGES", "512"))
 UNLIMITED_MAX_SERVING = 500000
+CALCULATE_BATCH_MAX_PROFILES = 100000
+FRONTIER_MAX_TRIPLES = 64
+MAX_ALTERNATIVE_PLANS = 5
+ALTERNATIVES_TIME_LIMIT_SECONDS = 10
+DIAGNOSIS_TIME_LIMIT_SECONDS = 3
+LARGE_SCALE_MAX_FOODS = 20000
+LARGE_SCALE_TIME_LIMIT_SECONDS = 10
+MEAL_PLAN_DEFAULT_DAYS = 7
+MEAL_PLAN_MAX_DAYS = 14
+# Leaves room for model building and the response inside the 30 s worker
+# timeout (see gunicorn_config.py) and Heroku's 30 s router limit.
+MEAL_PLAN_TIME_LIMIT_SECONDS = 20
+FOOD_IMPORT_MAX_ROWS = 20000
+FOOD_IMPORT_MAX_ERRORS = 100
+FOOD_CATALOGUE_MAX_ENTRIES = int(os.environ.get("FOOD_CATALOGUE_MAX_ENTRIES", "50000"))
+SHARED_CATALOGUE_DIR = os.environ.get("SHARED_CATALOGUE_DIR")
+SHARED_CATALOGUE_CHECK_SECONDS = float(
+    os.environ.get("SHARED_CATALOGUE_CHECK_SECONDS", "5")
+)
+SOLVER_DETERMINISTIC = os.environ.get("SOLVER_DETERMINISTIC", "false").lower() in [
+    "true",
+    "1",
+]
+SOLVER_SEED = int(os.environ.get("SOLVER_SEED", "1"))
+# Off until a benchmark shows a wall-clock win; see the scaled benchmark cases.
+SOLVER_SCALING = os.environ.get("SOLVER_SCALING", "false").lower() in ["true", "1"]
+SESSION_CACHE_TTL_SECONDS = int(os.environ.get("SESSION_CACHE_TTL_SECONDS", "900"))
+SESSION_CACHE_MAX_ENTRIES = int(os.environ.get("SESSION_CACHE_MAX_ENTRIES", "1024"))
 
 AGE_MIN = 19
 AGE_MAX = 100
@@ -27,6 +74,7 @@ SATURATED_FAT_RATIO = 0.10
 NUTRIENT_DB_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "nutrient-databases")
 )
+NUTRIENT_TABLES_PATH = os.path.join(NUTRIENT_DB_PATH, "reference-tables.pkl")
 
 NUTRIENT_MAP = {
     "Vitamin A (µg)": "Vitamin A, RAE",
@@ -57,6 +105,35 @@ NUTRIENT_MAP = {
     "Water (mL)": "Water",
 }
 
+CSV_NUTRIENT_HEADER_MAP = {
+    "Water (mL)": "Water (mL)",
+    "Carbohydrate (g)": "carbohydrate",
+    "Fibre (g)": "fibre",
+    "Fats (g)": "fats",
+    "Saturated Fats (g)": "saturated_fats",
+    "Protein (g)": "protein",
+    "Thiamin (Vitamin B1) (mg)": "Thiamin (mg)",
+    "Riboflavin (Vitamin B2) (mg)": "Riboflavin (mg)",
+    "Niacin (Vitamin B3) (mg)": "Niacin (mg)",
+    "Pantothenic Acid (Vitamin B5) (mg)": "Pantothenic Acid (mg)",
+    "Vitamin B6 (mg)": "Vitamin B6 (mg)",
+    "Choline (mg)": "Choline (mg)",
+    "Folate (Vitamin B9) (mcg)": "Folate (µg)",
+    "Vitamin A (mcg)": "Vitamin A (µg)",
+    "Vitamin C (mg)": "Vitamin C (mg)",
+    "Vitamin E (mg)": "Vitamin E (mg)",
+    "Vitamin K (mcg)": "Vitamin K (µg)",
+    "Calcium (mg)": "Calcium (mg)",
+    "Iron (mg)": "Iron (mg)",
+    "Magnesium (mg)": "Magnesium (mg)",
+    "Manganese (mg)": "Manganese (mg)",
+    "Phosphorus (mg)": "Phosphorus (mg)",
+    "Potassium (mg)": "Potassium (mg)",
+    "Selenium (mcg)": "Selenium (µg)",
+    "Sodium (mg)": "Sodium (mg)",
+    "Zinc (mg)": "Zinc (mg)",
+}
+
 EXCLUDED_AGE_GROUPS = [
     "Infants",
     "Children",
@@ -100,6 +177,33 @@ MACROS_RDA_EXCLUDE = [
 CONTENTFUL_SPACE_ID = os.environ.get("CONTENTFUL_SPACE_ID")
 CONTENTFUL_ACCESS_TOKEN = os.environ.get("CONTENTFUL_ACCESS_TOKEN")
 CONTENTFUL_CONTENT_TYPE_ID = "blogPost"
+CONTENTFUL_API_URL = os.environ.get("CONTENTFUL_API_URL", "cdn.contentful.com")
+CONTENTFUL_HTTPS = os.environ.get("CONTENTFUL_HTTPS", "true").lower() in ["true", "1"]
+BLOG_CACHE_TTL_SECONDS = int(os.environ.get("BLOG_CACHE_TTL_SECONDS", "300"))
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "ERROR")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+LOG_FILE = os.environ.get("LOG_FILE", "app.log")
+LOG_PAYLOAD_LIMIT = int(os.environ.get("LOG_PAYLOAD_LIMIT", "2000"))
+
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+SOLVER_STATS_ENABLED = os.environ.get("SOLVER_STATS", "false").lower() in [
+    "true",
+    "1",
+]
+SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING", "true").lower() in [
+    "true",
+    "1",
+]
+
+PROFILE_SECRET = os.environ.get("PROFILE_SECRET")
+PROFILE_DIR = os.environ.get(
+    "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "knapsnack-profiles")
+)
+
+# Recording anonymised /api/optimise inputs is off unless a directory is set.
+OPTIMISE_RECORD_DIR = os.environ.get("OPTIMISE_RECORD_DIR")
+OPTIMISE_RECORD_RATE = float(os.environ.get("OPTIMISE_RECORD_RATE", "1.0"))
 
 SECURITY_HEADERS = {
     "Strict-Transport-Security": "max-age=31536000; includeSubDomains",
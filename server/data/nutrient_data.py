@@ -1,11 +1,23 @@
 """
 Data access functions for nutrient databases.
+
+The reference tables are parsed from their CSVs once per process. A build
+step can also write them to a pickle next to the CSVs, which loads without
+any CSV parsing:
+
+    python -m server.data.nutrient_data build
+
+The pickle records a hash of the CSVs it was built from and is ignored once
+they change.
 """
 
 from __future__ import annotations
 
+import hashlib
 import os
-from typing import Any, Callable, List, Tuple, cast
+import sys
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple, cast
 
 import pandas as pd
 
@@ -15,6 +27,7 @@ from server.config import (
     EXCLUDED_AGE_GROUPS,
     MACROS_RDA_EXCLUDE,
     NUTRIENT_DB_PATH,
+    NUTRIENT_TABLES_PATH,
     VITAMINS_RDA_EXCLUDE,
     VITAMINS_UL_EXCLUDE,
 )
@@ -23,6 +36,14 @@ LIFE_STAGE_GROUP_COL = "Life-Stage Group"
 TOTAL_WATER_COL = "Total Water (L)"
 MAGNESIUM_COL = "Magnesium (mg)"
 
+REFERENCE_TABLES = {
+    "vitamins_rda": ("vitamins-RDAs.csv", VITAMINS_RDA_EXCLUDE),
+    "vitamins_ul": ("vitamins-ULs.csv", VITAMINS_UL_EXCLUDE),
+    "elements_rda": ("elements-RDAs.csv", ELEMENTS_RDA_EXCLUDE),
+    "elements_ul": ("elements-ULs.csv", ELEMENTS_UL_EXCLUDE),
+    "macros_rda": ("macros-RDAs.csv", MACROS_RDA_EXCLUDE),
+}
+
 
 def remove_excluded_age_groups(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -62,6 +83,57 @@ def load_process_nutrient_data(
     return remove_excluded_age_groups(df)
 
 
+def tables_source_hash() -> str:
+    """Hash of the reference table CSVs, to tell whether an artefact is stale."""
+    digest = hashlib.sha256()
+    for filename, _ in REFERENCE_TABLES.values():
+        with open(os.path.join(NUTRIENT_DB_PATH, filename), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def parse_reference_tables() -> Dict[str, pd.DataFrame]:
+    """Parse and process every reference table from its CSV."""
+    return {
+        name: load_process_nutrient_data(filename, columns_to_drop)
+        for name, (filename, columns_to_drop) in REFERENCE_TABLES.items()
+    }
+
+
+def build_reference_tables(path: str = NUTRIENT_TABLES_PATH) -> None:
+    """
+    Write the processed reference tables to a fast-loading pickle.
+
+    Args:
+        path: Where to write the artefact
+    """
+    artefact = {"source": tables_source_hash(), "tables": parse_reference_tables()}
+    pd_any: Any = pd
+    pd_any.to_pickle(artefact, path)
+
+
+def _load_artefact(path: str) -> Optional[Dict[str, pd.DataFrame]]:
+    """The tables in an artefact, or None if it is missing or stale."""
+    if not os.path.exists(path):
+        return None
+    artefact = cast(Dict[str, Any], pd.read_pickle(path))
+    if artefact.get("source") != tables_source_hash():
+        return None
+    return cast(Dict[str, pd.DataFrame], artefact["tables"])
+
+
+@lru_cache(maxsize=1)
+def load_reference_tables() -> Dict[str, pd.DataFrame]:
+    """
+    Processed reference tables, loaded once per process.
+
+    Returns:
+        Tables keyed by REFERENCE_TABLES name, from the build artefact when
+        it matches the CSVs and parsed from the CSVs otherwise
+    """
+    return _load_artefact(NUTRIENT_TABLES_PATH) or parse_reference_tables()
+
+
 def get_age_group(age: int, gender: str) -> str:
     """
     Determine the appropriate age-gender group for nutrient recommendations.
@@ -108,11 +180,12 @@ def get_nutrient_bounds(
     """
     age_group = get_age_group(age, gender)
 
-    vitamins_rda = load_process_nutrient_data("vitamins-RDAs.csv", VITAMINS_RDA_EXCLUDE)
-    vitamins_ul = load_process_nutrient_data("vitamins-ULs.csv", VITAMINS_UL_EXCLUDE)
-    elements_rda = load_process_nutrient_data("elements-RDAs.csv", ELEMENTS_RDA_EXCLUDE)
-    elements_ul = load_process_nutrient_data("elements-ULs.csv", ELEMENTS_UL_EXCLUDE)
-    macros_rda = load_process_nutrient_data("macros-RDAs.csv", MACROS_RDA_EXCLUDE)
+    tables = load_reference_tables()
+    vitamins_rda = tables["vitamins_rda"]
+    vitamins_ul = tables["vitamins_ul"]
+    elements_rda = tables["elements_rda"]
+    elements_ul = tables["elements_ul"]
+    macros_rda = tables["macros_rda"]
 
     vitamin_lower = vitamins_rda[vitamins_rda[LIFE_STAGE_GROUP_COL] == age_group]
     element_lower = elements_rda[elements_rda[LIFE_STAGE_GROUP_COL] == age_group]
@@ -163,3 +236,11 @@ def get_nutrient_bounds(
         upper_bounds[MAGNESIUM_COL] += lower_bounds[MAGNESIUM_COL]
 
     return lower_bounds, upper_bounds
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["build"]:
+        print("Usage: python -m server.data.nutrient_data build", file=sys.stderr)
+        sys.exit(1)
+    build_reference_tables()
+    print(f"Reference tables written to {NUTRIENT_TABLES_PATH}")
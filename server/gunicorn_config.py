@@ -0,0 +1,42 @@
+"""
+Gunicorn server hooks for the diet optimisation service.
+
+Loaded by ``run.sh`` with ``--config python:server.gunicorn_config``.
+"""
+
+import os
+import shutil
+import tempfile
+from typing import Any
+
+# Workers silent for longer than this are killed and restarted. It matches
+# Heroku's 30 s router limit, after which the client has been answered with an
+# error anyway; solver time limits in server/config.py stay below it so slow
+# requests return their best plan instead of hitting it.
+timeout = 30
+
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "knapsnack-metrics"),
+)
+
+
+def on_starting(server: Any) -> None:
+    """Start every deployment with an empty multiprocess metrics store."""
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    """Warm the new worker up in the background; see ``/healthz/ready``."""
+    from server.warmup import start_warm_up
+
+    start_warm_up()
+
+
+def child_exit(server: Any, worker: Any) -> None:
+    """Release a dead worker's entries in the metrics store."""
+    from server.utils.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
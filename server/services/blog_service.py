@@ -1,20 +1,33 @@
 import re
+import threading
+import time
 from datetime import datetime
-from typing import Any, Dict, List, Optional, cast
+from typing import Any, Dict, List, Optional, Tuple, cast
 
 import contentful
 
 from server.config import (
+    BLOG_CACHE_TTL_SECONDS,
     CONTENTFUL_ACCESS_TOKEN,
+    CONTENTFUL_API_URL,
     CONTENTFUL_CONTENT_TYPE_ID,
+    CONTENTFUL_HTTPS,
     CONTENTFUL_SPACE_ID,
 )
 
 client: Optional[Any] = None
 
+_posts_cache: Optional[Tuple[float, List[Dict[str, Any]]]] = None
+_posts_lock = threading.Lock()
+
 try:
     contentful_module = cast(Any, contentful)
-    client = contentful_module.Client(CONTENTFUL_SPACE_ID, CONTENTFUL_ACCESS_TOKEN)
+    client = contentful_module.Client(
+        CONTENTFUL_SPACE_ID,
+        CONTENTFUL_ACCESS_TOKEN,
+        api_url=CONTENTFUL_API_URL,
+        https=CONTENTFUL_HTTPS,
+    )
 except Exception as e:
     print(f"Failed to initialise Contentful client: {e}")
 
@@ -115,6 +128,27 @@ def extract_first_image(content: Any) -> Optional[str]:
 
 
 def get_all_posts() -> Optional[List[Dict[str, Any]]]:
+    """
+    All blog post entries, fetched from Contentful at most once per
+    BLOG_CACHE_TTL_SECONDS. Failed fetches are not cached.
+    """
+    global _posts_cache
+
+    cached = _posts_cache
+    if cached is not None and time.monotonic() - cached[0] < BLOG_CACHE_TTL_SECONDS:
+        return cached[1]
+
+    with _posts_lock:
+        cached = _posts_cache
+        if cached is not None and time.monotonic() - cached[0] < BLOG_CACHE_TTL_SECONDS:
+            return cached[1]
+        posts = fetch_all_posts()
+        if posts is not None:
+            _posts_cache = (time.monotonic(), posts)
+        return posts
+
+
+def fetch_all_posts() -> Optional[List[Dict[str, Any]]]:
     """Fetches all blog post entries from Contentful."""
     if not client:
         print("Error: Contentful client not initialised.")
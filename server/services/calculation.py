@@ -4,17 +4,26 @@ Services for nutritional calculations.
 
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 
-from server.data.nutrient_data import get_nutrient_bounds
+from server.data.nutrient_data import get_age_group, get_nutrient_bounds
 from server.utils.nutrient_utils import (
+    FloatArray,
+    IntArray,
     calculate_bmr,
+    calculate_bmr_array,
     calculate_macros,
+    calculate_macros_array,
     calculate_tdee,
+    calculate_tdee_array,
     standardise_nutrient_bounds,
 )
+from server.utils.timing import timed
 
 
 def validate_age(age: int, age_min: int, age_max: int) -> Optional[str]:
@@ -91,7 +100,8 @@ def calculate_nutrition_requirements(
         daily_caloric_intake, pratio, cratio, fratio
     )
 
-    lower_bounds, upper_bounds = get_nutrient_bounds(age, gender)
+    with timed("bounds"):
+        lower_bounds, upper_bounds = get_nutrient_bounds(age, gender)
 
     lower_bounds, upper_bounds = adjust_nutrient_bounds(
         lower_bounds, upper_bounds, smoking_status=smoking_status
@@ -124,7 +134,12 @@ def adjust_nutrient_bounds(
 ) -> Tuple[pd.Series[float], pd.Series[float]]:
     """
     Adjust nutrient bounds based on custom values and smoking status.
+
+    The bounds are copied as floats, so the caller's series are left untouched
+    and fractional values can be set on integer-valued tables.
     """
+    lower_bounds = lower_bounds.astype(float)
+    upper_bounds = upper_bounds.astype(float)
     key_map = {"Fibre (g)": "fibre", "Saturated Fats (g)": "saturated_fats"}
 
     if custom_lower_bounds:
@@ -146,3 +161,190 @@ def adjust_nutrient_bounds(
                 lower_bounds[vitamin_c_key] = float(lower_bounds[vitamin_c_key]) + 35.0
 
     return lower_bounds, upper_bounds
+
+
+# First age of each adult life-stage group in the nutrient tables.
+LIFE_STAGE_START_AGES = (19, 31, 51, 71)
+
+BATCH_NUMERIC_FIELDS = (
+    "weight",
+    "height",
+    "age",
+    "protein",
+    "carbohydrate",
+    "fats",
+    "activity",
+    "percentage",
+)
+
+
+@lru_cache(maxsize=None)
+def life_stage_bounds(
+    start_age: int, gender: str, smoking_status: str
+) -> Dict[str, Any]:
+    """
+    Nutrient bounds of one life-stage group, computed once per process.
+
+    Args:
+        start_age: First age of the group, from LIFE_STAGE_START_AGES
+        gender: 'm' for male, 'f' for female
+        smoking_status: 'yes' or 'no'
+
+    Returns:
+        Dictionary with the group name, smoking status and standardised
+        lower and upper bounds
+    """
+    lower_bounds, upper_bounds = get_nutrient_bounds(start_age, gender)
+    lower_bounds, upper_bounds = adjust_nutrient_bounds(
+        lower_bounds, upper_bounds, smoking_status=smoking_status
+    )
+    lower_bounds_dict, upper_bounds_dict = standardise_nutrient_bounds(
+        lower_bounds, upper_bounds
+    )
+    return {
+        "life_stage_group": get_age_group(start_age, gender),
+        "smoking_status": smoking_status,
+        "lower_bounds": lower_bounds_dict,
+        "upper_bounds": upper_bounds_dict,
+    }
+
+
+def validate_batch_parameters(
+    data: Dict[str, Any],
+    max_profiles: int,
+    age_min: int,
+    age_max: int,
+    weight_min: int,
+    weight_max: int,
+    height_min: int,
+    height_max: int,
+) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Validate the parallel arrays of a batch calculation request.
+
+    Weight, height and age are truncated to whole numbers as the single
+    calculation does.
+
+    Returns:
+        Tuple of (arrays keyed by field, or None if invalid, and the
+        validation errors)
+    """
+    gender = data.get("gender")
+    if not isinstance(gender, list) or not gender:
+        return None, ["gender must be a non-empty list"]
+    count = len(gender)
+    if count > max_profiles:
+        return None, [f"At most {max_profiles} profiles are allowed per batch"]
+
+    smoking_status = data.get("smokingStatus", ["no"] * count)
+    arrays: Dict[str, Any] = {
+        "is_male": np.isin(np.asarray(gender, dtype=object), ["m", "M"]),
+        "is_smoker": np.asarray(smoking_status, dtype=object) == "yes",
+    }
+
+    validation_errors: List[str] = []
+    if not isinstance(smoking_status, list) or len(smoking_status) != count:
+        validation_errors.append("smokingStatus must be a list as long as gender")
+
+    for field in BATCH_NUMERIC_FIELDS:
+        values = data.get(field)
+        if not isinstance(values, list) or len(values) != count:
+            validation_errors.append(f"{field} must be a list as long as gender")
+            continue
+        try:
+            arrays[field] = np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            validation_errors.append(f"{field} must contain only numbers")
+            continue
+        if not np.all(np.isfinite(arrays[field])):
+            validation_errors.append(f"{field} must contain only finite numbers")
+
+    if validation_errors:
+        return None, validation_errors
+
+    for field, low, high, unit in (
+        ("age", age_min, age_max, ""),
+        ("weight", weight_min, weight_max, " kg"),
+        ("height", height_min, height_max, " cm"),
+    ):
+        arrays[field] = np.trunc(arrays[field]).astype(np.int64)
+        invalid = np.flatnonzero((arrays[field] < low) | (arrays[field] > high))
+        if invalid.size:
+            validation_errors.append(
+                f"{field.capitalize()} must be between {low} and {high}{unit}"
+                f" (first invalid profile: {int(invalid[0])})"
+            )
+
+    return (None if validation_errors else arrays), validation_errors
+
+
+def calculate_nutrition_requirements_batch(
+    is_male: npt.NDArray[np.bool_],
+    weight: IntArray,
+    height: IntArray,
+    age: IntArray,
+    pratio: FloatArray,
+    cratio: FloatArray,
+    fratio: FloatArray,
+    activity_multiplier: FloatArray,
+    percentage: FloatArray,
+    is_smoker: npt.NDArray[np.bool_],
+) -> Dict[str, Any]:
+    """
+    Calculate nutritional requirements for many people at once.
+
+    Energy and macronutrient targets are computed as array operations. People
+    share nutrient bounds with everyone in the same life-stage group and
+    smoking status, so the bounds are returned once per distinct group and
+    each person gets an index into that list.
+
+    Args:
+        is_male: True where the person is male
+        weight: Weights in kg
+        height: Heights in cm
+        age: Ages in years, all adults
+        pratio: Protein ratios (0.0-1.0)
+        cratio: Carbohydrate ratios (0.0-1.0)
+        fratio: Fat ratios (0.0-1.0)
+        activity_multiplier: Activity multipliers
+        percentage: Fractions of TDEE to eat
+        is_smoker: True where the person smokes
+
+    Returns:
+        Dictionary of per-person arrays, ``bounds_index`` into ``bounds``, and
+        ``bounds`` as a list of ``life_stage_bounds`` results
+    """
+    bmr = calculate_bmr_array(is_male, weight, height, age)
+    tdee = calculate_tdee_array(bmr, activity_multiplier)
+    daily_caloric_intake = np.rint(percentage * tdee).astype(np.int64)
+
+    protein, carbohydrate, fats, fibre, saturated_fats = calculate_macros_array(
+        daily_caloric_intake, pratio, cratio, fratio
+    )
+
+    stage = np.searchsorted(LIFE_STAGE_START_AGES, age, side="right") - 1
+    group = (stage * 2 + ~is_male) * 2 + is_smoker
+    groups, bounds_index = np.unique(group, return_inverse=True)
+
+    with timed("bounds"):
+        bounds = [
+            life_stage_bounds(
+                LIFE_STAGE_START_AGES[code // 4],
+                "f" if code // 2 % 2 else "m",
+                "yes" if code % 2 else "no",
+            )
+            for code in groups.tolist()
+        ]
+
+    return {
+        "bmr": bmr,
+        "tdee": tdee,
+        "daily_caloric_intake": daily_caloric_intake,
+        "protein": protein,
+        "carbohydrate": carbohydrate,
+        "fats": fats,
+        "fibre": fibre,
+        "saturated_fats": saturated_fats,
+        "bounds_index": bounds_index,
+        "bounds": bounds,
+    }
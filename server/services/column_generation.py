@@ -0,0 +1,363 @@
+"""
+Diet optimisation over thousands of candidate foods.
+
+Giving every candidate a food-selection binary in the diet MILP does not
+scale, so the candidates are narrowed down first:
+
+1. Pruning: the restricted LP starts from the cheapest few sources of each
+   nutrient with a lower limit, plus any must-include foods.
+2. Column generation: the LP relaxation (no food-selection binaries, with
+   continuous overflow percentages charged far above any food price) is
+   solved over the foods added so far. All candidates are then priced at
+   once from the nutrient rows' duals, and the most negative reduced costs
+   join the LP, until none is left.
+   Penalised artificial columns keep the restricted LP feasible, so there are
+   duals from the first round on.
+3. The diet MILP is solved over the foods the final LP uses plus the
+   best-priced of the rest, with each overflow percentage fixed at the LP's
+   value rounded up. If that subset has no plan, it is retried with more of
+   the best-priced foods, and finally at maximum overflow.
+
+The MILP only sees a subset of the foods and one overflow combination, so its
+plan is the cheapest there rather than provably over every candidate and
+every combination; ``lp_cost`` is the LP's cost and a guide to how far the
+plan is from the relaxed optimum.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import pulp
+
+from server.services.optimisation import (
+    MAX_OVERFLOW_PERCENTAGE,
+    OVERFLOW_NUTRIENTS,
+    build_optimisation_model,
+    format_optimisation_result,
+    nutrient_limits,
+)
+from server.utils.nutrient_utils import NUTRIENT_INDEX, nutrient_matrix
+from server.utils.solver_utils import (
+    ACCEPTED_SOLUTIONS,
+    nutrient_constraint_name,
+    solve_model,
+)
+from server.utils.timing import record, timed
+
+INITIAL_COLUMNS_PER_NUTRIENT = 5
+COLUMNS_PER_ROUND = 50
+MAX_ROUNDS = 50
+MILP_EXTRA_COLUMNS = (60, 150, 400)
+OVERFLOW_PENALTY = 1e3
+ARTIFICIAL_PENALTY = 1e6
+TOLERANCE = 1e-7
+
+
+class LargeScaleOutcome(NamedTuple):
+    """Result of a large-scale optimisation and how it was reached."""
+
+    result: Optional[Dict[str, Any]]
+    shortfalls: List[Dict[str, Any]]
+    stats: Dict[str, Any]
+
+
+class _Rows(NamedTuple):
+    """Nutrient rows of the LP relaxation as arrays."""
+
+    names: List[str]
+    coefficients: npt.NDArray[np.float64]
+    limits: npt.NDArray[np.float64]
+    is_lower: npt.NDArray[np.bool_]
+    overflow_index: List[Optional[int]]
+
+
+def _relaxation_rows(
+    matrix: npt.NDArray[np.float64],
+    nutrient_goals: Dict[str, Any],
+    lower_bounds: Union[pd.Series[float], Dict[str, float]],
+    upper_bounds: Union[pd.Series[float], Dict[str, float]],
+) -> Tuple[_Rows, List[Tuple[str, str]]]:
+    """Nutrient rows of the relaxation, with each row's nutrient and bound."""
+    limits = nutrient_limits(nutrient_goals, lower_bounds, upper_bounds)
+    rows = _Rows(
+        [nutrient_constraint_name(limit.nutrient, limit.kind) for limit in limits],
+        matrix[:, [NUTRIENT_INDEX[limit.nutrient] for limit in limits]],
+        np.array([limit.value for limit in limits], dtype=np.float64),
+        np.array([limit.is_lower for limit in limits], dtype=np.bool_),
+        [limit.overflow_index for limit in limits],
+    )
+    labels = [(limit.nutrient, "min" if limit.is_lower else "max") for limit in limits]
+    return rows, labels
+
+
+def initial_columns(
+    rows: _Rows, costs: npt.NDArray[np.float64], must_include: List[int]
+) -> List[int]:
+    """
+    Pick the starting foods of the restricted LP.
+
+    Args:
+        rows: Nutrient rows of the relaxation
+        costs: Price per serving of every candidate
+        must_include: Candidates that have to be in every plan
+
+    Returns:
+        Sorted candidate indices
+    """
+    chosen = set(must_include)
+    prices = np.maximum(costs, TOLERANCE)
+    count = min(INITIAL_COLUMNS_PER_NUTRIENT, len(costs))
+
+    for r in np.flatnonzero(rows.is_lower & (rows.limits > 0)).tolist():
+        per_price = rows.coefficients[:, r] / prices
+        best = np.argpartition(-per_price, count - 1)[:count]
+        chosen.update(int(j) for j in best if per_price[j] > 0)
+
+    return sorted(chosen)
+
+
+def _restricted_lp(
+    rows: _Rows,
+    columns: List[int],
+    costs: npt.NDArray[np.float64],
+    max_servings: List[float],
+) -> Tuple[
+    pulp.LpProblem,
+    List[pulp.LpVariable],
+    List[pulp.LpVariable],
+    List[pulp.LpVariable],
+]:
+    """
+    Build the LP relaxation over some of the candidates.
+
+    Returns:
+        Tuple of (problem, serving variables in ``columns`` order, overflow
+        percentage variables, artificial variable of each row)
+    """
+    prob = pulp.LpProblem("Diet_Column_Generation", pulp.LpMinimize)
+    x = [pulp.LpVariable(f"x_{j}", 0, max_servings[j]) for j in columns]
+    overflow = [
+        pulp.LpVariable(f"o_{k}", 0, MAX_OVERFLOW_PERCENTAGE)
+        for k in range(len(OVERFLOW_NUTRIENTS))
+    ]
+    artificial = [pulp.LpVariable(f"a_{r}", 0) for r in range(len(rows.names))]
+    penalties = ARTIFICIAL_PENALTY / np.maximum(np.abs(rows.limits), 1.0)
+
+    prob += pulp.LpAffineExpression(
+        [(var, float(costs[j])) for var, j in zip(x, columns)]
+        + [(var, OVERFLOW_PENALTY) for var in overflow]
+        + [(var, float(penalty)) for var, penalty in zip(artificial, penalties)]
+    )
+
+    block = rows.coefficients[columns]
+    for r, name in enumerate(rows.names):
+        terms = [
+            (x[k], float(block[k, r])) for k in np.flatnonzero(block[:, r]).tolist()
+        ]
+        terms.append((artificial[r], 1.0 if rows.is_lower[r] else -1.0))
+        k = rows.overflow_index[r]
+        if k is not None:
+            terms.append((overflow[k], -rows.limits[r] / 100))
+        total = pulp.LpAffineExpression(terms)
+        prob += (
+            total >= rows.limits[r] if rows.is_lower[r] else total <= rows.limits[r],
+            name,
+        )
+
+    return prob, x, overflow, artificial
+
+
+def _solve_milp(
+    selected_foods: List[Dict[str, Any]],
+    costs: npt.NDArray[np.float64],
+    max_servings: List[float],
+    nutrient_goals: Dict[str, Any],
+    lower_bounds: Union[pd.Series[float], Dict[str, float]],
+    upper_bounds: Union[pd.Series[float], Dict[str, float]],
+    subset: List[int],
+    overflow_percentages: Tuple[int, ...],
+    deadline: float,
+) -> Optional[Dict[str, Any]]:
+    """
+    Cheapest diet over a subset of the candidates at fixed overflows, or None
+    if there is none or the deadline passes first.
+    """
+    foods = [selected_foods[j] for j in subset]
+    sub_costs = costs[subset]
+
+    with timed("model_build"):
+        prob, x = build_optimisation_model(
+            foods,
+            sub_costs,
+            [max_servings[j] for j in subset],
+            nutrient_goals,
+            lower_bounds,
+            upper_bounds,
+            overflow_percentages,
+        )
+    record("constraints", len(prob.constraints))
+
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return None
+    solve_model(prob, time_limit=remaining)
+    if prob.sol_status not in ACCEPTED_SOLUTIONS:
+        return None
+
+    with timed("format"):
+        used = [k for k, var in enumerate(x) if (var.value() or 0) > TOLERANCE]
+        result = format_optimisation_result(
+            [foods[k] for k in used],
+            [x[k] for k in used],
+            sub_costs[used],
+            OVERFLOW_NUTRIENTS,
+            overflow_percentages,
+        )
+    result["food_ids"] = [foods[k].get("fdcId") for k in used]
+    result["optimal"] = prob.sol_status == pulp.LpSolutionOptimal
+    return result
+
+
+def optimise_large_scale(
+    selected_foods: List[Dict[str, Any]],
+    costs: npt.NDArray[np.float64],
+    max_servings: List[float],
+    nutrient_goals: Dict[str, Any],
+    lower_bounds: Union[pd.Series[float], Dict[str, float]],
+    upper_bounds: Union[pd.Series[float], Dict[str, float]],
+    time_limit: float,
+) -> LargeScaleOutcome:
+    """
+    Find a cheap diet from a large set of candidate foods.
+
+    Args:
+        selected_foods: Candidate foods; must-include foods are always kept
+        costs: Price per serving of each candidate
+        max_servings: Max servings of each candidate
+        nutrient_goals: Macronutrient, fibre and saturated fat goals
+        lower_bounds: Nutrient lower bounds
+        upper_bounds: Nutrient upper bounds
+        time_limit: Seconds for the whole optimisation; the MILP returns its
+            best plan so far, flagged as not proven optimal, when it runs out
+
+    Returns:
+        The plan or None, the nutrient limits that even every candidate at
+        maximum overflow falls short of, and column generation statistics
+    """
+    deadline = time.monotonic() + time_limit
+    record("foods", len(selected_foods))
+
+    with timed("model_build"):
+        rows, labels = _relaxation_rows(
+            nutrient_matrix(selected_foods), nutrient_goals, lower_bounds, upper_bounds
+        )
+        must_include = [
+            j
+            for j, food in enumerate(selected_foods)
+            if food.get("must_include", False)
+        ]
+        columns = initial_columns(rows, costs, must_include)
+
+    rounds = 0
+    while True:
+        with timed("model_build"):
+            prob, x, overflow, artificial = _restricted_lp(
+                rows, columns, costs, max_servings
+            )
+        # Building the LP can use up what is left of the budget; no plan has
+        # been found yet, so there is nothing better to return.
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return LargeScaleOutcome(None, [], {"rounds": rounds})
+        solve_model(prob, time_limit=remaining)
+        rounds += 1
+        if prob.status != pulp.LpStatusOptimal:
+            return LargeScaleOutcome(None, [], {"rounds": rounds})
+
+        with timed("pricing"):
+            duals = np.array(
+                [prob.constraints[name].pi or 0.0 for name in rows.names],
+                dtype=np.float64,
+            )
+            reduced_costs = costs - rows.coefficients @ duals
+            candidates = reduced_costs.copy()
+            candidates[columns] = np.inf
+            entering = np.flatnonzero(candidates < -TOLERANCE)
+
+        if len(entering) == 0 or rounds >= MAX_ROUNDS or time.monotonic() >= deadline:
+            break
+        if len(entering) > COLUMNS_PER_ROUND:
+            entering = entering[
+                np.argpartition(candidates[entering], COLUMNS_PER_ROUND)[
+                    :COLUMNS_PER_ROUND
+                ]
+            ]
+        columns = sorted(columns + entering.tolist())
+
+    values = np.array([var.value() or 0.0 for var in x], dtype=np.float64)
+    overflow_percentages = tuple(
+        math.ceil((var.value() or 0.0) - TOLERANCE) for var in overflow
+    )
+    stats: Dict[str, Any] = {
+        "candidates": len(selected_foods),
+        "rounds": rounds,
+        "columns": len(columns),
+        "lp_cost": float(values @ costs[columns]),
+        "lp_overflow": overflow_percentages,
+    }
+
+    shortfalls = [
+        {
+            "nutrient": nutrient,
+            "bound": bound,
+            "limit": float(rows.limits[r])
+            * (
+                1
+                if rows.overflow_index[r] is None
+                else 1 + MAX_OVERFLOW_PERCENTAGE / 100
+            ),
+            "shortfall": var.value(),
+        }
+        for r, ((nutrient, bound), var) in enumerate(zip(labels, artificial))
+        if (var.value() or 0.0) > TOLERANCE * max(1.0, abs(rows.limits[r]))
+    ]
+    if shortfalls:
+        return LargeScaleOutcome(None, shortfalls, stats)
+
+    used = {columns[k] for k in np.flatnonzero(values > TOLERANCE).tolist()}
+    used.update(must_include)
+    ranked = [int(j) for j in np.argsort(reduced_costs) if int(j) not in used]
+
+    attempts = [
+        (sorted(used.union(ranked[:extra])), overflow_percentages)
+        for extra in MILP_EXTRA_COLUMNS
+    ]
+    attempts.append(
+        (attempts[-1][0], (MAX_OVERFLOW_PERCENTAGE,) * len(OVERFLOW_NUTRIENTS))
+    )
+
+    for subset, percentages in attempts:
+        if time.monotonic() >= deadline:
+            break
+        stats["milp_foods"] = len(subset)
+        result = _solve_milp(
+            selected_foods,
+            costs,
+            max_servings,
+            nutrient_goals,
+            lower_bounds,
+            upper_bounds,
+            subset,
+            percentages,
+            deadline,
+        )
+        if result is not None:
+            return LargeScaleOutcome(result, [], stats)
+
+    return LargeScaleOutcome(None, [], stats)
@@ -0,0 +1,212 @@
+"""
+Minimal-relaxation diagnosis of an infeasible diet.
+
+When no diet meets the request, one elastic model is solved instead of
+letting the user loosen bounds by trial and error. Every nutrient limit gets
+a non-negative slack that moves it outwards, and every limited food gets a
+slack on its max servings. The objective minimises the weighted total slack,
+where each slack is weighted by the inverse size of the limit it moves, so
+the relaxations are compared as fractions of their limits rather than in
+mixed units.
+
+A macronutrient goal is both a minimum and, with overflow, a maximum, so it
+is moved as a whole, up or down, with its maximum overflow allowed; the
+diagnosis reports what has to change beyond the flexibility the optimiser
+already has. Integer servings and must-include foods are kept as they are.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+import pulp
+
+from server.config import UNLIMITED_MAX_SERVING
+from server.services.optimisation import (
+    MAX_OVERFLOW_PERCENTAGE,
+    OVERFLOW_NUTRIENTS,
+    nutrient_limits,
+)
+from server.utils.nutrient_utils import NUTRIENT_INDEX, nutrient_matrix
+from server.utils.solver_utils import (
+    ACCEPTED_SOLUTIONS,
+    nutrient_constraint_name,
+    solve_model,
+)
+from server.utils.timing import timed
+
+TOLERANCE = 1e-6
+# Reported moves are padded so limits set exactly to them are not left on
+# the edge of feasibility by solver tolerances and rounded solution values.
+RELAXATION_MARGIN = 0.01
+
+
+def _weight(limit: float) -> float:
+    """Cost of one unit of slack on a limit, relative to the limit's size."""
+    return 1.0 / max(abs(limit), 1.0)
+
+
+def diagnose_infeasibility(
+    selected_foods: List[Dict[str, Any]],
+    max_servings: List[float],
+    nutrient_goals: Dict[str, Any],
+    lower_bounds: Union[pd.Series[float], Dict[str, float]],
+    upper_bounds: Union[pd.Series[float], Dict[str, float]],
+    time_limit: Optional[float] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Find the smallest weighted relaxation of the limits that admits a diet.
+
+    Args:
+        selected_foods: Foods in the request
+        max_servings: Max servings of each food
+        nutrient_goals: Macronutrient, fibre and saturated fat goals
+        lower_bounds: Nutrient lower bounds
+        upper_bounds: Nutrient upper bounds
+        time_limit: Seconds after which the best relaxation so far is used
+
+    Returns:
+        Dictionary with the nutrient limits and food max servings to move,
+        each with its current and relaxed value, whether the relaxation is
+        proven minimal, and the total weighted relaxation; None if the solver
+        found no relaxation in time
+    """
+    num_foods = len(selected_foods)
+    unlimited = [
+        UNLIMITED_MAX_SERVING / float(food["servingSize"]) for food in selected_foods
+    ]
+
+    with timed("model_build"):
+        prob = pulp.LpProblem("Diet_Diagnosis", pulp.LpMinimize)
+
+        x = [
+            pulp.LpVariable(
+                f"x_{i}",
+                0,
+                cat=pulp.LpInteger
+                if food.get("requires_integer_servings", False)
+                else pulp.LpContinuous,
+            )
+            for i, food in enumerate(selected_foods)
+        ]
+        y = [pulp.LpVariable(f"y_{i}", cat=pulp.LpBinary) for i in range(num_foods)]
+
+        # Foods that are already unlimited have nothing to relax.
+        serving_slack = {
+            i: pulp.LpVariable(f"s_food_{i}", 0)
+            for i in range(num_foods)
+            if max_servings[i] < unlimited[i]
+        }
+        penalties = [
+            _weight(max_servings[i]) * slack for i, slack in serving_slack.items()
+        ]
+
+        for i, food in enumerate(selected_foods):
+            if i in serving_slack:
+                prob += x[i] <= max_servings[i] * y[i] + serving_slack[i]
+                prob += serving_slack[i] <= (unlimited[i] - max_servings[i]) * y[i]
+            else:
+                prob += x[i] <= max_servings[i] * y[i]
+            prob += x[i] >= y[i]
+
+            if food.get("must_include", False):
+                prob += y[i] == 1
+
+        matrix = nutrient_matrix(selected_foods)
+        limits = nutrient_limits(nutrient_goals, lower_bounds, upper_bounds)
+        nutrient_slack: List[pulp.LpVariable] = []
+        goal_shifts: Dict[str, Tuple[pulp.LpVariable, pulp.LpVariable]] = {}
+
+        for k, limit in enumerate(limits):
+            values = matrix[:, NUTRIENT_INDEX[limit.nutrient]].tolist()
+            total = pulp.lpSum([values[j] * x[j] for j in range(num_foods)])
+
+            if limit.nutrient in OVERFLOW_NUTRIENTS:
+                # A macronutrient goal sets both its min and its overflow
+                # max, so the goal itself is moved up or down.
+                if limit.nutrient not in goal_shifts:
+                    shift = (
+                        pulp.LpVariable(f"s_goal_up_{k}", 0),
+                        pulp.LpVariable(f"s_goal_down_{k}", 0),
+                    )
+                    goal_shifts[limit.nutrient] = shift
+                    penalties.append(_weight(limit.value) * pulp.lpSum(shift))
+                up, down = goal_shifts[limit.nutrient]
+                goal = limit.value + up - down
+                if limit.is_lower:
+                    constraint = total >= goal
+                else:
+                    constraint = total <= goal * (1 + MAX_OVERFLOW_PERCENTAGE / 100)
+            else:
+                slack = pulp.LpVariable(f"s_nutrient_{k}", 0)
+                nutrient_slack.append(slack)
+                penalties.append(_weight(limit.value) * slack)
+                if limit.is_lower:
+                    constraint = total + slack >= limit.value
+                else:
+                    constraint = total - slack <= limit.value
+
+            prob += (constraint, nutrient_constraint_name(limit.nutrient, limit.kind))
+
+        prob += pulp.lpSum(penalties)
+
+    solve_model(prob, time_limit=time_limit)
+
+    if prob.sol_status not in ACCEPTED_SOLUTIONS:
+        return None
+
+    nutrients: List[Dict[str, Any]] = []
+    for nutrient, (up, down) in goal_shifts.items():
+        goal = float(nutrient_goals[nutrient])
+        change = ((up.value() or 0.0) - (down.value() or 0.0)) * (1 + RELAXATION_MARGIN)
+        if abs(change) > TOLERANCE * max(1.0, abs(goal)):
+            nutrients.append(
+                {
+                    "nutrient": nutrient,
+                    "bound": "goal",
+                    "limit": goal,
+                    "relaxedLimit": goal + change,
+                    "change": change,
+                }
+            )
+
+    other_limits = [limit for limit in limits if limit.nutrient not in goal_shifts]
+    for limit, slack in zip(other_limits, nutrient_slack):
+        change = (slack.value() or 0.0) * (1 + RELAXATION_MARGIN)
+        if change <= TOLERANCE * max(1.0, abs(limit.value)):
+            continue
+        nutrients.append(
+            {
+                "nutrient": limit.nutrient,
+                "bound": "min" if limit.is_lower else "max",
+                "limit": limit.value,
+                "relaxedLimit": max(0.0, limit.value - change)
+                if limit.is_lower
+                else limit.value + change,
+                "change": change,
+            }
+        )
+
+    foods: List[Dict[str, Any]] = []
+    for i, slack in serving_slack.items():
+        change = (slack.value() or 0.0) * (1 + RELAXATION_MARGIN)
+        if change <= TOLERANCE * max(1.0, max_servings[i]):
+            continue
+        serving_size = float(selected_foods[i]["servingSize"])
+        foods.append(
+            {
+                "foodItem": selected_foods[i]["description"],
+                "maxServings": max_servings[i],
+                "relaxedMaxServings": max_servings[i] + change,
+                "relaxedMaxServing": (max_servings[i] + change) * serving_size,
+                "change": change,
+            }
+        )
+
+    return {
+        "nutrients": nutrients,
+        "foods": foods,
+        "totalRelaxation": pulp.value(prob.objective) or 0.0,
+        "optimal": prob.sol_status == pulp.LpSolutionOptimal,
+    }
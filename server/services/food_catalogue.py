@@ -0,0 +1,205 @@
+"""
+Server-side catalogue of food nutrient vectors.
+
+Foods returned by the USDA search are registered under their fdcId; foods
+without one can be registered under a hash of their content. An optimise
+request may then send ``{"id", "price", "servingSize", "maxServing"}`` for a
+catalogued food instead of its full nutrient dict, and the request's nutrient
+matrix is assembled from the stored arrays.
+
+Like the session cache, the catalogue lives in process memory, so under
+several gunicorn workers a client must be ready to resend full foods when a
+request is rejected for unknown ids. Ids missing here can also be resolved
+against the shared memory-mapped catalogue, which every worker sees.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Union,
+)
+
+import numpy as np
+import numpy.typing as npt
+
+from server.utils.nutrient_utils import NUTRIENTS, NutrientVector
+
+if TYPE_CHECKING:
+    from server.services.shared_catalogue import SharedCatalogue
+
+MAX_REPORTED_UNKNOWN_IDS = 10
+
+
+class CatalogueFood(NamedTuple):
+    """
+    A catalogued food with its nutrients per 100 g in NUTRIENTS order.
+
+    Foods in a priced shared catalogue also carry their price and servings,
+    so they can be offered to the optimiser without a client listing them.
+    """
+
+    description: str
+    nutrients: npt.NDArray[np.float64]
+    price: Optional[float] = None
+    serving_size: float = 100.0
+    max_serving: Optional[float] = None
+    integer_servings: bool = False
+
+
+def content_id(description: str, nutrients: npt.NDArray[np.float64]) -> str:
+    """Catalogue id derived from a food's name and nutrient values."""
+    digest = hashlib.sha1(description.encode("utf-8"))
+    digest.update(nutrients.tobytes())
+    return f"sha1-{digest.hexdigest()[:20]}"
+
+
+class FoodCatalogue:
+    """Thread-safe LRU mapping of food ids to nutrient vectors."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CatalogueFood] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        description: str,
+        nutrients_per_100g: Mapping[str, Optional[float]],
+        food_id: Optional[str] = None,
+    ) -> str:
+        """
+        Store a food's nutrients, replacing any entry with the same id.
+
+        Args:
+            description: Food name
+            nutrients_per_100g: Nutrient values per 100 g; missing ones are zero
+            food_id: Id to store under, or None to use ``content_id``
+
+        Returns:
+            The food's catalogue id
+        """
+        vector = np.array(
+            [nutrients_per_100g.get(nutrient) or 0 for nutrient in NUTRIENTS],
+            dtype=np.float64,
+        )
+        food_id = food_id or content_id(description, vector)
+
+        with self._lock:
+            self._entries[food_id] = CatalogueFood(description, vector)
+            self._entries.move_to_end(food_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return food_id
+
+    def get_many(self, food_ids: Sequence[str]) -> List[Optional[CatalogueFood]]:
+        """Look up several foods, with None for ids not in the catalogue."""
+        with self._lock:
+            foods = [self._entries.get(food_id) for food_id in food_ids]
+            for food_id, food in zip(food_ids, foods):
+                if food is not None:
+                    self._entries.move_to_end(food_id)
+        return foods
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def resolve_foods(
+    selected_foods: List[Dict[str, Any]],
+    catalogue: FoodCatalogue,
+    shared: Optional[SharedCatalogue] = None,
+) -> Union[List[Dict[str, Any]], str]:
+    """
+    Fill in catalogued foods that a request referenced by id.
+
+    Foods that carry their own ``nutrients`` are passed through unchanged.
+    The others get their description and per-serving nutrients from the
+    catalogue, scaled in one array operation and exposed as NutrientVector
+    rows of a single matrix.
+
+    Args:
+        selected_foods: Foods from the request
+        catalogue: Catalogue to resolve ids against
+        shared: Shared catalogue for ids that ``catalogue`` does not hold
+
+    Returns:
+        Foods ready for optimisation, or an error message naming unknown ids
+    """
+    referenced = [i for i, food in enumerate(selected_foods) if "nutrients" not in food]
+    if not referenced:
+        return selected_foods
+
+    food_ids = [str(selected_foods[i].get("id")) for i in referenced]
+    entries = catalogue.get_many(food_ids)
+    if shared is not None:
+        missing = [j for j, entry in enumerate(entries) if entry is None]
+        if missing:
+            fallback = shared.get_many([food_ids[j] for j in missing])
+            for j, entry in zip(missing, fallback):
+                entries[j] = entry
+
+    unknown = [food_id for food_id, entry in zip(food_ids, entries) if entry is None]
+    if unknown:
+        listed = ", ".join(unknown[:MAX_REPORTED_UNKNOWN_IDS])
+        return f"Unknown food ids: {listed}. Send these foods with their nutrients."
+
+    found = [entry for entry in entries if entry is not None]
+    serving_sizes = np.array(
+        [float(selected_foods[i]["servingSize"]) for i in referenced]
+    )
+    matrix = np.stack([entry.nutrients for entry in found])
+    matrix *= (serving_sizes / 100)[:, None]
+
+    resolved = list(selected_foods)
+    for row, (i, entry) in enumerate(zip(referenced, found)):
+        resolved[i] = {
+            **selected_foods[i],
+            "fdcId": food_ids[row],
+            "description": entry.description,
+            "nutrients": NutrientVector(matrix[row]),
+        }
+    return resolved
+
+
+def catalogue_candidates(shared: SharedCatalogue) -> List[Dict[str, Any]]:
+    """
+    Offer every priced food of the shared catalogue for optimisation.
+
+    Only the shared catalogue is used, so every worker offers the same foods
+    and nothing one client imported reaches another client's diet.
+
+    Returns:
+        Foods with per-serving NutrientVector nutrients, ready for
+        optimisation like the output of ``resolve_foods``
+    """
+    priced = shared.priced()
+    if not priced:
+        return []
+
+    serving_sizes = np.array([food.serving_size for _, food in priced])
+    matrix = np.stack([food.nutrients for _, food in priced])
+    matrix *= (serving_sizes / 100)[:, None]
+    return [
+        {
+            "fdcId": food_id,
+            "description": food.description,
+            "price": food.price,
+            "servingSize": food.serving_size,
+            "maxServing": food.max_serving or 0,
+            "requires_integer_servings": food.integer_servings,
+            "nutrients": NutrientVector(row),
+        }
+        for (food_id, food), row in zip(priced, matrix)
+    ]
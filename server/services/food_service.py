@@ -1,67 +1,232 @@
 """
 Services for food data retrieval and processing.
+
+Searches are fetched a USDA page at a time. Extracted pages are cached per
+API key, so repeated and continued searches reuse them, and a search can be
+continued past any page with an opaque cursor naming the query and the next
+page.
 """
 
-from typing import Any, Dict, List, Union
+import base64
+import binascii
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
 
 import requests
 
+from server.config import SEARCH_PAGE_CACHE_MAX_PAGES, SEARCH_PAGE_CACHE_TTL_SECONDS
+from server.services.usda_client import USDAClient, client_for
 from server.utils.nutrient_utils import extract_nutrients
+from server.utils.timing import increment, timed
 
+SEARCH_PAGE_SIZE = 200
+SEARCH_MAX_PAGES = 10
 
-def search_foods(
-    api_key: str, search_term: str, api_endpoint: str
-) -> List[Dict[str, Any]]:
+
+class SearchPage(NamedTuple):
+    """One extracted page of USDA search results."""
+
+    foods: List[Dict[str, Any]]
+    page_number: int
+    total_hits: int
+
+    @property
+    def page_count(self) -> int:
+        return (self.total_hits + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+
+
+class SearchResults(NamedTuple):
+    """Foods found by a search, and whether every page could be fetched."""
+
+    foods: List[Dict[str, Any]]
+    complete: bool
+    next_page: Optional[int] = None
+
+
+class SearchPageCache:
     """
-    Search for foods using the USDA API with pagination.
+    LRU cache of extracted search pages that expire after a TTL.
+
+    Pages are cached under the API key that fetched them, so a cached page is
+    only served to a caller whose key USDA has already accepted and whose
+    rate limit the fetch counted against.
+    """
+
+    def __init__(self, ttl_seconds: float, max_pages: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_pages = max_pages
+        self._pages: "OrderedDict[Tuple[str, str, int], Tuple[float, SearchPage]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, api_key: str, query: str, page_number: int) -> Optional[SearchPage]:
+        key = (api_key, query, page_number)
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._pages[key]
+                return None
+            self._pages.move_to_end(key)
+            return entry[1]
+
+    def put(self, api_key: str, query: str, page: SearchPage) -> None:
+        key = (api_key, query, page.page_number)
+        with self._lock:
+            self._pages[key] = (time.monotonic(), page)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+
+
+page_cache = SearchPageCache(SEARCH_PAGE_CACHE_TTL_SECONDS, SEARCH_PAGE_CACHE_MAX_PAGES)
+
+
+def normalise_query(search_term: str) -> str:
+    """Query as cached and coalesced: lower case with single spaces."""
+    return " ".join(search_term.lower().split())
+
+
+def encode_cursor(search_term: str, page_number: int) -> str:
+    """Opaque cursor continuing a search from ``page_number``."""
+    payload = json.dumps({"q": search_term, "p": page_number}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[str, int]]:
+    """
+    Read a cursor made by ``encode_cursor``.
+
+    Returns:
+        Tuple of (search term, page number), or None if the cursor is invalid
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(payload, dict):
+        return None
+    search_term, page_number = payload.get("q"), payload.get("p")
+    if not isinstance(search_term, str) or not search_term.strip():
+        return None
+    if not isinstance(page_number, int) or page_number < 1:
+        return None
+    return search_term, page_number
+
+
+def fetch_search_page(
+    api_key: str,
+    search_term: str,
+    page_number: int,
+    api_endpoint: str,
+    client: Optional[USDAClient] = None,
+) -> SearchPage:
+    """
+    Fetch and extract one page of search results.
+
+    Pages are served from the page cache when the same key fetched them
+    before. Concurrent fetches of the same page with the same key share one
+    upstream request; callers with other keys make their own, so each key is
+    validated and rate limited by USDA and by the client.
 
     Args:
         api_key: USDA API key
         search_term: Term to search for
+        page_number: Page to fetch, from 1
         api_endpoint: USDA API endpoint URL
+        client: Client to fetch with; defaults to the shared client for
+            ``api_endpoint``
 
     Returns:
-        List of food dictionaries with nutrients
+        The page, shared with other callers and so not to be modified
 
     Raises:
-        requests.exceptions.RequestException: If API request fails
+        requests.exceptions.RequestException: If the page cannot be fetched
     """
-    search_results: List[Dict[str, Any]] = []
-    page_size = 200
-    page_number = 1
-    total_pages = 1
+    query = normalise_query(search_term)
+    cached = page_cache.get(api_key, query, page_number)
+    if cached is not None:
+        increment("search_page_cache_hits")
+        return cached
+
+    usda = client or client_for(api_endpoint)
 
-    while page_number <= total_pages:
+    def fetch() -> SearchPage:
         params: Dict[str, Union[str, int, bool]] = {
-            "api_key": api_key,
             "query": search_term,
             "dataType": "SR Legacy",
-            "pageSize": page_size,
+            "pageSize": SEARCH_PAGE_SIZE,
             "pageNumber": page_number,
             "requireAllWords": True,
         }
+        with timed("fetch", detail=f"fetch-p{page_number}"):
+            data = usda.get(api_key, params)
 
-        response = requests.get(api_endpoint, params=params)
-        response.raise_for_status()
-
-        data = response.json()
-
-        if page_number == 1:
-            total_hits = data.get("totalHits", 0)
-            total_pages = (total_hits + page_size - 1) // page_size
-
-            if total_pages > 10:
-                total_pages = 10
-
-        for food in data.get("foods", []):
-            search_results.append(
+        with timed("extract"):
+            foods = [
                 {
                     "fdcId": str(food.get("fdcId")),
                     "description": food.get("description"),
                     "nutrients": extract_nutrients(food.get("foodNutrients", [])),
                 }
-            )
+                for food in data.get("foods", [])
+            ]
+
+        page = SearchPage(foods, page_number, int(data.get("totalHits", 0)))
+        page_cache.put(api_key, query, page)
+        return page
+
+    return usda.coalesce(api_key, ("page", query, page_number), fetch)
 
-        page_number += 1
 
-    return search_results
+def search_foods(
+    api_key: str,
+    search_term: str,
+    api_endpoint: str,
+    client: Optional[USDAClient] = None,
+) -> SearchResults:
+    """
+    Search for foods using the USDA API with pagination.
+
+    Fetches up to SEARCH_MAX_PAGES pages. If a page after the first still
+    fails after its retries, the foods from the earlier pages are returned
+    rather than thrown away.
+
+    Args:
+        api_key: USDA API key
+        search_term: Term to search for
+        api_endpoint: USDA API endpoint URL
+        client: Client to fetch pages with; defaults to the shared client
+            for ``api_endpoint``
+
+    Returns:
+        Foods with nutrients, whether every page was fetched, and the page
+        to continue from if the search has more results
+
+    Raises:
+        requests.exceptions.RequestException: If the first page fails
+    """
+    first = fetch_search_page(api_key, search_term, 1, api_endpoint, client)
+    search_results = list(first.foods)
+    total_pages = min(first.page_count, SEARCH_MAX_PAGES)
+
+    for page_number in range(2, total_pages + 1):
+        try:
+            page = fetch_search_page(
+                api_key, search_term, page_number, api_endpoint, client
+            )
+        except requests.exceptions.RequestException:
+            return SearchResults(search_results, False, page_number)
+        search_results.extend(page.foods)
+
+    next_page = total_pages + 1 if first.page_count > total_pages else None
+    return SearchResults(search_results, True, next_page)
@@ -0,0 +1,266 @@
+"""
+Multi-day meal plan optimisation.
+
+Every day of the plan gets its own serving and food-selection variables in one
+sparse model. Cross-day rules can then be written as plain constraints:
+
+* each day meets the same goals and bounds as a single-day plan
+* a food may be used on at most ``max_days_per_food`` days
+* optional weekly bounds limit a nutrient summed over the whole plan
+
+Constraint rows are built straight from a foods x nutrients matrix and only
+carry the non-zero coefficients.
+
+Instead of the single-day sweep over overflow combinations, the macronutrient
+overflow percentages are integer variables shared by every day. A first solve
+minimises their sum, and a second minimises cost with the sum capped at that
+minimum.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import pulp
+
+from server.services.optimisation import (
+    MAX_OVERFLOW_PERCENTAGE,
+    OVERFLOW_NUTRIENTS,
+    nutrient_limits,
+)
+from server.utils.nutrient_utils import NUTRIENT_INDEX, NUTRIENTS, nutrient_matrix
+from server.utils.solver_utils import (
+    ACCEPTED_SOLUTIONS,
+    nutrient_constraint_name,
+    solve_model,
+)
+from server.utils.timing import record, timed
+
+WeeklyBounds = Dict[str, Dict[str, float]]
+
+
+def _sparse_sum(
+    variables: Sequence[pulp.LpVariable], coefficients: npt.NDArray[np.float64]
+) -> pulp.LpAffineExpression:
+    """Linear expression over the variables whose coefficient is non-zero."""
+    return pulp.LpAffineExpression(
+        [
+            (variables[i], float(coefficients[i]))
+            for i in np.flatnonzero(coefficients).tolist()
+        ]
+    )
+
+
+def build_meal_plan_model(
+    selected_foods: List[Dict[str, Any]],
+    max_servings: List[float],
+    nutrient_goals: Dict[str, Any],
+    lower_bounds: Union[pd.Series[float], Dict[str, float]],
+    upper_bounds: Union[pd.Series[float], Dict[str, float]],
+    days: int,
+    max_days_per_food: int,
+    weekly_bounds: WeeklyBounds,
+) -> Tuple[pulp.LpProblem, List[List[pulp.LpVariable]], List[pulp.LpVariable]]:
+    """
+    Build the multi-day diet MILP without an objective.
+
+    Args:
+        selected_foods: Foods available on every day
+        max_servings: Max servings of each food per day
+        nutrient_goals: Per-day macronutrient, fibre and saturated fat goals
+        lower_bounds: Per-day nutrient lower bounds
+        upper_bounds: Per-day nutrient upper bounds
+        days: Number of days in the plan
+        max_days_per_food: Days on which any one food may appear
+        weekly_bounds: Optional ``{"min": ..., "max": ...}`` limits on a
+            nutrient's total over the whole plan
+
+    Returns:
+        Tuple of (problem, serving variables by day then food, overflow
+        percentage variables in OVERFLOW_NUTRIENTS order)
+    """
+    matrix = nutrient_matrix(selected_foods)
+    num_foods = len(selected_foods)
+
+    prob = pulp.LpProblem("Meal_Plan_Optimisation", pulp.LpMinimize)
+
+    x = [
+        [
+            pulp.LpVariable(
+                f"x_{d}_{i}",
+                0,
+                max_servings[i],
+                cat=pulp.LpInteger
+                if food.get("requires_integer_servings", False)
+                else pulp.LpContinuous,
+            )
+            for i, food in enumerate(selected_foods)
+        ]
+        for d in range(days)
+    ]
+    y = [
+        [pulp.LpVariable(f"y_{d}_{i}", cat=pulp.LpBinary) for i in range(num_foods)]
+        for d in range(days)
+    ]
+    overflow = [
+        pulp.LpVariable(f"o_{k}", 0, MAX_OVERFLOW_PERCENTAGE, cat=pulp.LpInteger)
+        for k in range(len(OVERFLOW_NUTRIENTS))
+    ]
+
+    for d in range(days):
+        for i in range(num_foods):
+            prob += x[d][i] <= max_servings[i] * y[d][i]
+            prob += x[d][i] >= y[d][i]
+
+    for i, food in enumerate(selected_foods):
+        days_used = pulp.lpSum([y[d][i] for d in range(days)])
+        if max_days_per_food < days:
+            prob += days_used <= max_days_per_food
+        if food.get("must_include", False):
+            prob += days_used >= 1
+
+    limits = nutrient_limits(nutrient_goals, lower_bounds, upper_bounds)
+    for d in range(days):
+        for limit in limits:
+            total = _sparse_sum(x[d], matrix[:, NUTRIENT_INDEX[limit.nutrient]])
+            if limit.overflow_index is not None:
+                total.addterm(overflow[limit.overflow_index], -limit.value / 100)
+
+            prob += (
+                total >= limit.value if limit.is_lower else total <= limit.value,
+                f"day{d}_{nutrient_constraint_name(limit.nutrient, limit.kind)}",
+            )
+
+    all_servings = [var for day in x for var in day]
+    for nutrient, bounds in weekly_bounds.items():
+        total = _sparse_sum(
+            all_servings, np.tile(matrix[:, NUTRIENT_INDEX[nutrient]], days)
+        )
+        if "min" in bounds:
+            prob += (
+                total >= bounds["min"],
+                f"weekly_{nutrient_constraint_name(nutrient, 'min')}",
+            )
+        if "max" in bounds:
+            prob += (
+                total <= bounds["max"],
+                f"weekly_{nutrient_constraint_name(nutrient, 'max')}",
+            )
+
+    return prob, x, overflow
+
+
+def _solve(prob: pulp.LpProblem, time_limit: float, warm_start: bool) -> bool:
+    """Solve within ``time_limit`` seconds; True if a plan was found."""
+    solve_model(prob, warm_start=warm_start, time_limit=time_limit)
+    return prob.sol_status in ACCEPTED_SOLUTIONS
+
+
+def optimise_meal_plan(
+    selected_foods: List[Dict[str, Any]],
+    costs: npt.NDArray[np.float64],
+    max_servings: List[float],
+    nutrient_goals: Dict[str, Any],
+    lower_bounds: Union[pd.Series[float], Dict[str, float]],
+    upper_bounds: Union[pd.Series[float], Dict[str, float]],
+    days: int,
+    max_days_per_food: int,
+    weekly_bounds: WeeklyBounds,
+    time_limit: float,
+) -> Optional[Dict[str, Any]]:
+    """
+    Find the cheapest multi-day plan with the least macronutrient overflow.
+
+    Args:
+        time_limit: Seconds shared by model building and both solves; the
+            best plan found so far is returned, flagged as not proven
+            optimal, when it runs out
+
+    Returns:
+        Plan with servings and totals per day, or None if no plan was found
+    """
+    deadline = time.monotonic() + time_limit
+    record("foods", len(selected_foods))
+
+    with timed("model_build"):
+        prob, x, overflow = build_meal_plan_model(
+            selected_foods,
+            max_servings,
+            nutrient_goals,
+            lower_bounds,
+            upper_bounds,
+            days,
+            max_days_per_food,
+            weekly_bounds,
+        )
+
+    record("constraints", len(prob.constraints))
+
+    prob.setObjective(pulp.lpSum(overflow))
+    if not _solve(prob, max(deadline - time.monotonic(), 0.1), warm_start=False):
+        return None
+    optimal = prob.sol_status == pulp.LpSolutionOptimal
+
+    # The cost solve only gets what is left of the budget; with nothing left,
+    # the least-overflow plan is returned as it is.
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        with timed("format"):
+            return format_meal_plan(selected_foods, x, overflow, costs, False)
+
+    total_overflow = round(pulp.value(prob.objective) or 0)
+    least_overflow = {var.name: var.varValue for var in prob.variables()}
+    prob += (pulp.lpSum(overflow) <= total_overflow, "total_overflow")
+    prob.setObjective(
+        _sparse_sum([var for day in x for var in day], np.tile(costs, days))
+    )
+    if _solve(prob, remaining, warm_start=True):
+        optimal = optimal and prob.sol_status == pulp.LpSolutionOptimal
+    else:
+        # The cost solve ran out of time before finding a plan; fall back to
+        # the least-overflow plan, as when no time was left for it.
+        for var in prob.variables():
+            var.varValue = least_overflow.get(var.name)
+        optimal = False
+
+    with timed("format"):
+        return format_meal_plan(selected_foods, x, overflow, costs, optimal)
+
+
+def format_meal_plan(
+    selected_foods: List[Dict[str, Any]],
+    x: List[List[pulp.LpVariable]],
+    overflow: List[pulp.LpVariable],
+    costs: npt.NDArray[np.float64],
+    optimal: bool,
+) -> Dict[str, Any]:
+    """
+    Format a solved meal plan for the API response.
+    """
+    servings = np.array(
+        [[var.value() or 0 for var in day] for day in x], dtype=np.float64
+    )
+    daily_totals = servings @ nutrient_matrix(selected_foods)
+    daily_costs = servings @ costs
+    overflow_percentages = [round(var.value() or 0) for var in overflow]
+
+    return {
+        "food_items": [food["description"] for food in selected_foods],
+        "days": [
+            {
+                "servings": servings[d].tolist(),
+                "total_cost_sum": float(daily_costs[d]),
+                "nutrient_totals": dict(zip(NUTRIENTS, daily_totals[d].tolist())),
+            }
+            for d in range(len(x))
+        ],
+        "weekly_nutrient_totals": dict(zip(NUTRIENTS, daily_totals.sum(0).tolist())),
+        "total_cost_sum": float(daily_costs.sum()),
+        "overflow_by_nutrient": dict(zip(OVERFLOW_NUTRIENTS, overflow_percentages)),
+        "total_overflow": sum(overflow_percentages),
+        "optimal": optimal,
+    }
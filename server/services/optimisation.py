@@ -4,16 +4,52 @@ Diet optimisation services.
 
 from __future__ import annotations
 
+import time
 from itertools import product
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import numpy.typing as npt
 import pandas as pd
 import pulp
 
-from server.config import NUTRIENT_MAP
-from server.utils.nutrient_utils import standardise_nutrient_bounds
+from server.config import NUTRIENT_MAP, UNLIMITED_MAX_SERVING
+from server.services.sensitivity import analyse_sensitivity
+from server.utils.nutrient_utils import (
+    NUTRIENT_INDEX,
+    NUTRIENTS,
+    nutrient_matrix,
+    standardise_nutrient_bounds,
+)
+from server.utils.solver_utils import (
+    ACCEPTED_SOLUTIONS,
+    nutrient_constraint_name,
+    solve_model,
+)
+from server.utils.timing import record, timed
+
+OVERFLOW_NUTRIENTS = ["protein", "carbohydrate", "fats"]
+MAX_OVERFLOW_PERCENTAGE = 10
+FRONTIER_LEVELS = range(0, MAX_OVERFLOW_PERCENTAGE * len(OVERFLOW_NUTRIENTS) + 1)
+
+OverflowPercentage = Union[int, pulp.LpVariable]
+FrontierPoint = Tuple[float, List[float]]
+
+
+def max_servings_for(food: Dict[str, Any]) -> float:
+    """
+    Number of servings a food's max serving allows.
+
+    A missing, blank or zero ``maxServing`` (in grams) means unlimited.
+    """
+    max_val = food.get("maxServing")
+
+    if max_val is None or max_val == "" or float(max_val) == 0:
+        limit: float = UNLIMITED_MAX_SERVING
+    else:
+        limit = float(max_val)
+
+    return limit / float(food["servingSize"])
 
 
 def analyse_feasibility(
@@ -26,17 +62,18 @@ def analyse_feasibility(
     """
     Analyse whether the selected foods can meet nutrient requirements.
     """
-    lower_bounds_dict, upper_bounds_dict = standardise_nutrient_bounds(
-        lower_bounds, upper_bounds
-    )
+    with timed("feasibility"):
+        lower_bounds_dict, upper_bounds_dict = standardise_nutrient_bounds(
+            lower_bounds, upper_bounds
+        )
 
-    lower_bound_issues = analyse_lower_bound_feasibility(
-        selected_foods, max_servings, lower_bounds_dict, nutrient_goals
-    )
+        lower_bound_issues = analyse_lower_bound_feasibility(
+            selected_foods, max_servings, lower_bounds_dict, nutrient_goals
+        )
 
-    upper_bound_issues = analyse_upper_bound_feasibility(
-        selected_foods, upper_bounds_dict, nutrient_goals
-    )
+        upper_bound_issues = analyse_upper_bound_feasibility(
+            selected_foods, upper_bounds_dict, nutrient_goals
+        )
 
     is_lower_bounds_feasible = len(lower_bound_issues) == 0
     is_upper_bounds_feasible = len(upper_bound_issues) == 0
@@ -182,16 +219,28 @@ def optimise_diet(
     nutrient_goals: Dict[str, Any],
     lower_bounds: Union[pd.Series[float], Dict[str, float]],
     upper_bounds: Union[pd.Series[float], Dict[str, float]],
+    sensitivity: bool = False,
+    start_combo: Optional[Tuple[int, ...]] = None,
+    initial_servings: Optional[List[Optional[float]]] = None,
 ) -> Optional[Dict[str, Any]]:
     """
     Find optimal diet by trying different overflow percentages.
+
+    With ``sensitivity`` set, the result also carries a sensitivity report for
+    the winning solve. ``start_combo`` skips every combination before it in
+    sweep order and must only be given when those are known to be infeasible.
+    ``initial_servings`` are passed to every solve as a MIP start.
     """
-    overflow_percentages = range(0, 11)
-    nutrients = ["protein", "carbohydrate", "fats"]
+    overflow_percentages = range(0, MAX_OVERFLOW_PERCENTAGE + 1)
 
-    all_combinations = product(overflow_percentages, repeat=len(nutrients))
+    all_combinations = product(overflow_percentages, repeat=len(OVERFLOW_NUTRIENTS))
     sorted_combinations = sorted(all_combinations, key=sum)
 
+    if start_combo in sorted_combinations:
+        sorted_combinations = sorted_combinations[
+            sorted_combinations.index(start_combo) :
+        ]
+
     for combo in sorted_combinations:
         result = solve_optimisation_problem(
             selected_foods,
@@ -201,9 +250,12 @@ def optimise_diet(
             lower_bounds,
             upper_bounds,
             combo,
+            sensitivity,
+            initial_servings,
         )
 
         if result:
+            record("overflow_tier", sum(combo))
             return result
 
     return None
@@ -217,15 +269,155 @@ def solve_optimisation_problem(
     lower_bounds: Union[pd.Series[float], Dict[str, float]],
     upper_bounds: Union[pd.Series[float], Dict[str, float]],
     overflow_percentages: Tuple[int, ...],
+    sensitivity: bool = False,
+    initial_servings: Optional[List[Optional[float]]] = None,
 ) -> Optional[Dict[str, Any]]:
     """
     Solve the diet optimisation problem with the given parameters.
     """
+    record("foods", len(selected_foods))
+
+    with timed("model_build"):
+        prob, x = build_optimisation_model(
+            selected_foods,
+            costs,
+            max_servings,
+            nutrient_goals,
+            lower_bounds,
+            upper_bounds,
+            overflow_percentages,
+        )
+
+    record("constraints", len(prob.constraints))
+
+    if initial_servings is not None:
+        set_initial_servings(prob, x, initial_servings)
+
+    solve_model(prob, warm_start=initial_servings is not None)
+
+    if prob.status != pulp.LpStatusOptimal:
+        return None
+
+    with timed("format"):
+        result = format_optimisation_result(
+            selected_foods, x, costs, OVERFLOW_NUTRIENTS, overflow_percentages
+        )
+
+    if sensitivity:
+        with timed("sensitivity"):
+            result["sensitivity"] = analyse_sensitivity(prob, x, selected_foods, costs)
+
+    return result
+
+
+class NutrientLimit(NamedTuple):
+    """One nutrient constraint shared by the single- and multi-day models."""
+
+    nutrient: str
+    kind: str
+    is_lower: bool
+    value: float
+    overflow_index: Optional[int] = None
+
+
+def nutrient_limits(
+    nutrient_goals: Dict[str, Any],
+    lower_bounds: Union[pd.Series[float], Dict[str, float]],
+    upper_bounds: Union[pd.Series[float], Dict[str, float]],
+) -> List[NutrientLimit]:
+    """
+    List the nutrient constraints a day's diet must satisfy.
+
+    Macronutrient goals are lower limits with a matching upper limit that the
+    overflow percentage at ``overflow_index`` in OVERFLOW_NUTRIENTS scales.
+    The fibre and saturated fat goals follow, then every other nutrient's
+    bounds.
+
+    Returns:
+        Limits in the order they are added to the model
+    """
     lower_bounds_dict, upper_bounds_dict = standardise_nutrient_bounds(
         lower_bounds, upper_bounds
     )
 
-    nutrients = ["protein", "carbohydrate", "fats"]
+    limits: List[NutrientLimit] = []
+
+    for i, nutrient in enumerate(OVERFLOW_NUTRIENTS):
+        nutrient_key = nutrient.lower().replace(" ", "_")
+        if nutrient_key in nutrient_goals:
+            goal = nutrient_goals[nutrient_key]
+            limits.append(NutrientLimit(nutrient, "min", True, goal))
+            limits.append(NutrientLimit(nutrient, "max", False, goal, i))
+
+    if "saturated_fats" in nutrient_goals:
+        limits.append(
+            NutrientLimit(
+                "saturated_fats", "goal", False, nutrient_goals["saturated_fats"]
+            )
+        )
+
+    if "fibre" in nutrient_goals:
+        limits.append(NutrientLimit("fibre", "goal", True, nutrient_goals["fibre"]))
+
+    for nutrient in NUTRIENT_MAP.keys():
+        if nutrient not in OVERFLOW_NUTRIENTS:
+            if nutrient in lower_bounds_dict:
+                limits.append(
+                    NutrientLimit(
+                        nutrient, "min", True, float(lower_bounds_dict[nutrient])
+                    )
+                )
+
+            if nutrient in upper_bounds_dict:
+                limits.append(
+                    NutrientLimit(
+                        nutrient, "max", False, float(upper_bounds_dict[nutrient])
+                    )
+                )
+
+    return limits
+
+
+def set_initial_servings(
+    prob: pulp.LpProblem,
+    x: List[pulp.LpVariable],
+    initial_servings: List[Optional[float]],
+) -> None:
+    """
+    Seed a model built by ``build_optimisation_model`` with a MIP start.
+
+    Args:
+        prob: Diet model
+        x: Serving variables in food order
+        initial_servings: Starting servings per food; None leaves a food for
+            the solver to complete
+    """
+    variables = prob.variablesDict()
+    for i, servings in enumerate(initial_servings):
+        if servings is None:
+            continue
+        x[i].setInitialValue(servings, check=False)
+        variables[f"y_{i}"].setInitialValue(1 if servings > 0 else 0, check=False)
+
+
+def build_optimisation_model(
+    selected_foods: List[Dict[str, Any]],
+    costs: npt.NDArray[np.float64],
+    max_servings: List[float],
+    nutrient_goals: Dict[str, Any],
+    lower_bounds: Union[pd.Series[float], Dict[str, float]],
+    upper_bounds: Union[pd.Series[float], Dict[str, float]],
+    overflow_percentages: Sequence[OverflowPercentage],
+) -> Tuple[pulp.LpProblem, List[pulp.LpVariable]]:
+    """
+    Build the diet MILP for one set of overflow percentages.
+
+    Each overflow percentage is either a fixed number or an integer variable,
+    which lets the solver choose the overflow itself.
+
+    Returns:
+        Tuple of (problem, serving variables in food order)
+    """
     num_foods = len(selected_foods)
 
     prob = pulp.LpProblem("Diet_Optimisation", pulp.LpMinimize)
@@ -249,59 +441,205 @@ def solve_optimisation_problem(
         if selected_foods[i].get("must_include", False):
             prob += y[i] == 1
 
-    for i, nutrient in enumerate(nutrients):
-        nutrient_key = nutrient.lower().replace(" ", "_")
-        if nutrient_key in nutrient_goals:
-            goal = nutrient_goals[nutrient_key]
-            values = [(food["nutrients"].get(nutrient) or 0) for food in selected_foods]
-            overflow_factor = 1 + (overflow_percentages[i] / 100)
+    matrix = nutrient_matrix(selected_foods)
 
-            prob += pulp.lpSum([values[j] * x[j] for j in range(num_foods)]) >= goal
-            prob += (
-                pulp.lpSum([values[j] * x[j] for j in range(num_foods)])
-                <= goal * overflow_factor
-            )
+    for limit in nutrient_limits(nutrient_goals, lower_bounds, upper_bounds):
+        values = matrix[:, NUTRIENT_INDEX[limit.nutrient]].tolist()
+        total = pulp.lpSum([values[j] * x[j] for j in range(num_foods)])
+
+        if limit.overflow_index is None:
+            rhs: Any = limit.value
+        else:
+            rhs = limit.value * (1 + overflow_percentages[limit.overflow_index] / 100)
 
-    if "saturated_fats" in nutrient_goals:
-        sat_fat_values = [
-            (food["nutrients"].get("saturated_fats") or 0) for food in selected_foods
-        ]
         prob += (
-            pulp.lpSum([sat_fat_values[j] * x[j] for j in range(num_foods)])
-            <= nutrient_goals["saturated_fats"]
+            total >= rhs if limit.is_lower else total <= rhs,
+            nutrient_constraint_name(limit.nutrient, limit.kind),
         )
 
-    if "fibre" in nutrient_goals:
-        fibre_values = [
-            (food["nutrients"].get("fibre") or 0) for food in selected_foods
+    return prob, x
+
+
+def optimise_frontier(
+    selected_foods: List[Dict[str, Any]],
+    costs: npt.NDArray[np.float64],
+    max_servings: List[float],
+    nutrient_goals: Dict[str, Any],
+    lower_bounds: Union[pd.Series[float], Dict[str, float]],
+    upper_bounds: Union[pd.Series[float], Dict[str, float]],
+    overflow_triples: Optional[List[Tuple[int, ...]]] = None,
+) -> Dict[str, Any]:
+    """
+    Find the cheapest diet at each overflow level from one reusable model.
+
+    The overflow of each macronutrient becomes an integer variable and a
+    single constraint caps their sum, so moving between points only changes
+    that constraint's right-hand side (or, for caller-supplied triples, the
+    variables' upper bounds). Every solve is warm-started from the last
+    optimal plan.
+
+    Without triples, a point is produced for every total overflow level and
+    holds the cheapest plan whose overflows sum to at most that level, so
+    costs never increase along the frontier. Once a level reaches the cost of
+    the loosest level, the remaining levels reuse its plan without solving.
+
+    Args:
+        overflow_triples: Per-nutrient overflow limits, in OVERFLOW_NUTRIENTS
+            order, to solve instead of the total overflow levels
+
+    Returns:
+        Dictionary with the food items and a list of points, each
+        ``[overflow, total_cost_sum, servings]``; cost and servings are None
+        for infeasible points
+    """
+    record("foods", len(selected_foods))
+
+    with timed("model_build"):
+        overflow = [
+            pulp.LpVariable(f"o_{k}", 0, MAX_OVERFLOW_PERCENTAGE, cat=pulp.LpInteger)
+            for k in range(len(OVERFLOW_NUTRIENTS))
         ]
-        prob += (
-            pulp.lpSum([fibre_values[j] * x[j] for j in range(num_foods)])
-            >= nutrient_goals["fibre"]
+        prob, x = build_optimisation_model(
+            selected_foods,
+            costs,
+            max_servings,
+            nutrient_goals,
+            lower_bounds,
+            upper_bounds,
+            overflow,
         )
+        prob += (pulp.lpSum(overflow) <= FRONTIER_LEVELS[-1], "total_overflow")
 
-    for nutrient in NUTRIENT_MAP.keys():
-        if nutrient not in nutrients:
-            values = [(food["nutrients"].get(nutrient) or 0) for food in selected_foods]
+    record("constraints", len(prob.constraints))
 
-            if nutrient in lower_bounds_dict:
-                prob += pulp.lpSum(
-                    [values[j] * x[j] for j in range(num_foods)]
-                ) >= float(lower_bounds_dict[nutrient])
+    total_overflow = prob.constraints["total_overflow"]
+    incumbent: Dict[str, Optional[float]] = {}
 
-            if nutrient in upper_bounds_dict:
-                prob += pulp.lpSum(
-                    [values[j] * x[j] for j in range(num_foods)]
-                ) <= float(upper_bounds_dict[nutrient])
+    def solve_point(level: int) -> Optional[FrontierPoint]:
+        total_overflow.constant = -level
+        for var in prob.variables():
+            if var.name in incumbent:
+                var.setInitialValue(incumbent[var.name], check=False)
+
+        solve_model(prob, warm_start=bool(incumbent))
 
-    prob.solve(pulp.PULP_CBC_CMD(msg=False))
+        if prob.status != pulp.LpStatusOptimal:
+            return None
 
-    if prob.status == pulp.LpStatusOptimal:
-        return format_optimisation_result(
-            selected_foods, x, costs, nutrients, overflow_percentages
+        incumbent.update((var.name, var.value()) for var in prob.variables())
+        servings = np.array([var.value() for var in x], dtype=np.float64)
+        return float(np.sum(servings * costs)), servings.tolist()
+
+    points: List[List[Any]] = []
+
+    if overflow_triples is not None:
+        for triple in overflow_triples:
+            for var, limit in zip(overflow, triple):
+                var.upBound = limit
+            point = solve_point(sum(triple))
+            points.append([list(triple), *(point or (None, None))])
+    else:
+        loosest = solve_point(FRONTIER_LEVELS[-1])
+        for level in FRONTIER_LEVELS:
+            if loosest is None:
+                points.append([level, None, None])
+                continue
+
+            point = loosest if level == FRONTIER_LEVELS[-1] else solve_point(level)
+            points.append([level, *(point or (None, None))])
+
+            if point is not None and np.isclose(point[0], loosest[0], rtol=1e-6):
+                points.extend([later, *point] for later in FRONTIER_LEVELS[level + 1 :])
+                break
+
+    return {
+        "food_items": [food["description"] for food in selected_foods],
+        "overflow_nutrients": OVERFLOW_NUTRIENTS,
+        "points": points,
+    }
+
+
+def optimise_alternatives(
+    selected_foods: List[Dict[str, Any]],
+    costs: npt.NDArray[np.float64],
+    max_servings: List[float],
+    nutrient_goals: Dict[str, Any],
+    lower_bounds: Union[pd.Series[float], Dict[str, float]],
+    upper_bounds: Union[pd.Series[float], Dict[str, float]],
+    optimum: Dict[str, Any],
+    count: int,
+    min_difference: int,
+    deadline: float,
+) -> List[Dict[str, Any]]:
+    """
+    Find the next cheapest diets that use a different selection of foods.
+
+    The model is rebuilt once at the optimum's overflow percentages. Each plan
+    found adds a cut on the food-selection binaries requiring the next plan to
+    add or drop at least ``min_difference`` foods relative to it, and the same
+    model is solved again. With ``min_difference`` of 1 this is a plain
+    no-good cut.
+
+    Args:
+        optimum: Result of ``optimise_diet`` for the same inputs
+        count: Number of alternatives wanted
+        min_difference: Foods that must be added or dropped relative to every
+            earlier plan
+        deadline: ``time.monotonic()`` value after which no solve is started;
+            a solve that runs into it returns its best plan so far
+
+    Returns:
+        Alternatives in the order found, cheapest first, each a formatted
+        result with ``cost_delta`` to the optimum and an ``optimal`` flag;
+        fewer than ``count`` if the foods or the time run out
+    """
+    overflow_percentages = tuple(
+        optimum["overflow_by_nutrient"][nutrient] for nutrient in OVERFLOW_NUTRIENTS
+    )
+
+    with timed("model_build"):
+        prob, x = build_optimisation_model(
+            selected_foods,
+            costs,
+            max_servings,
+            nutrient_goals,
+            lower_bounds,
+            upper_bounds,
+            overflow_percentages,
         )
+    variables = prob.variablesDict()
+    y = [variables[f"y_{i}"] for i in range(len(selected_foods))]
 
-    return None
+    alternatives: List[Dict[str, Any]] = []
+    servings = optimum["servings"]
+
+    for n in range(count):
+        used = [amount >= 0.5 for amount in servings]
+        prob += (
+            pulp.lpSum([1 - y[i] if used[i] else y[i] for i in range(len(y))])
+            >= min_difference,
+            f"alternative_{n}",
+        )
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+
+        solve_model(prob, time_limit=remaining)
+
+        if prob.sol_status not in ACCEPTED_SOLUTIONS:
+            break
+
+        with timed("format"):
+            result = format_optimisation_result(
+                selected_foods, x, costs, OVERFLOW_NUTRIENTS, overflow_percentages
+            )
+        result["cost_delta"] = result["total_cost_sum"] - optimum["total_cost_sum"]
+        result["optimal"] = prob.sol_status == pulp.LpSolutionOptimal
+        alternatives.append(result)
+        servings = result["servings"]
+
+    return alternatives
 
 
 def format_optimisation_result(
@@ -313,27 +651,27 @@ def format_optimisation_result(
 ) -> Dict[str, Any]:
     """
     Format the optimisation result for API response.
+
+    Servings, costs and totals stay NumPy values; the app's JSON provider
+    encodes them directly.
     """
     num_foods = len(selected_foods)
-    servings = np.array([x[i].value() for i in range(num_foods)])
+    servings = np.array([x[i].value() for i in range(num_foods)], dtype=np.float64)
 
     food_items = [food["description"] for food in selected_foods]
 
     total_cost = servings * costs
 
-    nutrient_totals = {}
-    for nutrient in NUTRIENT_MAP.keys():
-        values = [(food["nutrients"].get(nutrient) or 0) for food in selected_foods]
-        nutrient_totals[nutrient] = float(np.sum(servings * values))
+    nutrient_totals = dict(zip(NUTRIENTS, servings @ nutrient_matrix(selected_foods)))
 
     overflow_by_nutrient = dict(zip(nutrients, overflow_percentages))
 
     return {
         "food_items": food_items,
-        "servings": servings.tolist(),
-        "total_cost": total_cost.tolist(),
+        "servings": servings,
+        "total_cost": total_cost,
         "nutrient_totals": nutrient_totals,
-        "total_cost_sum": float(np.sum(total_cost)),
+        "total_cost_sum": total_cost.sum(),
         "overflow_by_nutrient": overflow_by_nutrient,
         "total_overflow": sum(overflow_percentages),
     }
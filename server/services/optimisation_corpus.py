@@ -0,0 +1,204 @@
+"""
+Anonymised corpus of real optimisation inputs.
+
+When ``OPTIMISE_RECORD_DIR`` is set, a sample of ``/api/optimise`` requests
+is stored there after validation, one gzipped JSON file per distinct input.
+Only what the solver needs is kept: per-serving nutrients, costs, max
+servings, integer and must-include flags, nutrient goals and the resolved
+bounds. Food names, FoodData Central ids, the user's age, gender and
+smoking status, and anything else in the request are dropped, and foods are
+renamed ``food-<index>``. Files are named after a hash of their contents, so
+a repeated request is stored once.
+
+Replay a corpus with ``python -m benchmarks replay DIR``.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import random
+import tempfile
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Union
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from server.utils.nutrient_utils import standardise_nutrient_bounds
+
+CORPUS_VERSION = 1
+CASE_SUFFIX = ".json.gz"
+
+# Food flags that change the model in some engine; every other key is dropped.
+KEPT_FOOD_FLAGS = ("requires_integer_servings", "must_include")
+
+
+class CorpusCase(NamedTuple):
+    """One recorded set of optimisation inputs, ready for ``optimise_diet``."""
+
+    case_id: str
+    foods: List[Dict[str, Any]]
+    costs: npt.NDArray[np.float64]
+    max_servings: List[float]
+    nutrient_goals: Dict[str, float]
+    lower_bounds: Dict[str, float]
+    upper_bounds: Dict[str, float]
+
+
+def _number(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    return float(value)
+
+
+def anonymise_inputs(
+    selected_foods: List[Dict[str, Any]],
+    costs: npt.NDArray[np.float64],
+    max_servings: List[float],
+    nutrient_goals: Dict[str, Any],
+    lower_bounds: Union[pd.Series[float], Dict[str, float]],
+    upper_bounds: Union[pd.Series[float], Dict[str, float]],
+) -> Dict[str, Any]:
+    """
+    Reduce prepared optimisation inputs to an anonymous, serialisable case.
+
+    Args:
+        selected_foods: Resolved foods as passed to ``optimise_diet``
+        costs: Cost of one serving of each food
+        max_servings: Maximum servings of each food
+        nutrient_goals: Nutrient goals; only numeric goals are kept
+        lower_bounds: Resolved lower bounds
+        upper_bounds: Resolved upper bounds
+
+    Returns:
+        JSON-serialisable case
+    """
+    foods: List[Dict[str, Any]] = []
+    for i, food in enumerate(selected_foods):
+        nutrients: Mapping[str, Any] = food.get("nutrients") or {}
+        anonymous: Dict[str, Any] = {
+            "description": f"food-{i}",
+            "servingSize": _number(food.get("servingSize")),
+            "nutrients": {
+                str(name): _number(value) for name, value in nutrients.items()
+            },
+        }
+        for flag in KEPT_FOOD_FLAGS:
+            if food.get(flag):
+                anonymous[flag] = True
+        foods.append(anonymous)
+
+    lower, upper = standardise_nutrient_bounds(lower_bounds, upper_bounds)
+    return {
+        "version": CORPUS_VERSION,
+        "foods": foods,
+        "costs": [float(cost) for cost in costs],
+        "max_servings": [float(limit) for limit in max_servings],
+        "nutrient_goals": {
+            key: float(value)
+            for key, value in nutrient_goals.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        },
+        "lower_bounds": lower,
+        "upper_bounds": upper,
+    }
+
+
+def case_id(case: Dict[str, Any]) -> str:
+    """Identifier of a case, derived from its contents."""
+    canonical = json.dumps(case, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def write_case(case: Dict[str, Any], directory: str) -> str:
+    """
+    Store a case in a corpus directory unless an identical one is there.
+
+    The file is written under a temporary name and renamed into place, so
+    readers never see a partial case.
+
+    Args:
+        case: Case from ``anonymise_inputs``
+        directory: Corpus directory, created if missing
+
+    Returns:
+        Identifier of the case
+    """
+    identifier = case_id(case)
+    path = os.path.join(directory, identifier + CASE_SUFFIX)
+    if os.path.exists(path):
+        return identifier
+
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+                f.write(json.dumps(case, separators=(",", ":")).encode("utf-8"))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return identifier
+
+
+def record_inputs(
+    directory: str,
+    rate: float,
+    selected_foods: List[Dict[str, Any]],
+    costs: npt.NDArray[np.float64],
+    max_servings: List[float],
+    nutrient_goals: Dict[str, Any],
+    lower_bounds: Union[pd.Series[float], Dict[str, float]],
+    upper_bounds: Union[pd.Series[float], Dict[str, float]],
+) -> Optional[str]:
+    """
+    Record a sample of optimisation inputs into a corpus.
+
+    Args:
+        directory: Corpus directory
+        rate: Fraction of calls to record, from 0 to 1
+
+    Returns:
+        Identifier of the recorded case, or None if this call was not sampled
+    """
+    if rate < 1 and random.random() >= rate:
+        return None
+    case = anonymise_inputs(
+        selected_foods, costs, max_servings, nutrient_goals, lower_bounds, upper_bounds
+    )
+    return write_case(case, directory)
+
+
+def read_case(path: str) -> CorpusCase:
+    """
+    Load a case written by ``write_case``.
+
+    Raises:
+        ValueError: If the file is from an unsupported corpus version
+    """
+    with gzip.open(path, "rb") as f:
+        case: Dict[str, Any] = json.loads(f.read())
+    if case.get("version") != CORPUS_VERSION:
+        raise ValueError(f"Unsupported corpus version in {path}")
+    return CorpusCase(
+        os.path.basename(path)[: -len(CASE_SUFFIX)],
+        case["foods"],
+        np.array(case["costs"], dtype=np.float64),
+        case["max_servings"],
+        case["nutrient_goals"],
+        case["lower_bounds"],
+        case["upper_bounds"],
+    )
+
+
+def corpus_paths(directory: str) -> List[str]:
+    """Paths of every case in a corpus directory, in a stable order."""
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.endswith(CASE_SUFFIX)
+    )
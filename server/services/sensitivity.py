@@ -0,0 +1,237 @@
+"""
+Sensitivity analysis of an optimal diet.
+
+The integer part of the optimal plan (which foods are used and any whole
+serving counts) is fixed and the remaining LP is solved once more, which makes
+the solver's dual values available. From them the report gives:
+
+* shadow prices: change in total cost per unit increase of each binding
+  nutrient limit
+* reduced costs: how much each food's price would have to fall before more of
+  it would lower the total cost at the current nutrient prices
+* price ranges: the prices over which each food keeps the current optimal basis
+
+Foods left out of the plan and whole-serving foods are fixed in that LP, so
+their price ranges are unbounded; for foods left out, the reduced cost is the
+useful signal.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import pulp
+
+from server.config import NUTRIENT_MAP
+from server.utils.solver_utils import nutrient_constraint_name, solve_model
+
+TOLERANCE = 1e-6
+
+Bound = Optional[float]
+
+
+def _nutrient_rows(
+    prob: pulp.LpProblem,
+) -> List[Tuple[str, pulp.LpConstraint]]:
+    """Nutrient constraints of a diet model, paired with their nutrient."""
+    names = {
+        nutrient_constraint_name(nutrient, kind): nutrient
+        for nutrient in NUTRIENT_MAP
+        for kind in ("min", "max", "goal")
+    }
+    return [
+        (names[name], constraint)
+        for name, constraint in prob.constraints.items()
+        if name in names
+    ]
+
+
+def _fix_integer_structure(prob: pulp.LpProblem) -> None:
+    """Fix every integer and binary variable at its value and relax it."""
+    for var in prob.variables():
+        if var.cat == pulp.LpInteger:
+            value = round(var.value() or 0)
+            var.bounds(value, value)
+            var.cat = pulp.LpContinuous
+
+
+def _basic_price_range(
+    column: int,
+    basis: npt.NDArray[np.float64],
+    basic: List[int],
+    columns: npt.NDArray[np.float64],
+    reduced_costs: npt.NDArray[np.float64],
+    nonbasic: Dict[int, str],
+    price: float,
+) -> Tuple[Bound, Bound]:
+    """
+    Price range over which a basic food keeps the current basis.
+
+    A price change of delta shifts each nonbasic column's reduced cost by
+    ``-delta * alpha``, where alpha is that column's entry in the food's
+    tableau row; the basis stays optimal while every reduced cost keeps its
+    sign.
+    """
+    tableau_row = np.linalg.solve(basis.T, np.eye(len(basic))[basic.index(column)])
+    low, high = -np.inf, np.inf
+
+    for k, status in nonbasic.items():
+        alpha = float(tableau_row @ columns[:, k])
+        if abs(alpha) <= TOLERANCE:
+            continue
+        ratio = reduced_costs[k] / alpha
+        if (alpha > 0) == (status == "lower"):
+            high = min(high, ratio)
+        else:
+            low = max(low, ratio)
+
+    return (
+        None if np.isinf(low) else float(price + low),
+        None if np.isinf(high) else float(price + high),
+    )
+
+
+def analyse_sensitivity(
+    prob: pulp.LpProblem,
+    x: List[pulp.LpVariable],
+    selected_foods: List[Dict[str, Any]],
+    costs: npt.NDArray[np.float64],
+) -> Optional[Dict[str, Any]]:
+    """
+    Build the sensitivity report for a model solved to optimality.
+
+    The model is modified in place and should not be reused afterwards.
+
+    Args:
+        prob: Diet model from ``build_optimisation_model``, already solved
+        x: Serving variables in food order
+        selected_foods: Foods in the model
+        costs: Price per serving of each food
+
+    Returns:
+        Dictionary with shadow_prices, foods and the ranging method used, or
+        None if the fixed LP could not be solved
+    """
+    _fix_integer_structure(prob)
+    solve_model(prob)
+    if prob.status != pulp.LpStatusOptimal:
+        return None
+
+    rows = _nutrient_rows(prob)
+    num_rows, num_foods = len(rows), len(x)
+
+    coefficients = np.array(
+        [[constraint.expr.get(var, 0.0) for var in x] for _, constraint in rows],
+        dtype=np.float64,
+    ).reshape(num_rows, num_foods)
+    limits = np.array([-constraint.constant for _, constraint in rows])
+    is_lower_limit = np.array(
+        [constraint.sense == pulp.LpConstraintGE for _, constraint in rows]
+    )
+    duals = np.array([constraint.pi or 0.0 for _, constraint in rows])
+
+    servings = np.array([var.value() or 0.0 for var in x], dtype=np.float64)
+    activity = coefficients @ servings
+    binding = np.abs(activity - limits) <= TOLERANCE * np.maximum(1, np.abs(limits))
+    reduced_costs = costs - coefficients.T @ duals
+
+    shadow_prices = [
+        {
+            "nutrient": nutrient,
+            "bound": "min" if is_lower_limit[r] else "max",
+            "limit": float(limits[r]),
+            "shadow_price": float(duals[r]),
+        }
+        for r, (nutrient, _) in enumerate(rows)
+        if binding[r]
+    ]
+
+    # A nutrient held exactly at its goal (zero overflow) has matching min and
+    # max rows; for ranging they are one equality row without a slack.
+    kept_rows: List[int] = []
+    equality_rows: Set[int] = set()
+    first_binding: Dict[str, int] = {}
+    for r, (nutrient, _) in enumerate(rows):
+        other = first_binding.get(nutrient)
+        if binding[r] and other is not None and np.isclose(limits[r], limits[other]):
+            equality_rows.add(other)
+            continue
+        if binding[r]:
+            first_binding[nutrient] = r
+        kept_rows.append(r)
+    slack_rows = [r for r in kept_rows if r not in equality_rows]
+
+    # Columns are the foods followed by the slacks. Used foods keep at least
+    # one serving; unused foods are held at zero by the fixed binaries.
+    slack_columns = np.zeros((len(kept_rows), len(slack_rows)))
+    for k, r in enumerate(slack_rows):
+        slack_columns[kept_rows.index(r), k] = -1.0 if is_lower_limit[r] else 1.0
+    columns = np.hstack([coefficients[kept_rows], slack_columns])
+    column_costs = np.concatenate([costs, np.zeros(len(slack_rows))])
+    upper = np.array([var.upBound for var in x], dtype=np.float64)
+    fixed = {
+        j
+        for j, var in enumerate(x)
+        if var.lowBound == var.upBound or servings[j] <= TOLERANCE
+    }
+
+    basic = [
+        j
+        for j in range(num_foods)
+        if j not in fixed and 1 + TOLERANCE < servings[j] < upper[j] - TOLERANCE
+    ] + [num_foods + k for k, r in enumerate(slack_rows) if not binding[r]]
+
+    nonbasic: Dict[int, str] = {
+        j: "upper" if servings[j] >= upper[j] - TOLERANCE else "lower"
+        for j in range(num_foods)
+        if j not in fixed and j not in basic
+    }
+    nonbasic.update(
+        {num_foods + k: "lower" for k, r in enumerate(slack_rows) if binding[r]}
+    )
+
+    basis = columns[:, basic]
+    size = len(kept_rows)
+    has_basis = len(basic) == size and np.linalg.matrix_rank(basis) == size
+    if has_basis:
+        basis_duals = np.linalg.solve(basis.T, column_costs[basic])
+        column_reduced_costs = column_costs - columns.T @ basis_duals
+
+    foods: List[Dict[str, Any]] = []
+    for j, food in enumerate(selected_foods):
+        price_range: Optional[Tuple[Bound, Bound]]
+        if j in fixed:
+            price_range = (None, None)
+        elif j in nonbasic:
+            threshold = float(costs[j] - reduced_costs[j])
+            price_range = (
+                (threshold, None) if nonbasic[j] == "lower" else (None, threshold)
+            )
+        elif has_basis:
+            price_range = _basic_price_range(
+                j,
+                basis,
+                basic,
+                columns,
+                column_reduced_costs,
+                nonbasic,
+                float(costs[j]),
+            )
+        else:
+            price_range = None
+
+        foods.append(
+            {
+                "food_item": food["description"],
+                "reduced_cost": float(reduced_costs[j]),
+                "price_range": price_range,
+            }
+        )
+
+    return {
+        "shadow_prices": shadow_prices,
+        "foods": foods,
+        "ranging": "basis" if has_basis else "reduced_cost",
+    }
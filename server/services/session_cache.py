@@ -0,0 +1,210 @@
+"""
+Short-lived per-session memory of the last optimisation.
+
+Users typically tweak one price or one max serving and optimise again. The
+last solution of each session is kept so the next request can pass its
+servings to CBC as a MIP start and, when the edit cannot have made any earlier
+overflow combination feasible, resume the sweep at the previous winner.
+
+The cache lives in process memory, so under several gunicorn workers a
+request only benefits when it reaches the worker that served the last one.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import pandas as pd
+
+from server.utils.nutrient_utils import standardise_nutrient_bounds
+
+SESSION_HEADER = "X-Session-ID"
+
+_VALID_SESSION_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+class FoodLimits(NamedTuple):
+    """The parts of a food that decide which plans are feasible."""
+
+    max_servings: float
+    integer_servings: bool
+    must_include: bool
+
+
+class SessionState(NamedTuple):
+    """What is remembered about a session's last successful optimisation."""
+
+    bounds_signature: str
+    foods: Dict[str, FoodLimits]
+    servings: Dict[str, float]
+    winning_combo: Tuple[int, ...]
+
+
+class WarmStart(NamedTuple):
+    """How to start an optimisation from a session's previous solution."""
+
+    initial_servings: List[Optional[float]]
+    start_combo: Optional[Tuple[int, ...]]
+
+
+def valid_session_id(session_id: Optional[str]) -> Optional[str]:
+    """Return the session id if it is well formed, otherwise None."""
+    if session_id and _VALID_SESSION_ID.match(session_id):
+        return session_id
+    return None
+
+
+def food_key(food: Dict[str, Any]) -> str:
+    """Identify a food by its id and nutrient values."""
+    nutrients = json.dumps(dict(food.get("nutrients", {})), sort_keys=True, default=str)
+    digest = hashlib.sha1(nutrients.encode("utf-8")).hexdigest()[:16]
+    return f"{food.get('fdcId', food.get('description'))}:{digest}"
+
+
+def bounds_signature(
+    nutrient_goals: Dict[str, Any],
+    lower_bounds: Union[pd.Series[float], Dict[str, float]],
+    upper_bounds: Union[pd.Series[float], Dict[str, float]],
+) -> str:
+    """Digest of every goal and bound that constrains the model."""
+    lower_bounds_dict, upper_bounds_dict = standardise_nutrient_bounds(
+        lower_bounds, upper_bounds
+    )
+    payload = json.dumps(
+        [nutrient_goals, lower_bounds_dict, upper_bounds_dict],
+        sort_keys=True,
+        default=float,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _food_limits(food: Dict[str, Any], max_servings: float) -> FoodLimits:
+    return FoodLimits(
+        max_servings,
+        bool(food.get("requires_integer_servings", False)),
+        bool(food.get("must_include", False)),
+    )
+
+
+def build_session_state(
+    selected_foods: List[Dict[str, Any]],
+    max_servings: List[float],
+    signature: str,
+    result: Dict[str, Any],
+    overflow_nutrients: List[str],
+) -> SessionState:
+    """
+    Capture a successful optimisation for the session cache.
+
+    Args:
+        selected_foods: Foods in the request
+        max_servings: Max servings of each food
+        signature: ``bounds_signature`` of the request
+        result: Result returned by ``optimise_diet``
+        overflow_nutrients: Nutrient order of the overflow combinations
+
+    Returns:
+        State to store under the session id
+    """
+    keys = [food_key(food) for food in selected_foods]
+    return SessionState(
+        signature,
+        {
+            key: _food_limits(food, limit)
+            for key, food, limit in zip(keys, selected_foods, max_servings)
+        },
+        dict(zip(keys, result["servings"])),
+        tuple(
+            result["overflow_by_nutrient"][nutrient] for nutrient in overflow_nutrients
+        ),
+    )
+
+
+def plan_warm_start(
+    state: SessionState,
+    selected_foods: List[Dict[str, Any]],
+    max_servings: List[float],
+    signature: str,
+) -> WarmStart:
+    """
+    Work out how much of the previous solve a new request can reuse.
+
+    The previous servings are always offered as a MIP start; CBC discards
+    them if they no longer fit. The sweep resumes at the previous winning
+    combination only if the new request cannot be feasible anywhere the old
+    one was not: same goals and bounds, no new or changed foods, no max
+    serving raised, no integer or must-include flag dropped and no
+    must-include food removed. Price edits satisfy this, so they skip
+    straight to the old winner.
+
+    Args:
+        state: The session's previous state
+        selected_foods: Foods in the new request
+        max_servings: Max servings of each food in the new request
+        signature: ``bounds_signature`` of the new request
+
+    Returns:
+        Initial servings in food order and the combination to start from
+    """
+    keys = [food_key(food) for food in selected_foods]
+    initial_servings = [state.servings.get(key) for key in keys]
+
+    not_relaxed = state.bounds_signature == signature
+    for key, food, limit in zip(keys, selected_foods, max_servings):
+        previous = state.foods.get(key)
+        limits = _food_limits(food, limit)
+        if (
+            previous is None
+            or limits.max_servings > previous.max_servings
+            or (previous.integer_servings and not limits.integer_servings)
+            or (previous.must_include and not limits.must_include)
+        ):
+            not_relaxed = False
+            break
+
+    # Dropping a food that had to be included also removes a constraint.
+    requested = set(keys)
+    if any(
+        previous.must_include and key not in requested
+        for key, previous in state.foods.items()
+    ):
+        not_relaxed = False
+
+    return WarmStart(initial_servings, state.winning_combo if not_relaxed else None)
+
+
+class SessionCache:
+    """Thread-safe LRU mapping of session ids to states, with expiry."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, Tuple[float, SessionState]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        """Return the session's state if it has not expired."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            expires, state = entry
+            if expires < time.monotonic():
+                del self._entries[session_id]
+                return None
+            self._entries.move_to_end(session_id)
+            return state
+
+    def put(self, session_id: str, state: SessionState) -> None:
+        """Store a session's state, evicting the least recently used."""
+        with self._lock:
+            self._entries[session_id] = (time.monotonic() + self.ttl_seconds, state)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,337 @@
+"""
+Read-only food catalogue shared by every worker through memory-mapped files.
+
+A catalogue version is a directory of ``.npy`` files with one row per food,
+sorted by id:
+
+* ``ids.npy``: ids as fixed-width ASCII bytes, searched with ``searchsorted``
+* ``descriptions.npy``: names as fixed-width UTF-8 bytes
+* ``nutrients.npy``: nutrients per 100 g in NUTRIENTS order
+* ``pricing.npy``: price per serving, serving size in grams, max serving in
+  grams and a whole-servings flag; NaN marks an unknown price or an
+  unlimited max serving
+
+Foods built from a food CSV keep the CSV's prices, so a catalogue built from
+a curated list can be offered to ``/api/optimise/catalogue`` as its
+candidates. Foods from FoodData Central JSON have no price.
+
+Every worker opens the files with ``mmap_mode="r"``, so their pages are held
+once in the OS page cache however many workers there are, and a food's
+nutrients are a view of its row rather than a copy.
+
+``build_catalogue`` writes a new version next to the old ones and points the
+``current`` symlink at it with an atomic rename. Open catalogues notice the
+new target within their check interval and map it; arrays already handed out
+stay valid because the old files remain mapped until they are released.
+
+Usage:
+    python -m server.services.shared_catalogue build SOURCE [--dir DIR]
+
+SOURCE is a food CSV in the ``client/public/sample.csv`` format or a USDA
+FoodData Central JSON download such as SR Legacy.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+import numpy.typing as npt
+
+from server.config import SHARED_CATALOGUE_CHECK_SECONDS, SHARED_CATALOGUE_DIR
+from server.services.food_catalogue import CatalogueFood, content_id
+from server.utils.food_csv import iter_food_csv
+from server.utils.nutrient_utils import NUTRIENTS, extract_nutrients
+
+CURRENT_LINK = "current"
+VERSIONS_DIR = "versions"
+KEPT_VERSIONS = 3
+
+PRICE, SERVING_SIZE, MAX_SERVING, INTEGER_SERVINGS = range(4)
+
+
+class SourceFood(NamedTuple):
+    """A food to write into a catalogue version."""
+
+    food_id: str
+    description: str
+    nutrients: Mapping[str, Optional[float]]
+    price: Optional[float] = None
+    serving_size: float = 100.0
+    max_serving: Optional[float] = None
+    integer_servings: bool = False
+
+
+class _Version(NamedTuple):
+    """The arrays of one mapped catalogue version."""
+
+    path: str
+    ids: npt.NDArray[np.bytes_]
+    descriptions: npt.NDArray[np.bytes_]
+    nutrients: npt.NDArray[np.float64]
+    pricing: Optional[npt.NDArray[np.float64]]
+
+
+def _open_version(path: str) -> _Version:
+    # Versions built before prices were kept have no pricing file.
+    pricing_path = os.path.join(path, "pricing.npy")
+    return _Version(
+        path,
+        np.load(os.path.join(path, "ids.npy"), mmap_mode="r"),
+        np.load(os.path.join(path, "descriptions.npy"), mmap_mode="r"),
+        np.load(os.path.join(path, "nutrients.npy"), mmap_mode="r"),
+        np.load(pricing_path, mmap_mode="r") if os.path.exists(pricing_path) else None,
+    )
+
+
+def _food(version: _Version, row: int) -> CatalogueFood:
+    description = bytes(version.descriptions[row]).decode("utf-8", "replace")
+    nutrients = np.asarray(version.nutrients[row])
+    if version.pricing is None:
+        return CatalogueFood(description, nutrients)
+    price, serving_size, max_serving, integer_servings = version.pricing[row].tolist()
+    return CatalogueFood(
+        description,
+        nutrients,
+        None if math.isnan(price) else price,
+        serving_size,
+        None if math.isnan(max_serving) else max_serving,
+        bool(integer_servings),
+    )
+
+
+class SharedCatalogue:
+    """Lookups by id in the current memory-mapped catalogue version."""
+
+    def __init__(self, directory: str, check_seconds: float) -> None:
+        self.directory = directory
+        self.check_seconds = check_seconds
+        self._version: Optional[_Version] = None
+        self._checked = -math.inf
+        self._lock = threading.Lock()
+
+    def _current(self) -> Optional[_Version]:
+        """The mapped version, remapped if ``current`` has moved since the last check."""
+        if time.monotonic() - self._checked < self.check_seconds:
+            return self._version
+
+        with self._lock:
+            if time.monotonic() - self._checked >= self.check_seconds:
+                self._checked = time.monotonic()
+                link = os.path.join(self.directory, CURRENT_LINK)
+                target = os.path.realpath(link) if os.path.islink(link) else None
+                if target is None:
+                    self._version = None
+                elif self._version is None or self._version.path != target:
+                    self._version = _open_version(target)
+            return self._version
+
+    def rows(self, food_ids: Sequence[str]) -> npt.NDArray[np.int64]:
+        """
+        Find the rows of several foods.
+
+        Returns:
+            Row index of each id, or -1 for ids not in the catalogue
+        """
+        version = self._current()
+        found = np.full(len(food_ids), -1, dtype=np.int64)
+        if version is None or len(version.ids) == 0:
+            return found
+
+        width = version.ids.dtype.itemsize
+        keys = [food_id.encode("ascii", "replace") for food_id in food_ids]
+        fits = np.array([len(key) <= width for key in keys], dtype=np.bool_)
+        if not fits.any():
+            return found
+
+        wanted = np.array(
+            [key for key, ok in zip(keys, fits) if ok], dtype=version.ids.dtype
+        )
+        positions = np.searchsorted(version.ids, wanted)
+        positions = np.minimum(positions, len(version.ids) - 1)
+        matches = version.ids[positions] == wanted
+        found[np.flatnonzero(fits)] = np.where(matches, positions, -1)
+        return found
+
+    def get_many(self, food_ids: Sequence[str]) -> List[Optional[CatalogueFood]]:
+        """Look up several foods, with None for ids not in the catalogue."""
+        version = self._current()
+        if version is None:
+            return [None] * len(food_ids)
+        return [
+            _food(version, row) if row >= 0 else None
+            for row in self.rows(food_ids).tolist()
+        ]
+
+    def priced(self) -> List[Tuple[str, CatalogueFood]]:
+        """Every food of the current version that has a price, in id order."""
+        version = self._current()
+        if version is None or version.pricing is None:
+            return []
+        rows = np.flatnonzero(~np.isnan(version.pricing[:, PRICE]))
+        return [
+            (bytes(version.ids[row]).decode("ascii"), _food(version, row))
+            for row in rows.tolist()
+        ]
+
+    def __len__(self) -> int:
+        version = self._current()
+        return 0 if version is None else len(version.ids)
+
+
+def build_catalogue(foods: Iterable[SourceFood], directory: str) -> str:
+    """
+    Write a new catalogue version and make it the current one.
+
+    The version is written under a temporary name and renamed into place
+    before ``current`` is swapped, so readers never see a partial version.
+    Only the newest KEPT_VERSIONS versions are kept.
+
+    Args:
+        foods: Foods with their nutrients per 100 g; a later food replaces
+            an earlier one with the same id
+        directory: Catalogue directory holding ``current`` and the versions
+
+    Returns:
+        Path of the new version
+    """
+    by_id: Dict[str, SourceFood] = {food.food_id: food for food in foods}
+    ordered = [by_id[food_id] for food_id in sorted(by_id)]
+
+    ids = np.array([food.food_id.encode("ascii", "replace") for food in ordered])
+    descriptions = np.array([food.description.encode("utf-8") for food in ordered])
+    nutrients = np.array(
+        [
+            [float(food.nutrients.get(nutrient) or 0) for nutrient in NUTRIENTS]
+            for food in ordered
+        ],
+        dtype=np.float64,
+    ).reshape(len(ordered), len(NUTRIENTS))
+    pricing = np.array(
+        [
+            [
+                math.nan if food.price is None else food.price,
+                food.serving_size,
+                math.nan if food.max_serving is None else food.max_serving,
+                float(food.integer_servings),
+            ]
+            for food in ordered
+        ],
+        dtype=np.float64,
+    ).reshape(len(ordered), 4)
+
+    versions = os.path.join(directory, VERSIONS_DIR)
+    os.makedirs(versions, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    name = f"{stamp}-{os.getpid()}"
+    building = os.path.join(versions, f".{name}")
+    os.makedirs(building)
+    np.save(os.path.join(building, "ids.npy"), ids)
+    np.save(os.path.join(building, "descriptions.npy"), descriptions)
+    np.save(os.path.join(building, "nutrients.npy"), nutrients)
+    np.save(os.path.join(building, "pricing.npy"), pricing)
+    path = os.path.join(versions, name)
+    os.rename(building, path)
+
+    link = os.path.join(directory, f".{CURRENT_LINK}-{os.getpid()}")
+    os.symlink(os.path.join(VERSIONS_DIR, name), link)
+    os.replace(link, os.path.join(directory, CURRENT_LINK))
+
+    for old in sorted(v for v in os.listdir(versions) if not v.startswith("."))[
+        :-KEPT_VERSIONS
+    ]:
+        shutil.rmtree(os.path.join(versions, old), ignore_errors=True)
+
+    return path
+
+
+def csv_foods(path: str) -> Iterator[SourceFood]:
+    """Priced foods from a food CSV, under their FDC ID or their content id."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for food in iter_food_csv(f):
+            scale = 100 / food["servingSize"]
+            per_100g = {
+                key: (value or 0) * scale for key, value in food["nutrients"].items()
+            }
+            food_id = food["fdcId"]
+            if food_id.startswith("csv-"):
+                vector = np.array(
+                    [per_100g.get(nutrient) or 0 for nutrient in NUTRIENTS],
+                    dtype=np.float64,
+                )
+                food_id = content_id(food["description"], vector)
+            yield SourceFood(
+                food_id,
+                food["description"],
+                per_100g,
+                food["price"],
+                food["servingSize"],
+                food["maxServing"] or None,
+                food["requires_integer_servings"],
+            )
+
+
+def fdc_json_foods(path: str) -> Iterator[SourceFood]:
+    """Foods from a FoodData Central JSON download, under their fdcId."""
+    with open(path, encoding="utf-8") as f:
+        data: Dict[str, Any] = json.load(f)
+    for key, foods in data.items():
+        if not key.endswith("Foods"):
+            continue
+        for food in foods:
+            yield SourceFood(
+                str(food["fdcId"]),
+                food["description"],
+                extract_nutrients(food.get("foodNutrients", [])),
+            )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m server.services.shared_catalogue")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Build and swap in a version")
+    build_parser.add_argument("source", help="Food CSV or FoodData Central JSON")
+    build_parser.add_argument(
+        "--dir",
+        default=SHARED_CATALOGUE_DIR,
+        help="Catalogue directory (default: SHARED_CATALOGUE_DIR)",
+    )
+    args = parser.parse_args(argv)
+
+    if not args.dir:
+        print("Set SHARED_CATALOGUE_DIR or pass --dir", file=sys.stderr)
+        return 1
+
+    foods = (
+        fdc_json_foods(args.source)
+        if args.source.lower().endswith(".json")
+        else csv_foods(args.source)
+    )
+    path = build_catalogue(foods, args.dir)
+    catalogue = SharedCatalogue(args.dir, SHARED_CATALOGUE_CHECK_SECONDS)
+    print(f"{len(catalogue)} foods written to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,338 @@
+"""
+HTTP client for the USDA FoodData Central API.
+
+Every page request goes through, in order:
+
+* a circuit breaker that fails fast while the API keeps failing
+* a token bucket per API key, so one user cannot spend the key's hourly
+  allowance faster than the API would accept it
+* connect and read timeouts
+* retries of 429, 5xx, timeout and connection failures, with exponential
+  backoff and full jitter, honouring a ``Retry-After`` up to the backoff cap
+
+``coalesce`` shares one piece of work between concurrent callers with the
+same API key and work key, so identical searches in flight at once cost one
+set of upstream requests. Callers with different API keys never share work,
+so one key's rejection or rate limit is not passed on to another.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+import requests
+
+from server.config import (
+    USDA_BACKOFF_BASE_SECONDS,
+    USDA_BACKOFF_MAX_SECONDS,
+    USDA_BREAKER_FAILURES,
+    USDA_BREAKER_RESET_SECONDS,
+    USDA_CONNECT_TIMEOUT_SECONDS,
+    USDA_MAX_ATTEMPTS,
+    USDA_RATE_BURST,
+    USDA_RATE_MAX_WAIT_SECONDS,
+    USDA_RATE_PER_SECOND,
+    USDA_READ_TIMEOUT_SECONDS,
+)
+from server.utils.timing import increment
+
+T = TypeVar("T")
+
+MAX_RATE_LIMITED_KEYS = 10000
+
+
+class USDARateLimited(requests.exceptions.RequestException):
+    """The API key is out of requests, locally or according to the API."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class USDAUnavailable(requests.exceptions.RequestException):
+    """The circuit breaker is open after repeated upstream failures."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a fixed rate."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take a token, borrowing against the refill if the bucket is empty.
+
+        Returns:
+            Seconds to wait before the token may be used
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def refund(self) -> None:
+        """Return a reserved token that will not be used."""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+
+class CircuitBreaker:
+    """
+    Fail fast after consecutive upstream failures.
+
+    After ``failures`` failures in a row the breaker opens and rejects
+    requests for ``reset_seconds``. It then lets one trial request through;
+    success closes the breaker and failure opens it again.
+    """
+
+    def __init__(self, failures: int, reset_seconds: float) -> None:
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        # A trial that never reports back, because it was rate limited, say,
+        # expires so that another can be made.
+        self._trial_until: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def before_request(self) -> None:
+        """
+        Raises:
+            USDAUnavailable: If the breaker is open
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            remaining = self._opened_at + self.reset_seconds - now
+            if self._trial_until is not None and now < self._trial_until:
+                remaining = self._trial_until - now
+            if remaining > 0:
+                raise USDAUnavailable("USDA API is unavailable", remaining)
+            self._trial_until = now + self.reset_seconds
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._trial_until = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            if self._opened_at is not None or self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+                self._trial_until = None
+
+
+class _Call:
+    """One piece of coalesced work and its outcome."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class USDAClient:
+    """Rate-limited, retrying client for one USDA API endpoint."""
+
+    def __init__(
+        self,
+        endpoint: str,
+        connect_timeout: float = USDA_CONNECT_TIMEOUT_SECONDS,
+        read_timeout: float = USDA_READ_TIMEOUT_SECONDS,
+        max_attempts: int = USDA_MAX_ATTEMPTS,
+        backoff_base: float = USDA_BACKOFF_BASE_SECONDS,
+        backoff_max: float = USDA_BACKOFF_MAX_SECONDS,
+        rate: float = USDA_RATE_PER_SECOND,
+        burst: int = USDA_RATE_BURST,
+        max_rate_wait: float = USDA_RATE_MAX_WAIT_SECONDS,
+        breaker_failures: int = USDA_BREAKER_FAILURES,
+        breaker_reset: float = USDA_BREAKER_RESET_SECONDS,
+    ) -> None:
+        self.endpoint = endpoint
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate = rate
+        self.burst = burst
+        self.max_rate_wait = max_rate_wait
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset)
+        self.session = requests.Session()
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, api_key: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(api_key)
+            if bucket is None:
+                bucket = self._buckets[api_key] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > MAX_RATE_LIMITED_KEYS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(api_key)
+            return bucket
+
+    def _acquire(self, api_key: str) -> None:
+        """
+        Wait for the key's next request slot.
+
+        Raises:
+            USDARateLimited: If the slot is further away than max_rate_wait
+        """
+        bucket = self._bucket(api_key)
+        wait = bucket.reserve()
+        if wait > self.max_rate_wait:
+            bucket.refund()
+            raise USDARateLimited("USDA API key is out of requests", wait)
+        if wait > 0:
+            increment("usda_rate_waits")
+            time.sleep(wait)
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry ``attempt + 1``."""
+        ceiling = min(self.backoff_max, self.backoff_base * 2**attempt)
+        return random.uniform(0, ceiling)
+
+    def get(self, api_key: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fetch one page of results, retrying transient failures.
+
+        Args:
+            api_key: USDA API key, sent as the ``api_key`` parameter
+            params: Other query parameters
+
+        Returns:
+            Decoded JSON response
+
+        Raises:
+            USDAUnavailable: If the circuit breaker is open
+            USDARateLimited: If the key is out of requests
+            requests.exceptions.RequestException: If the request failed in a
+                way that is not retried, or failed on every attempt
+        """
+        error: requests.exceptions.RequestException
+        for attempt in range(self.max_attempts):
+            if attempt:
+                increment("usda_retries")
+            self.breaker.before_request()
+            self._acquire(api_key)
+
+            retry_after: Optional[float] = None
+            try:
+                response = self.session.get(
+                    self.endpoint,
+                    params={**params, "api_key": api_key},
+                    timeout=self.timeout,
+                )
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                self.breaker.record_failure()
+                error = e
+            else:
+                if response.status_code == 429:
+                    # The API answered, so it is up; only this key is limited.
+                    self.breaker.record_success()
+                    retry_after = _retry_after(response)
+                    error = USDARateLimited(
+                        "USDA API rate limit reached",
+                        retry_after if retry_after is not None else self.backoff_max,
+                    )
+                elif response.status_code >= 500:
+                    self.breaker.record_failure()
+                    error = requests.exceptions.HTTPError(
+                        f"USDA API returned {response.status_code}", response=response
+                    )
+                else:
+                    self.breaker.record_success()
+                    response.raise_for_status()
+                    data: Dict[str, Any] = response.json()
+                    return data
+
+            if attempt + 1 == self.max_attempts:
+                break
+            delay = self._backoff(attempt)
+            if retry_after is not None:
+                if retry_after > self.backoff_max:
+                    break
+                delay = max(delay, retry_after)
+            time.sleep(delay)
+
+        raise error
+
+    def coalesce(self, api_key: str, key: Hashable, work: Callable[[], T]) -> T:
+        """
+        Run ``work`` once for all concurrent callers with the same key.
+
+        The first caller runs it; callers arriving before it finishes wait
+        and receive the same result or exception. Results are shared, so
+        callers must not modify them.
+
+        Args:
+            api_key: API key ``work`` fetches with; only callers with the
+                same key share work
+            key: What the work fetches
+            work: Function doing the fetch
+        """
+        key = (api_key, key)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            increment("usda_coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            shared: T = call.result
+            return shared
+
+        try:
+            result = call.result = work()
+            return result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Seconds from a ``Retry-After`` header given in seconds, if any."""
+    try:
+        return max(0.0, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=None)
+def client_for(endpoint: str) -> USDAClient:
+    """Shared client, with the configured policies, for an endpoint."""
+    return USDAClient(endpoint)
@@ -0,0 +1,149 @@
+"""
+Reader for food lists in the ``client/public/sample.csv`` format.
+
+This is the format the Selected Foods table exports: one row per food with
+its price, serving size, max serving and nutrients per serving. Nutrient
+headers are matched the way the browser importer matches them, so
+"Folate (Vitamin B9) (mcg)", "Folate (Vitamin B₉) (µg)" and "Folate (µg)"
+all map to the same NUTRIENT_MAP key.
+"""
+
+from __future__ import annotations
+
+import csv
+import math
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+from server.config import CSV_NUTRIENT_HEADER_MAP, NUTRIENT_MAP
+
+_SUBSCRIPT_DIGITS = str.maketrans("₀₁₂₃₄₅₆₇₈₉", "0123456789")
+
+
+def _normalise_header(header: str) -> str:
+    """Fold the spelling differences between exported CSV headers."""
+    return " ".join(
+        header.translate(_SUBSCRIPT_DIGITS).replace("µg", "mcg").lower().split()
+    )
+
+
+_NUTRIENT_HEADERS = {
+    **{_normalise_header(key): key for key in NUTRIENT_MAP},
+    **{
+        _normalise_header(header): key
+        for header, key in CSV_NUTRIENT_HEADER_MAP.items()
+    },
+}
+
+
+def nutrient_columns(fieldnames: Optional[Sequence[str]]) -> Dict[str, str]:
+    """
+    Match a CSV's headers to NUTRIENT_MAP keys.
+
+    When several headers map to the same nutrient, the first one wins.
+
+    Returns:
+        Mapping of CSV header to nutrient key for every recognised header
+    """
+    columns: Dict[str, str] = {}
+    for header in fieldnames or []:
+        key = _NUTRIENT_HEADERS.get(_normalise_header(header))
+        if key is not None and key not in columns.values():
+            columns[header] = key
+    return columns
+
+
+def _number(row: Dict[str, str], column: str) -> float:
+    """Parse a CSV cell as a non-negative float, treating blanks as zero."""
+    value = (row.get(column) or "").strip()
+    if not value:
+        return 0.0
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"'{column}' is not a number: {value!r}") from None
+    if not math.isfinite(number) or number < 0:
+        raise ValueError(f"'{column}' must be a non-negative number")
+    return number
+
+
+def parse_food_row(
+    row: Dict[str, str], index: int, columns: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """
+    Convert one CSV row to a food shaped like an optimise request's foods.
+
+    Args:
+        row: Row from ``csv.DictReader``
+        index: Position of the row, used as the id when there is no FDC ID
+        columns: ``nutrient_columns`` of the file; worked out from the row
+            if omitted
+
+    Returns:
+        Food dictionary with nutrients per serving
+
+    Raises:
+        ValueError: If the food name is missing or a number is invalid
+    """
+    description = (row.get("Food Item") or "").strip()
+    if not description:
+        raise ValueError("'Food Item' is missing")
+
+    if columns is None:
+        columns = nutrient_columns(list(row))
+    nutrients = dict.fromkeys(NUTRIENT_MAP, 0.0)
+    nutrients.update({key: _number(row, header) for header, key in columns.items()})
+
+    return {
+        "fdcId": row.get("FDC ID") or f"csv-{index}",
+        "description": description,
+        "price": _number(row, "Price Per Serving"),
+        "servingSize": _number(row, "Serving Size (g)") or 100.0,
+        "maxServing": _number(row, "Max Serving (g)"),
+        "requires_integer_servings": row.get("Discrete Servings") == "Yes",
+        "must_include": row.get("Must Include") == "Yes",
+        "nutrients": nutrients,
+    }
+
+
+def iter_food_csv_rows(
+    lines: Iterable[str],
+) -> Iterator[Tuple[int, Union[Dict[str, Any], str]]]:
+    """
+    Parse a food CSV one row at a time, reporting bad rows instead of raising.
+
+    Only the current row is held in memory, so this can read straight from a
+    request stream.
+
+    Args:
+        lines: Lines of the CSV file, e.g. an open text file
+
+    Yields:
+        Tuples of (line number where the row ends, food or error message)
+    """
+    reader = csv.DictReader(lines)
+    columns = nutrient_columns(reader.fieldnames)
+
+    for index, row in enumerate(reader):
+        try:
+            yield reader.line_num, parse_food_row(row, index, columns)
+        except ValueError as e:
+            yield reader.line_num, str(e)
+
+
+def iter_food_csv(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Parse a food CSV one row at a time.
+
+    Args:
+        lines: Lines of the CSV file, e.g. an open text file
+
+    Yields:
+        Food dictionaries in file order
+
+    Raises:
+        ValueError: On the first invalid row
+    """
+    for line_number, outcome in iter_food_csv_rows(lines):
+        if isinstance(outcome, str):
+            raise ValueError(f"Line {line_number}: {outcome}")
+        yield outcome
@@ -0,0 +1,80 @@
+"""
+Fast JSON encoding for Flask responses.
+
+``FastJSONProvider`` encodes with orjson when it is installed: NumPy arrays
+and scalars are written natively, keys are not sorted and the output is
+compact. Without orjson it falls back to the standard library with the same
+NumPy support and settings, so results can carry arrays either way.
+
+Unlike the standard library, orjson writes NaN and infinity as ``null``.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Optional
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.sansio.response import Response
+
+orjson: Optional[Any]
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = (
+        orjson.OPT_SERIALIZE_NUMPY
+        | orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+    )
+
+
+def _default(obj: Any) -> Any:
+    """Encode NumPy values, then anything Flask's provider can encode."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return DefaultJSONProvider.default(obj)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Encode a value as compact UTF-8 JSON."""
+    if orjson is not None:
+        return bytes(orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS))
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def dumps(obj: Any) -> str:
+    """Encode a value as a compact JSON string."""
+    return dumps_bytes(obj).decode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, falling back to the stdlib."""
+
+    default = staticmethod(_default)
+    ensure_ascii = False
+    sort_keys = False
+    compact = True
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        response_class: Any = self._app.response_class
+        response: Response = response_class(dumps_bytes(obj), mimetype=self.mimetype)
+        return response
@@ -0,0 +1,169 @@
+"""
+Logging setup for the diet optimisation service.
+
+Request threads only put records on an in-memory queue; a ``QueueListener``
+thread formats them and does the stream and file writes. Every record carries
+the id of the request that produced it, taken from the ``X-Request-ID``
+header or generated when the client did not send one.
+"""
+
+from __future__ import annotations
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import re
+import uuid
+from contextvars import ContextVar, Token
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, List, Optional
+
+REQUEST_ID_HEADER = "X-Request-ID"
+TEXT_FORMAT = "%(asctime)s %(levelname)s [%(request_id)s] %(message)s"
+
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_listener: Optional[QueueListener] = None
+
+
+def resolve_request_id(supplied: Optional[str]) -> str:
+    """
+    Use the client's request id if it is well formed, otherwise make one.
+
+    Args:
+        supplied: Value of the incoming ``X-Request-ID`` header, if any
+
+    Returns:
+        Request id to log under and echo back
+    """
+    if supplied and _VALID_REQUEST_ID.match(supplied):
+        return supplied
+    return uuid.uuid4().hex
+
+
+def set_request_id(request_id: str) -> Token[Optional[str]]:
+    """Attach a request id to records logged from the current context."""
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token: Token[Optional[str]]) -> None:
+    """Undo ``set_request_id``."""
+    _request_id.reset(token)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp each record with the current request id, or ``-`` outside one."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves formatting to the listener's handlers.
+
+    The stock ``prepare`` renders the record with a plain formatter on the
+    calling thread; this only merges the arguments and renders any traceback,
+    which must happen before the record leaves the thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class TruncatedPayload:
+    """
+    Lazily rendered, size-bounded stand-in for a logged payload.
+
+    Pass as a ``%s`` argument so large request or result dumps are neither
+    rendered when the level is disabled nor written out in full when it is.
+    """
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: int) -> None:
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        text = str(self.value)
+        if len(text) <= self.limit:
+            return text
+        return f"{text[: self.limit]}... ({len(text) - self.limit} more chars)"
+
+
+@atexit.register
+def _stop_listener() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging(level: str, json_format: bool, log_file: Optional[str]) -> None:
+    """
+    Route the root logger through a queue to a background listener.
+
+    Calling this again replaces the previous configuration.
+
+    Args:
+        level: Root log level name, e.g. ``"INFO"``
+        json_format: Write JSON lines instead of plain text
+        log_file: File to append to in addition to stderr, or None
+    """
+    global _listener
+
+    _stop_listener()
+
+    formatter: logging.Formatter = (
+        JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    )
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
@@ -0,0 +1,141 @@
+"""
+Prometheus metrics for the request pipeline.
+
+Stage durations and counters collected through ``server.utils.timing`` are
+turned into histograms once per request. When ``PROMETHEUS_MULTIPROC_DIR`` is
+set (see ``server/gunicorn_config.py``) every gunicorn worker writes to a
+shared directory and ``render_metrics`` aggregates them, so a scrape sees the
+whole server rather than whichever worker answered it.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Optional, Tuple, cast
+
+from server.utils.timing import RequestTimings
+
+prometheus_client: Optional[Any]
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+STAGE_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+COUNTER_BUCKETS: Dict[str, Tuple[float, ...]] = {
+    "solves": (1, 2, 3, 5, 10, 25, 50, 100, 250, 500, 1000, 1331),
+    "overflow_tier": (0, 1, 2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 25, 30),
+    "foods": (1, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000),
+    "constraints": (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+    "solver_nodes": (0, 1, 10, 100, 1000, 10000, 100000, 1000000),
+    "solver_iterations": (10, 100, 1000, 10000, 100000, 1000000, 10000000),
+    "solver_gap": (0, 0.0001, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0),
+}
+
+COUNTER_DESCRIPTIONS = {
+    "solves": "Number of CBC solves per request",
+    "overflow_tier": "Total overflow percentage of the winning solve",
+    "foods": "Number of foods in the optimisation model",
+    "constraints": "Number of constraints in the last optimisation model built",
+    "solver_nodes": "Branch-and-bound nodes CBC explored per request",
+    "solver_iterations": "Simplex iterations CBC performed per request",
+    "solver_gap": "Relative optimality gap of the last solve in a request",
+}
+
+_stage_histogram: Optional[Any] = None
+_request_histogram: Optional[Any] = None
+_counter_histograms: Dict[str, Any] = {}
+
+if prometheus_client is not None:
+    _stage_histogram = prometheus_client.Histogram(
+        "knapsnack_stage_duration_seconds",
+        "Time spent in each stage of a request",
+        ["endpoint", "stage"],
+        buckets=STAGE_BUCKETS,
+    )
+    _request_histogram = prometheus_client.Histogram(
+        "knapsnack_request_duration_seconds",
+        "Total time spent handling API requests",
+        ["endpoint"],
+        buckets=STAGE_BUCKETS,
+    )
+    for name, buckets in COUNTER_BUCKETS.items():
+        _counter_histograms[name] = prometheus_client.Histogram(
+            f"knapsnack_{name}",
+            COUNTER_DESCRIPTIONS[name],
+            ["endpoint"],
+            buckets=buckets,
+        )
+
+
+def metrics_available() -> bool:
+    """Whether the Prometheus client library is installed."""
+    return prometheus_client is not None
+
+
+def observe_request(endpoint: str, timings: RequestTimings) -> None:
+    """
+    Record one finished request's stages, counters and total duration.
+
+    Args:
+        endpoint: Flask endpoint name used as the ``endpoint`` label
+        timings: Timings collected while handling the request
+    """
+    if _stage_histogram is None or _request_histogram is None:
+        return
+
+    for stage, seconds in timings.stages.items():
+        _stage_histogram.labels(endpoint, stage).observe(seconds)
+
+    for name, value in timings.counters.items():
+        histogram = _counter_histograms.get(name)
+        if histogram is not None:
+            histogram.labels(endpoint).observe(value)
+
+    _request_histogram.labels(endpoint).observe(timings.elapsed())
+
+
+def render_metrics() -> Optional[Tuple[bytes, str]]:
+    """
+    Render every metric in the Prometheus text exposition format.
+
+    Returns:
+        Tuple of (body, content type), or None if metrics are unavailable
+    """
+    if prometheus_client is None:
+        return None
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = prometheus_client.CollectorRegistry()
+        cast(Any, multiprocess).MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+
+    return prometheus_client.generate_latest(registry), str(
+        prometheus_client.CONTENT_TYPE_LATEST
+    )
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop a dead worker's live gauges from the multiprocess store."""
+    if prometheus_client is not None and os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        cast(Any, multiprocess).mark_process_dead(pid)
@@ -4,8 +4,10 @@ Utility functions for nutrient calculations.
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, Iterator, List, Mapping, Tuple, Union
 
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 
 from server.config import (
@@ -17,6 +19,9 @@ from server.config import (
     SATURATED_FAT_RATIO,
 )
 
+NUTRIENTS = list(NUTRIENT_MAP.keys())
+NUTRIENT_INDEX = {nutrient: i for i, nutrient in enumerate(NUTRIENTS)}
+
 
 def calculate_bmr(gender: str, weight: int, height: int, age: int) -> int:
     """
@@ -77,13 +82,118 @@ def calculate_macros(
     return protein, carbohydrate, fats, fibre, saturated_fats
 
 
+IntArray = npt.NDArray[np.int64]
+FloatArray = npt.NDArray[np.float64]
+
+
+def calculate_bmr_array(
+    is_male: npt.NDArray[np.bool_],
+    weight: IntArray,
+    height: IntArray,
+    age: IntArray,
+) -> IntArray:
+    """
+    Vectorised ``calculate_bmr`` over arrays of people.
+
+    Args:
+        is_male: True where the person is male
+        weight: Weights in kg
+        height: Heights in cm
+        age: Ages in years
+
+    Returns:
+        BMR in calories per day for each person
+    """
+    offset = np.where(is_male, 5, -161)
+    return np.rint(10 * weight + 6.25 * height - 5 * age + offset).astype(np.int64)
+
+
+def calculate_tdee_array(bmr: IntArray, activity_multiplier: FloatArray) -> IntArray:
+    """Vectorised ``calculate_tdee``."""
+    return np.rint(bmr * activity_multiplier).astype(np.int64)
+
+
+def calculate_macros_array(
+    daily_caloric_intake: IntArray,
+    pratio: FloatArray,
+    cratio: FloatArray,
+    fratio: FloatArray,
+) -> Tuple[IntArray, IntArray, IntArray, IntArray, IntArray]:
+    """
+    Vectorised ``calculate_macros``.
+
+    Returns:
+        Arrays of (protein, carbohydrate, fats, fibre, saturated_fats) in grams
+    """
+
+    calories = daily_caloric_intake.astype(np.float64)
+
+    def grams(values: FloatArray) -> IntArray:
+        return np.rint(values).astype(np.int64)
+
+    return (
+        grams(pratio * calories / PROTEIN_CALORIES_PER_GRAM),
+        grams(cratio * calories / CARB_CALORIES_PER_GRAM),
+        grams(fratio * calories / FAT_CALORIES_PER_GRAM),
+        grams(FIBRE_RATIO * calories),
+        grams(SATURATED_FAT_RATIO * calories / FAT_CALORIES_PER_GRAM),
+    )
+
+
+class NutrientVector(Mapping[str, float]):
+    """
+    Read-only nutrient mapping over an array in NUTRIENTS order.
+
+    Foods resolved from the food catalogue carry one of these instead of a
+    dict, so ``nutrient_matrix`` can stack their arrays without a lookup per
+    nutrient.
+    """
+
+    __slots__ = ("array",)
+
+    def __init__(self, array: FloatArray) -> None:
+        self.array = array
+
+    def __getitem__(self, nutrient: str) -> float:
+        return float(self.array[NUTRIENT_INDEX[nutrient]])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(NUTRIENTS)
+
+    def __len__(self) -> int:
+        return len(NUTRIENTS)
+
+
+def nutrient_matrix(selected_foods: List[Dict[str, Any]]) -> FloatArray:
+    """
+    Stack the foods' nutrient values into a matrix.
+
+    Returns:
+        Array of shape (foods, NUTRIENTS) with missing values as zero
+    """
+    if selected_foods and all(
+        isinstance(food["nutrients"], NutrientVector) for food in selected_foods
+    ):
+        return np.stack([food["nutrients"].array for food in selected_foods])
+
+    return np.array(
+        [
+            [food["nutrients"].get(nutrient) or 0 for nutrient in NUTRIENTS]
+            for food in selected_foods
+        ],
+        dtype=np.float64,
+    ).reshape(len(selected_foods), len(NUTRIENTS))
+
+
 def extract_nutrients(nutrients_data: List[Dict[str, Any]]) -> Dict[str, float]:
     """
     Extract relevant nutrients from the API response and convert to our format.
     Returns nutrients per 100g.
 
     Args:
-        nutrients_data: List of nutrient dictionaries from USDA API
+        nutrients_data: List of nutrient dictionaries from USDA API, either
+            search results (``nutrientName``, ``value``) or FoodData Central
+            downloads (``nutrient.name``, ``amount``)
 
     Returns:
         Dictionary with our nutrient names as keys and values per 100g
@@ -91,10 +201,14 @@ def extract_nutrients(nutrients_data: List[Dict[str, Any]]) -> Dict[str, float]:
     result: Dict[str, float] = {}
     reverse_map = {v: k for k, v in NUTRIENT_MAP.items()}
     for nutrient in nutrients_data:
-        api_name = nutrient.get("nutrientName")
+        if "nutrientName" in nutrient:
+            api_name = nutrient["nutrientName"]
+            value = nutrient.get("value", 0)
+        else:
+            api_name = nutrient.get("nutrient", {}).get("name")
+            value = nutrient.get("amount", 0)
         if api_name in reverse_map:
             our_name = reverse_map[api_name]
-            value = nutrient.get("value", 0)
             if value is not None:
                 result[our_name] = float(value)
     for our_name in NUTRIENT_MAP.keys():
@@ -0,0 +1,344 @@
+"""
+Opt-in per-request sampling profiler.
+
+A request is profiled when ``PROFILE_SECRET`` is configured and the request
+carries the same value in the ``X-Profile`` header. The secret is not accepted
+as a query parameter, where it would end up in access logs. A background
+thread samples the handling thread's stack until the response is closed, so
+the samples of a streamed response cover producing its body, and then three
+files are written to ``PROFILE_DIR``:
+
+* ``<id>.collapsed`` - folded stacks for flamegraph.pl and similar tools
+* ``<id>.speedscope.json`` - the same samples for https://www.speedscope.app
+* ``<id>.request.json`` - the request as received, with credentials such as
+  USDA API keys redacted, for offline replay
+
+Only small JSON bodies are captured; reading any other body up front would
+consume the stream a view such as the food import reads as it goes.
+
+Replay a captured request against the local code, optionally profiling it
+again, with::
+
+    python -m server.utils.profiling replay PROFILE_DIR/<id>.request.json \
+        [--profile-dir DIR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from types import FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import Request
+
+Frame = Tuple[str, str, int]
+Stack = Tuple[Frame, ...]
+
+PROFILE_HEADER = "X-Profile"
+DEFAULT_INTERVAL = 0.001
+MAX_CAPTURED_BODY_BYTES = 1024 * 1024
+
+EXCLUDED_HEADERS = {"authorization", "cookie", PROFILE_HEADER.lower()}
+REDACTED_FIELDS = {"api_key"}
+REDACTED = "REDACTED"
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval."""
+
+    def __init__(self, thread_id: int, interval: float = DEFAULT_INTERVAL) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter[Stack] = Counter()
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._started = 0.0
+
+    def start(self) -> "SamplingProfiler":
+        """Start sampling from a background thread."""
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread to exit."""
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[_walk_stack(frame)] += 1
+
+
+def _walk_stack(frame: Optional[FrameType]) -> Stack:
+    stack: List[Frame] = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_qualname, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def should_profile(request: Request, secret: Optional[str]) -> bool:
+    """
+    Check whether a request asked to be profiled with the right secret.
+
+    Args:
+        request: Incoming Flask request
+        secret: Configured profiling secret; profiling is off when unset
+
+    Returns:
+        True if the request should be profiled
+    """
+    if not secret:
+        return False
+    supplied = request.headers.get(PROFILE_HEADER)
+    return bool(supplied) and hmac.compare_digest(str(supplied), secret)
+
+
+def _redact_body(body: bytes) -> bytes:
+    """Replace credential fields in a JSON object body."""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    if not isinstance(data, dict) or not REDACTED_FIELDS & data.keys():
+        return body
+    redacted = {
+        key: REDACTED if key in REDACTED_FIELDS else value
+        for key, value in data.items()
+    }
+    return json.dumps(redacted).encode("utf-8")
+
+
+def capture_request(request: Request) -> Dict[str, Any]:
+    """
+    Snapshot a request so it can be replayed later.
+
+    A JSON body of up to MAX_CAPTURED_BODY_BYTES is kept byte for byte
+    unless it carries an ``api_key`` field, which is replaced with
+    ``REDACTED`` there and in the query string. Other bodies are not read, so
+    streaming views still see them, and are recorded as missing.
+    Credentials in the ``Authorization`` and ``Cookie`` headers, and the
+    profiling secret itself, are left out.
+
+    Args:
+        request: Incoming Flask request
+
+    Returns:
+        JSON-serialisable description of the request
+    """
+    body: Optional[bytes] = None
+    length = request.content_length
+    if request.is_json and length is not None and length <= MAX_CAPTURED_BODY_BYTES:
+        body = _redact_body(request.get_data(cache=True))
+    query = [
+        (key, REDACTED if key in REDACTED_FIELDS else value)
+        for key, value in request.args.items(multi=True)
+    ]
+    return {
+        "method": request.method,
+        "path": request.path,
+        "query": query,
+        "headers": {
+            key: value
+            for key, value in request.headers.items()
+            if key.lower() not in EXCLUDED_HEADERS
+        },
+        "body_base64": (
+            base64.b64encode(body).decode("ascii") if body is not None else None
+        ),
+    }
+
+
+def _frame_label(frame: Frame) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def to_collapsed(samples: Counter[Stack]) -> str:
+    """Render samples as folded stacks, one ``a;b;c count`` line per stack."""
+    lines = [
+        ";".join(_frame_label(frame) for frame in stack) + f" {count}"
+        for stack, count in samples.most_common()
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(
+    samples: Counter[Stack], interval: float, name: str
+) -> Dict[str, Any]:
+    """
+    Render samples in speedscope's sampled-profile file format.
+
+    Identical stacks are merged into one weighted sample to keep files small.
+
+    Args:
+        samples: Stack sample counts
+        interval: Sampling interval in seconds
+        name: Profile name shown in the viewer
+
+    Returns:
+        Speedscope document ready to be written as JSON
+    """
+    frame_index: Dict[Frame, int] = {}
+    frames: List[Dict[str, Any]] = []
+    stacks: List[List[int]] = []
+    weights: List[float] = []
+
+    for stack, count in samples.most_common():
+        indices: List[int] = []
+        for frame in stack:
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            indices.append(frame_index[frame])
+        stacks.append(indices)
+        weights.append(count * interval * 1000)
+
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "exporter": "knapsnack",
+        "name": name,
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": stacks,
+                "weights": weights,
+            }
+        ],
+    }
+
+
+def new_profile_id(path: str) -> str:
+    """Identifier for the files of a profile of a request to ``path``."""
+    route = path.strip("/").replace("/", "_") or "root"
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{route}-{uuid.uuid4().hex[:8]}"
+
+
+def write_profile(
+    profiler: SamplingProfiler,
+    captured_request: Dict[str, Any],
+    profile_dir: str,
+    status_code: int,
+    profile_id: Optional[str] = None,
+) -> str:
+    """
+    Write the profile and the captured request to the profiles directory.
+
+    Args:
+        profiler: Stopped profiler holding the samples
+        captured_request: Snapshot from ``capture_request``
+        profile_dir: Directory to write into, created if missing
+        status_code: Status of the profiled response, kept with the request
+        profile_id: Identifier to write under; a new one by default
+
+    Returns:
+        Identifier shared by the written files
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+    profile_id = profile_id or new_profile_id(captured_request["path"])
+    base = os.path.join(profile_dir, profile_id)
+
+    with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+        f.write(to_collapsed(profiler.samples))
+
+    with open(f"{base}.speedscope.json", "w", encoding="utf-8") as f:
+        json.dump(to_speedscope(profiler.samples, profiler.interval, profile_id), f)
+
+    with open(f"{base}.request.json", "w", encoding="utf-8") as f:
+        json.dump(
+            dict(
+                captured_request,
+                status_code=status_code,
+                duration_seconds=profiler.duration,
+                samples=sum(profiler.samples.values()),
+            ),
+            f,
+            indent=2,
+        )
+
+    return profile_id
+
+
+def replay(request_path: str, profile_dir: Optional[str] = None) -> int:
+    """
+    Re-issue a captured request against the local application.
+
+    Args:
+        request_path: Path to a ``.request.json`` file
+        profile_dir: If given, profile the replay and write the result here
+
+    Returns:
+        Process exit code
+    """
+    from server.app import app
+
+    with open(request_path, encoding="utf-8") as f:
+        captured = json.load(f)
+
+    if captured["body_base64"] is None:
+        print("The request body was not captured; replaying without it")
+
+    client = app.test_client()
+    profiler = None
+    if profile_dir:
+        profiler = SamplingProfiler(threading.get_ident()).start()
+
+    start = time.perf_counter()
+    response = client.open(
+        captured["path"],
+        method=captured["method"],
+        query_string=[tuple(pair) for pair in captured["query"]],
+        headers={
+            key: value
+            for key, value in captured["headers"].items()
+            if key.lower() not in {"host", "content-length"}
+        },
+        data=base64.b64decode(captured["body_base64"] or ""),
+    )
+    elapsed = time.perf_counter() - start
+
+    if profiler is not None and profile_dir:
+        profiler.stop()
+        profile_id = write_profile(
+            profiler, captured, profile_dir, response.status_code
+        )
+        print(f"Profile written to {os.path.join(profile_dir, profile_id)}.*")
+
+    print(
+        f"{captured['method']} {captured['path']} -> {response.status_code}"
+        f" in {elapsed * 1000:.1f} ms"
+        f" (captured: {captured['status_code']}"
+        f" in {captured['duration_seconds'] * 1000:.1f} ms)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m server.utils.profiling")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    replay_parser = subparsers.add_parser("replay", help="Replay a captured request")
+    replay_parser.add_argument("request_path")
+    replay_parser.add_argument("--profile-dir", help="Profile the replay into DIR")
+    args = parser.parse_args()
+    sys.exit(replay(args.request_path, args.profile_dir))
@@ -0,0 +1,326 @@
+"""
+Utility functions shared by the PuLP optimisation models.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+import pulp
+
+from server.config import SOLVER_DETERMINISTIC, SOLVER_SCALING, SOLVER_SEED
+from server.utils.timing import (
+    increment,
+    record,
+    record_solver_stats,
+    solver_stats_wanted,
+    timed,
+)
+
+ACCEPTED_SOLUTIONS = (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible)
+
+_LOG_PATTERNS = {
+    "nodes": re.compile(r"^Enumerated nodes:\s+(\d+)", re.MULTILINE),
+    "iterations": re.compile(r"^Total iterations:\s+(\d+)", re.MULTILINE),
+    "lp_iterations": re.compile(
+        r"^Optimal objective \S+ - (\d+) iterations", re.MULTILINE
+    ),
+    "gap": re.compile(r"^Gap:\s+(\S+)", re.MULTILINE),
+}
+
+_deterministic = SOLVER_DETERMINISTIC
+_scaling = SOLVER_SCALING
+
+
+class SolveStats(NamedTuple):
+    """What CBC reported about one solve, plus the size of the model."""
+
+    status: str
+    wall_time: float
+    nodes: Optional[int]
+    iterations: Optional[int]
+    gap: Optional[float]
+    rows: int
+    columns: int
+    nonzeros: int
+
+
+def set_deterministic(enabled: bool) -> None:
+    """
+    Switch every later solve in this process to or from deterministic mode.
+
+    Deterministic solves run CBC on one thread with fixed random seeds, so a
+    model is searched the same way every time. Solves with a time limit can
+    still stop at different points.
+    """
+    global _deterministic
+
+    _deterministic = enabled
+
+
+def set_scaling(enabled: bool) -> None:
+    """Switch row and column scaling of every later solve on or off."""
+    global _scaling
+
+    _scaling = enabled
+
+
+class ModelScaling(NamedTuple):
+    """Power-of-two factors a model was scaled by."""
+
+    rows: Dict[str, float]
+    columns: Dict[pulp.LpVariable, float]
+
+
+def _power_of_two(magnitudes: List[float]) -> float:
+    """Factor that brings the geometric mean of the extremes closest to 1."""
+    middle = math.sqrt(max(magnitudes) * min(magnitudes))
+    return float(2.0 ** -round(math.log2(middle)))
+
+
+def scale_model(prob: pulp.LpProblem) -> ModelScaling:
+    """
+    Scale a model's rows and continuous columns in place.
+
+    Each constraint is multiplied by a factor, and each continuous variable
+    ``x`` is replaced by ``x / factor``, chosen so that the largest and
+    smallest coefficients of the row or column straddle 1. Row factors are
+    chosen first and column factors on the scaled rows. Integer columns keep
+    their unit so that integrality is unchanged.
+
+    Factors are powers of two, so scaling and ``unscale_model`` change only
+    exponents and restore the model exactly.
+
+    Args:
+        prob: Model to scale
+
+    Returns:
+        Factors to pass to ``unscale_model``
+    """
+    rows: Dict[str, float] = {}
+    column_magnitudes: Dict[pulp.LpVariable, List[float]] = {}
+    for name, constraint in prob.constraints.items():
+        magnitudes = [abs(value) for value in constraint.values() if value]
+        if not magnitudes:
+            continue
+        factor = _power_of_two(magnitudes)
+        if factor != 1.0:
+            rows[name] = factor
+        for var, value in constraint.items():
+            if value and var.cat == pulp.LpContinuous:
+                column_magnitudes.setdefault(var, []).append(abs(value) * factor)
+
+    columns: Dict[pulp.LpVariable, float] = {}
+    for var, magnitudes in column_magnitudes.items():
+        factor = _power_of_two(magnitudes)
+        if factor != 1.0:
+            columns[var] = factor
+
+    for name, constraint in prob.constraints.items():
+        row_factor = rows.get(name, 1.0)
+        for var, value in constraint.items():
+            constraint.expr[var] = value * row_factor * columns.get(var, 1.0)
+        constraint.constant *= row_factor
+
+    for var, factor in columns.items():
+        if var in prob.objective:
+            prob.objective[var] *= factor
+        if var.lowBound is not None:
+            var.lowBound /= factor
+        if var.upBound is not None:
+            var.upBound /= factor
+        if var.varValue is not None:
+            var.varValue /= factor
+
+    return ModelScaling(rows, columns)
+
+
+def unscale_model(prob: pulp.LpProblem, scaling: ModelScaling) -> None:
+    """
+    Undo ``scale_model``, converting the solution back to the model's units.
+
+    Variable values, reduced costs, duals and slacks are unscaled along with
+    the coefficients and bounds.
+    """
+    rows, columns = scaling
+    for name, constraint in prob.constraints.items():
+        row_factor = rows.get(name, 1.0)
+        for var, value in constraint.items():
+            constraint.expr[var] = value / (row_factor * columns.get(var, 1.0))
+        if row_factor != 1.0:
+            constraint.constant /= row_factor
+            if constraint.pi is not None:
+                constraint.pi *= row_factor
+            if constraint.slack is not None:
+                constraint.slack /= row_factor
+
+    for var, factor in columns.items():
+        if var in prob.objective:
+            prob.objective[var] /= factor
+        if var.lowBound is not None:
+            var.lowBound *= factor
+        if var.upBound is not None:
+            var.upBound *= factor
+        if var.varValue is not None:
+            var.varValue *= factor
+        if var.dj is not None:
+            var.dj /= factor
+
+
+@contextmanager
+def scaled(prob: pulp.LpProblem) -> Iterator[None]:
+    """Keep a model scaled for the duration of the block if scaling is on."""
+    if not _scaling:
+        yield
+        return
+    with timed("scale"):
+        scaling = scale_model(prob)
+    try:
+        yield
+    finally:
+        with timed("scale"):
+            unscale_model(prob, scaling)
+
+
+def make_solver(
+    warm_start: bool = False,
+    time_limit: Optional[float] = None,
+    log_path: Optional[str] = None,
+) -> pulp.LpSolver:
+    """
+    Create the CBC solver used for every optimisation solve.
+
+    Args:
+        warm_start: Pass variables' initial values to CBC as a MIP start
+        time_limit: Seconds after which CBC returns its best solution so far
+        log_path: File to write CBC's log to
+
+    Returns:
+        Configured solver
+    """
+    options = (
+        [f"randomSeed {SOLVER_SEED}", f"randomCbcSeed {SOLVER_SEED}"]
+        if _deterministic
+        else None
+    )
+    return pulp.PULP_CBC_CMD(
+        msg=False,
+        warmStart=warm_start,
+        timeLimit=time_limit,
+        threads=1 if _deterministic else None,
+        options=options,
+        logPath=log_path,
+    )
+
+
+def parse_solver_log(log: str, prob: pulp.LpProblem, wall_time: float) -> SolveStats:
+    """
+    Read the search statistics from a CBC log.
+
+    Args:
+        log: Text CBC wrote to its log file
+        prob: The model that was solved
+        wall_time: Seconds the solve took, including starting CBC
+
+    Returns:
+        Statistics of the solve; counts CBC did not report are None, and the
+        gap is 0 for proven optimal solutions without a reported gap
+    """
+    found: Dict[str, Any] = {}
+    for name, pattern in _LOG_PATTERNS.items():
+        match = pattern.search(log)
+        if match:
+            found[name] = match.group(1)
+
+    iterations = found.get("iterations", found.get("lp_iterations"))
+    if "gap" in found:
+        gap: Optional[float] = float(found["gap"])
+    elif prob.sol_status == pulp.LpSolutionOptimal:
+        gap = 0.0
+    else:
+        gap = None
+
+    return SolveStats(
+        pulp.LpSolution[prob.sol_status],
+        wall_time,
+        int(found["nodes"]) if "nodes" in found else None,
+        int(iterations) if iterations is not None else None,
+        gap,
+        len(prob.constraints),
+        prob.numVariables(),
+        sum(len(constraint) for constraint in prob.constraints.values()),
+    )
+
+
+def solve_model(
+    prob: pulp.LpProblem,
+    warm_start: bool = False,
+    time_limit: Optional[float] = None,
+) -> Optional[SolveStats]:
+    """
+    Solve a model with CBC and record what the solve cost.
+
+    When scaling is switched on, the model is scaled for the solve and
+    restored afterwards, so callers see coefficients and solution values in
+    the units the model was built in. The solve is timed as the ``solve``
+    stage, and its statistics are added to the solver counters and the
+    solver stats of the active timing context.
+
+    CBC only writes a log to read the statistics from when the timing context
+    asks for them, so ordinary solves skip the temporary file and parsing.
+
+    Args:
+        prob: Model to solve; its status and variable values are updated
+        warm_start: Pass variables' initial values to CBC as a MIP start
+        time_limit: Seconds after which CBC returns its best solution so far
+
+    Returns:
+        Statistics of the solve, or None if they were not collected
+    """
+    increment("solves")
+    if not solver_stats_wanted():
+        with scaled(prob), timed("solve"):
+            prob.solve(make_solver(warm_start, time_limit))
+        return None
+
+    fd, log_path = tempfile.mkstemp(suffix="-cbc.log")
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        with scaled(prob), timed("solve"):
+            prob.solve(make_solver(warm_start, time_limit, log_path))
+        wall_time = time.perf_counter() - start
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            log = f.read()
+    finally:
+        os.remove(log_path)
+
+    stats = parse_solver_log(log, prob, wall_time)
+    increment("solver_nodes", stats.nodes or 0)
+    increment("solver_iterations", stats.iterations or 0)
+    if stats.gap is not None:
+        record("solver_gap", stats.gap)
+    record_solver_stats(stats._asdict())
+    return stats
+
+
+def nutrient_constraint_name(nutrient: str, kind: str) -> str:
+    """
+    Name of the model constraint bounding a nutrient.
+
+    Args:
+        nutrient: NUTRIENT_MAP key
+        kind: ``"min"`` or ``"max"`` for limits from the bounds tables and the
+            macronutrient goals, ``"goal"`` for the fibre and saturated fat goals
+
+    Returns:
+        Constraint name made only of characters that are safe in solver files
+    """
+    slug = re.sub(r"[^0-9a-z]+", "_", nutrient.lower()).strip("_")
+    return f"{slug}_{kind}"
@@ -0,0 +1,171 @@
+"""
+Lightweight per-request timing context.
+
+Service functions wrap their stages in ``timed`` and bump counters with
+``increment`` or ``record``; solver statistics are kept with
+``record_solver_stats`` when the context was opened with ``solver_stats`` set,
+since reading them costs every solve a log file. Outside an active
+``collect_timings`` block these calls do nothing beyond a context variable
+lookup, so they are safe to leave in code that also runs from scripts and
+benchmarks.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class RequestTimings:
+    """Accumulated stage durations and counters for one unit of work."""
+
+    __slots__ = (
+        "stages",
+        "details",
+        "counters",
+        "solver_stats",
+        "wants_solver_stats",
+        "started",
+    )
+
+    def __init__(self, solver_stats: bool = False) -> None:
+        self.stages: Dict[str, float] = {}
+        self.details: List[Tuple[str, float]] = []
+        self.counters: Dict[str, float] = {}
+        self.solver_stats: List[Dict[str, Any]] = []
+        self.wants_solver_stats = solver_stats
+        self.started = time.perf_counter()
+
+    def add(self, stage: str, seconds: float) -> None:
+        """Add a duration to a stage, summing repeated stages."""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        """Seconds since the timings were created."""
+        return time.perf_counter() - self.started
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """Return the active timings, or None outside a collection block."""
+    return _current.get()
+
+
+def solver_stats_wanted() -> bool:
+    """Whether the active timing context collects solver statistics."""
+    timings = _current.get()
+    return timings is not None and timings.wants_solver_stats
+
+
+def begin_timings(
+    solver_stats: bool = False,
+) -> Tuple[RequestTimings, Token[Optional[RequestTimings]]]:
+    """
+    Activate a fresh timing context until ``end_timings`` is called.
+
+    This is the hook-friendly form of ``collect_timings`` for code, like
+    Flask's request hooks, that starts and ends the work in separate calls.
+
+    Args:
+        solver_stats: Collect CBC's node, iteration and gap statistics
+
+    Returns:
+        Tuple of (timings, token to pass to ``end_timings``)
+    """
+    timings = RequestTimings(solver_stats)
+    return timings, _current.set(timings)
+
+
+def end_timings(token: Token[Optional[RequestTimings]]) -> None:
+    """Deactivate a timing context started with ``begin_timings``."""
+    _current.reset(token)
+
+
+@contextmanager
+def collect_timings(solver_stats: bool = False) -> Iterator[RequestTimings]:
+    """
+    Activate a fresh timing context for the duration of the block.
+
+    Args:
+        solver_stats: Collect CBC's node, iteration and gap statistics
+
+    Yields:
+        The RequestTimings that stages and counters are recorded into
+    """
+    timings, token = begin_timings(solver_stats)
+    try:
+        yield timings
+    finally:
+        end_timings(token)
+
+
+@contextmanager
+def timed(stage: str, detail: Optional[str] = None) -> Iterator[None]:
+    """
+    Time the enclosed block as ``stage`` in the active timing context.
+
+    Args:
+        stage: Stage name; repeated stages are summed
+        detail: Optional name to also keep this occurrence under on its own,
+            such as one page of a paginated fetch. Details only appear in the
+            Server-Timing header, which keeps metric label values bounded.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        timings.add(stage, seconds)
+        if detail is not None:
+            timings.details.append((detail, seconds))
+
+
+def increment(counter: str, amount: float = 1) -> None:
+    """Add to a counter in the active timing context."""
+    timings = _current.get()
+    if timings is not None:
+        timings.counters[counter] = timings.counters.get(counter, 0) + amount
+
+
+def record(counter: str, value: float) -> None:
+    """Set a counter in the active timing context, replacing any earlier value."""
+    timings = _current.get()
+    if timings is not None:
+        timings.counters[counter] = value
+
+
+def record_solver_stats(stats: Dict[str, Any]) -> None:
+    """Keep one solve's statistics in the active timing context."""
+    timings = _current.get()
+    if timings is not None:
+        timings.solver_stats.append(stats)
+
+
+def format_server_timing(timings: RequestTimings) -> str:
+    """
+    Render timings as a ``Server-Timing`` header value.
+
+    Stages come first in the order they were first recorded, then details,
+    then the elapsed total. Durations are in milliseconds as the header
+    specification requires.
+
+    Args:
+        timings: Timings to render
+
+    Returns:
+        Header value such as ``bounds;dur=1.2, solve;dur=35.0, total;dur=40.1``
+    """
+    entries = list(timings.stages.items()) + timings.details
+    entries.append(("total", timings.elapsed()))
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in entries)
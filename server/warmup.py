@@ -0,0 +1,110 @@
+"""
+Worker warm-up, so the first real request does not pay for cold caches.
+
+A fresh worker would otherwise load the nutrient reference tables, find the
+CBC binary and page it in, and fetch the blog posts from Contentful on its
+first requests. ``start_warm_up`` does that work on a background thread;
+``/healthz/ready`` reports ready only once it has finished, so a router
+checking it keeps traffic away from cold workers.
+
+A failed step is logged and recorded in the report, but does not keep the
+worker out of service: the step is simply paid for by a later request.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_ready = threading.Event()
+_started = False
+_start_lock = threading.Lock()
+_report: Dict[str, Any] = {}
+
+
+def _load_tables() -> None:
+    from server.services.calculation import LIFE_STAGE_START_AGES, life_stage_bounds
+
+    for gender in ("m", "f"):
+        for start_age in LIFE_STAGE_START_AGES:
+            for smoking_status in ("no", "yes"):
+                life_stage_bounds(start_age, gender, smoking_status)
+
+
+def _tiny_solve() -> None:
+    import pulp
+
+    from server.utils.solver_utils import ACCEPTED_SOLUTIONS, solve_model
+
+    prob = pulp.LpProblem("Warm_Up", pulp.LpMinimize)
+    x = pulp.LpVariable("x", 0, 10, cat=pulp.LpInteger)
+    prob += x
+    prob += x >= 1
+    solve_model(prob)
+    if prob.sol_status not in ACCEPTED_SOLUTIONS:
+        raise RuntimeError(f"Warm-up solve ended {pulp.LpStatus[prob.status]}")
+
+
+def _prime_blog() -> None:
+    from server.services.blog_service import client, get_all_posts
+
+    if client is not None and get_all_posts() is None:
+        raise RuntimeError("Could not fetch posts from Contentful")
+
+
+STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("tables", _load_tables),
+    ("solver", _tiny_solve),
+    ("blog", _prime_blog),
+]
+
+
+def warm_up() -> Dict[str, Any]:
+    """
+    Run every warm-up step and mark the worker ready.
+
+    Returns:
+        Report with the seconds each step took and the errors of failed steps
+    """
+    started = time.perf_counter()
+    steps: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    for name, step in STEPS:
+        step_started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning("Warm-up step %s failed: %s", name, e)
+            errors[name] = str(e)
+        steps[name] = time.perf_counter() - step_started
+
+    _report.update(
+        {"steps": steps, "errors": errors, "seconds": time.perf_counter() - started}
+    )
+    _ready.set()
+    return dict(_report)
+
+
+def start_warm_up() -> None:
+    """Start warming up on a background thread, once per process."""
+    global _started
+
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+def is_ready() -> bool:
+    """Whether warm-up has finished in this process."""
+    return _ready.is_set()
+
+
+def warm_up_report() -> Optional[Dict[str, Any]]:
+    """What the finished warm-up did, or None while it is still running."""
+    return dict(_report) if _ready.is_set() else None